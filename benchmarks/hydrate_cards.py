@@ -0,0 +1,35 @@
+'''
+Measures time of creating cards from fetched data and reading their fields.
+
+Usage: python benchmarks/hydrate_cards.py [count]
+'''
+import sys
+import time
+from unittest.mock import MagicMock
+from grello.context import Context
+from grello.objects import Card
+
+def card_data(i):
+    return {
+        "id": "%024x" % i, "name": "card %d" % i, "desc": "", "subscribed": False,
+        "closed": False, "dueComplete": False, "due": None, "idAttachmentCover": None,
+        "idBoard": "board", "idList": "list"
+    }
+
+def run(count):
+    context = Context(MagicMock())
+    data = [card_data(i) for i in range(count)]
+    
+    try:
+        start = time.perf_counter()
+        cards = context.repository.get_objects(Card, data)
+        for c in cards:
+            c.name
+            c.closed
+        return time.perf_counter() - start
+    finally:
+        context.quit()
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    print("Hydrated %d cards in %.3fs" % (count, run(count)))
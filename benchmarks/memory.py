@@ -0,0 +1,54 @@
+'''
+Measures memory used by cached cards, excluding decoded api responses kept by them.
+Object state, decoded values and query index entries of cards are included.
+
+Usage: python benchmarks/memory.py [--cards 100000]
+'''
+import argparse
+import gc
+import tracemalloc
+from grello.connection import Api
+from grello.objects import Card
+
+def generate_cards(count):
+    return [{
+        "id": "%024x" % i, "name": "Card %d" % i, "desc": "", "closed": False, "due": None,
+        "idList": "%024x" % 0, "idBoard": "%024x" % 0, "labels": [],
+    } for i in range(count)]
+
+def touch(cards):
+    for c in cards:
+        c.name
+        c.closed
+        c.due
+        c.list
+        c.labels.items
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cards", type=int, default=100000)
+    args = parser.parse_args()
+    
+    api = Api(None, None)
+    try:
+        tracemalloc.start()
+        payload = generate_cards(args.cards)
+        gc.collect()
+        payload_size = tracemalloc.get_traced_memory()[0]
+        
+        cards = api.context.repository.get_objects(Card, payload)
+        touch(cards)
+        del payload
+        gc.collect()
+        
+        size = tracemalloc.get_traced_memory()[0] - payload_size
+        tracemalloc.stop()
+    finally:
+        api.disconnect()
+    
+    print("cards: %d" % args.cards)
+    print("payload per card: %d B" % (payload_size / args.cards))
+    print("objects per card: %d B" % (size / args.cards))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+'''
+Runs common traversals against fake Trello server and reports wall time, request count and peak memory.
+
+Usage: python benchmarks/suite.py [--lists 50] [--cards 10000] [--latency 0.01] [--json results.json] [scenario ...]
+'''
+import argparse
+import json
+import subprocess
+import sys
+import time
+import tracemalloc
+import requests
+from grello.tests import fake
+from grello.objects import Card
+
+def walk_board(api, server):
+    board = api.get_board(server.board_id)
+    for l in board.lists:
+        for c in l.cards:
+            c.name
+            c.closed
+            for label in c.labels:
+                label.name
+
+def walk_expanded_board(api, server):
+    board = api.get_board(server.board_id, expand=True)
+    for l in board.lists:
+        for c in l.cards:
+            c.name
+            c.closed
+            for label in c.labels:
+                label.name
+
+def assign_labels(api, server):
+    board = api.get_board(server.board_id)
+    label = board.labels.add(name="benchmark", color="blue")
+    for c in board.cards:
+        c.labels.add(label=label)
+
+def _update_cards(board):
+    for c in board.cards:
+        c.name = "%s updated" % c.id
+        c.description = "updated"
+        c.closed = False
+
+def update_fields(api, server):
+    _update_cards(api.get_board(server.board_id))
+
+def update_fields_in_transaction(api, server):
+    board = api.get_board(server.board_id)
+    with api.transaction(concurrency=8):
+        _update_cards(board)
+
+def update_unloaded_cards(api, server):
+    # ids are known from other source, cards are not loaded
+    with api.transaction(concurrency=8):
+        for i in server.card_ids:
+            api.get_any(Card, id=i).name = "%s updated" % i
+
+scenarios = {
+    "walk_board": walk_board,
+    "walk_expanded_board": walk_expanded_board,
+    "assign_labels": assign_labels,
+    "update_fields": update_fields,
+    "update_fields_in_transaction": update_fields_in_transaction,
+    "update_unloaded_cards": update_unloaded_cards,
+}
+
+class FakeServer(object):
+    
+    def __init__(self, args):
+        super(FakeServer, self).__init__()
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "grello.tests.fake", "--lists", str(args.lists), "--cards", str(args.cards), "--latency", str(args.latency)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, universal_newlines=True
+        )
+        info = json.loads(self.process.stdout.readline())
+        self.address = info["address"]
+        self.board_id = info["board"]
+        self.url = "http://%s:%d" % tuple(self.address)
+        
+        self.session = requests.Session()
+        self.session.trust_env = False
+        
+        self.card_ids = [c["id"] for c in self.session.get("%s/1/boards/%s/cards" % (self.url, self.board_id), params={"fields": "id"}).json()]
+    
+    def get_request_count(self):
+        return self.session.get("%s/1/_fake/requests" % self.url).json()["count"]
+    
+    def reset_requests(self):
+        self.session.delete("%s/1/_fake/requests" % self.url)
+    
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait()
+
+def _run_once(name, args, trace_memory):
+    # each run gets fresh data and cold cache
+    server = FakeServer(args)
+    try:
+        api = fake.create_api(server.address)
+        server.reset_requests()
+        
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        
+        scenarios[name](api, server)
+        
+        wall_time = time.perf_counter() - start
+        if trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        else:
+            peak = None
+        
+        requests_count = server.get_request_count()
+        api.disconnect()
+    finally:
+        server.close()
+    
+    return wall_time, requests_count, peak
+
+def run(name, args):
+    # tracing memory slows down allocations, so time is measured in separate run
+    wall_time, requests_count, _ = _run_once(name, args, False)
+    _, _, peak = _run_once(name, args, True)
+    
+    return {"scenario": name, "wall_time": wall_time, "requests": requests_count, "peak_memory": peak}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lists", type=int, default=5)
+    parser.add_argument("--cards", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0, help="seconds added by fake server to each request")
+    parser.add_argument("--json", help="appends results to given file, one json object per line")
+    parser.add_argument("scenario", nargs="*", help="one of: %s" % ", ".join(sorted(scenarios)))
+    args = parser.parse_args()
+    
+    unknown = set(args.scenario) - set(scenarios)
+    if unknown:
+        parser.error("unknown scenarios: %s" % ", ".join(sorted(unknown)))
+    
+    results = []
+    print("%-30s %10s %10s %12s" % ("scenario", "time [s]", "requests", "peak [MiB]"))
+    for name in args.scenario or sorted(scenarios):
+        r = run(name, args)
+        results.append(r)
+        print("%-30s %10.3f %10d %12.2f" % (name, r["wall_time"], r["requests"], r["peak_memory"] / 2**20))
+    
+    if args.json:
+        with open(args.json, "a") as f:
+            f.write(json.dumps({"time": time.time(), "lists": args.lists, "cards": args.cards, "latency": args.latency, "results": results}) + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+'''
+Created on 18.10.2026
+
+@author: glorpen
+'''
+from grello.utils import Logger
+from grello.objects import Board, List, Card, Label, Checkitem, Member
+
+# Applies Trello actions, eg. received by webhooks, to cached objects.
+# Only already cached objects and loaded collections are changed, so no requests are made.
+class ActionApplier(Logger):
+    
+    # Trello limit of actions returned by single request
+    page_size = 1000
+    
+    def __init__(self, context):
+        super(ActionApplier, self).__init__()
+        self._context = context
+        
+        self._handlers = {
+            "createCard": self.on_card_created,
+            "copyCard": self.on_card_created,
+            "updateCard": self.on_card_updated,
+            "deleteCard": self.on_card_deleted,
+            "createList": self.on_list_created,
+            "updateList": self.on_list_updated,
+            "updateBoard": self.on_board_updated,
+            "createLabel": self.on_label_created,
+            "updateLabel": self.on_label_updated,
+            "deleteLabel": self.on_label_deleted,
+            "addLabelToCard": self.on_label_assigned,
+            "removeLabelFromCard": self.on_label_unassigned,
+            "addMemberToCard": self.on_member_added,
+            "removeMemberFromCard": self.on_member_removed,
+            "updateCheckItemStateOnCard": self.on_checkitem_updated,
+            "updateCheckItem": self.on_checkitem_updated,
+        }
+    
+    def apply(self, action):
+        try:
+            handler = self._handlers[action["type"]]
+        except KeyError:
+            self.logger.debug("Ignoring action %r", action["type"])
+            return False
+        
+        self.logger.info("Applying action %r", action["type"])
+        handler(action["data"])
+        return True
+    
+    # applies actions made since last sync, actions feed is returned newest first
+    def sync(self, obj, url, since=None, page_size=None):
+        api_data = self._context.repository.get_object_api_data(obj)
+        page_size = page_size or self.page_size
+        
+        since = since or api_data.last_action
+        
+        parameters = {"filter": ",".join(sorted(self._handlers)), "limit": page_size}
+        if since is None:
+            # first sync only remembers where the feed ends
+            parameters["limit"] = 1
+        else:
+            parameters["since"] = since
+        
+        actions = []
+        while True:
+            page = api_data.do_request(url, parameters=dict(parameters))
+            actions.extend(page)
+            
+            if since is None or len(page) < page_size:
+                break
+            parameters["before"] = page[-1]["id"]
+        
+        if actions:
+            api_data.last_action = actions[0]["id"]
+        
+        if since is None:
+            return 0
+        
+        for action in reversed(actions):
+            self.apply(action)
+        
+        return len(actions)
+    
+    def _find(self, cls, data, **kwargs):
+        if data is None:
+            return None
+        return self._context.repository.find_object(cls, id=data["id"], **kwargs)
+    
+    def _patch(self, cls, data, **kwargs):
+        obj = self._find(cls, data, **kwargs)
+        if obj is not None:
+            self._context.repository.get_object_api_data(obj).patch(data)
+        return obj
+    
+    def _get(self, cls, data, **kwargs):
+        return self._context.repository.get_object(cls, id=data["id"], **kwargs)
+    
+    def _append(self, owner, name, item):
+        collection = self._get_collection(owner, name)
+        if collection is not None and item not in collection.items:
+            collection.append(item)
+    
+    def _discard(self, owner, name, item):
+        collection = self._get_collection(owner, name)
+        if collection is not None:
+            collection.discard(item)
+    
+    # returns collection only when already loaded
+    def _get_collection(self, owner, name):
+        if owner is None:
+            return None
+        
+        field_data = self._context.repository.get_object_api_data(owner).get_field(name)
+        if field_data.loaded:
+            return field_data.value
+    
+    def on_card_created(self, data):
+        lst = self._find(List, data.get("list"))
+        board = self._find(Board, data.get("board"))
+        if lst is None and board is None:
+            return
+        
+        # action has only some card fields, missing ones are fetched when accessed
+        card_data = dict(data["card"])
+        if "list" in data:
+            card_data.setdefault("idList", data["list"]["id"])
+        if "board" in data:
+            card_data.setdefault("idBoard", data["board"]["id"])
+        
+        card = self._context.repository.get_object(Card, data=card_data, persist=False)
+        self._append(lst, "cards", card)
+        self._append(board, "cards", card)
+    
+    def on_card_updated(self, data):
+        card = self._patch(Card, data["card"])
+        if card is None:
+            return
+        
+        if "listAfter" in data:
+            self._discard(self._find(List, data["listBefore"]), "cards", card)
+            self._append(self._find(List, data["listAfter"]), "cards", card)
+        
+        # closed cards are not listed in visible cards
+        if data["card"].get("closed"):
+            self._discard(self._find(List, data.get("list")), "cards", card)
+            self._discard(self._find(Board, data.get("board")), "cards", card)
+    
+    def on_card_deleted(self, data):
+        card = self._find(Card, data["card"])
+        if card is None:
+            return
+        
+        lst = self._find(List, data.get("list"))
+        board = self._find(Board, data.get("board"))
+        self._discard(lst, "cards", card)
+        self._discard(board, "cards", card)
+        self._context.event_dispatcher.trigger("card.removed", lst or board, card)
+    
+    def on_list_created(self, data):
+        board = self._find(Board, data.get("board"))
+        if board is not None:
+            self._append(board, "lists", self._get(List, data["list"]))
+    
+    def on_list_updated(self, data):
+        lst = self._patch(List, data["list"])
+        if lst is not None and data["list"].get("closed"):
+            self._discard(self._find(Board, data.get("board")), "lists", lst)
+    
+    def on_board_updated(self, data):
+        self._patch(Board, data["board"])
+    
+    def on_label_created(self, data):
+        board = self._find(Board, data.get("board"))
+        if board is None:
+            return
+        
+        label = self._context.repository.get_object(Label, data=data["label"])
+        self._append(board, "labels", label)
+        self._context.event_dispatcher.trigger("label.created", board, label)
+    
+    def on_label_updated(self, data):
+        self._patch(Label, data["label"])
+    
+    def on_label_deleted(self, data):
+        label = self._find(Label, data["label"])
+        if label is None:
+            return
+        
+        board = self._find(Board, data.get("board"))
+        self._discard(board, "labels", label)
+        self._context.event_dispatcher.trigger("label.removed", board, label)
+    
+    def on_label_assigned(self, data):
+        card = self._find(Card, data["card"])
+        if card is None:
+            return
+        
+        label = self._context.repository.get_object(Label, data=data["label"])
+        self._append(card, "labels", label)
+        self._context.event_dispatcher.trigger("label.assigned", card, label)
+    
+    def on_label_unassigned(self, data):
+        card = self._find(Card, data["card"])
+        label = self._find(Label, data["label"])
+        if card is None or label is None:
+            return
+        
+        self._discard(card, "labels", label)
+        self._context.event_dispatcher.trigger("label.unassigned", card, label)
+    
+    def on_member_added(self, data):
+        card = self._find(Card, data["card"])
+        if card is not None:
+            self._append(card, "members", self._get(Member, {"id": data["idMember"]}))
+    
+    def on_member_removed(self, data):
+        card = self._find(Card, data["card"])
+        member = self._find(Member, {"id": data["idMember"]})
+        if card is not None and member is not None:
+            self._discard(card, "members", member)
+    
+    def on_checkitem_updated(self, data):
+        self._patch(Checkitem, data["checkItem"], card_id=data["card"]["id"], checklist_id=data["checklist"]["id"])
@@ -0,0 +1,67 @@
+'''
+Created on 18.10.2026
+
+@author: glorpen
+'''
+import asyncio
+import functools
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from grello.utils import Logger
+
+# Lazy loading is done by blocking code, so it is run in thread pool, at most "concurrency" loads at once.
+class AsyncApi(Logger):
+    
+    def __init__(self, api, concurrency=10, executor=None):
+        super(AsyncApi, self).__init__()
+        
+        self.api = api
+        self.concurrency = concurrency
+        
+        # objects are loaded from many threads, unguarded context would be corrupted
+        if not api.context.thread_safe:
+            raise ValueError("AsyncApi needs Api created with thread_safe=True")
+        
+        self._executor = executor or ThreadPoolExecutor(concurrency)
+        # semaphores are bound to event loop
+        self._semaphores = weakref.WeakKeyDictionary()
+    
+    async def _run(self, f, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.concurrency)
+        
+        async with semaphore:
+            return await loop.run_in_executor(self._executor, functools.partial(f, *args, **kwargs))
+    
+    async def get_any(self, cls, **kwargs):
+        return await self._run(self.api.get_any, cls, **kwargs)
+    
+    async def get_board(self, board_id, expand=None):
+        return await self._run(self.api.get_board, board_id, expand)
+    
+    async def get_me(self):
+        return await self._run(self.api.get_me)
+    
+    async def load(self, obj):
+        api_data = self.api.context.repository.get_object_api_data(obj)
+        if not api_data.loaded:
+            await self._run(api_data.load)
+        return obj
+    
+    async def get(self, obj, name):
+        return await self._run(getattr, obj, name)
+    
+    async def items(self, collection):
+        return await self._run(lambda: collection.items)
+    
+    async def gather(self, objects, name):
+        return await asyncio.gather(*[self.get(o, name) for o in objects])
+    
+    async def gather_items(self, objects, name):
+        return await asyncio.gather(*[self._run(lambda o: getattr(o, name).items, o) for o in objects])
+    
+    def close(self):
+        self._executor.shutdown()
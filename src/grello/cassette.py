@@ -0,0 +1,164 @@
+'''
+Created on 18.10.2026
+
+@author: glorpen
+'''
+import copy
+import difflib
+import gzip
+import json
+import threading
+from urllib.parse import urlencode
+from grello.connection import Connection, NotFoundException, NotAuthorizedException
+
+class CassetteMismatch(AssertionError):
+    pass
+
+def _normalize(value):
+    if isinstance(value, (tuple, list)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, dict):
+        return dict((k, _normalize(v)) for k, v in value.items() if v is not None)
+    return value
+
+class Interaction(object):
+    
+    def __init__(self, method, uri, parameters=None, files=None, response=None, error=None):
+        super(Interaction, self).__init__()
+        self.method = method
+        self.uri = uri
+        self.parameters = _normalize(parameters or {})
+        self.files = sorted(files or ())
+        self.response = response
+        self.error = error
+    
+    @property
+    def key(self):
+        return (self.method, self.uri, json.dumps(self.parameters, sort_keys=True), tuple(self.files))
+    
+    def __str__(self):
+        query = urlencode(sorted((k, ",".join(map(str, v)) if isinstance(v, list) else v) for k, v in self.parameters.items()))
+        return "%s %s%s%s" % (self.method.upper(), self.uri, "?" if query else "", query)
+    
+    def to_dict(self):
+        ret = {"m": self.method, "u": self.uri}
+        if self.parameters:
+            ret["p"] = self.parameters
+        if self.files:
+            ret["f"] = self.files
+        if self.error:
+            ret["e"] = self.error
+        else:
+            ret["r"] = self.response
+        return ret
+    
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["m"], data["u"], data.get("p"), data.get("f"), data.get("r"), data.get("e"))
+
+# Requests and responses of a session, stored as one json object per line.
+class Cassette(object):
+    
+    errors = {
+        "NotFoundException": NotFoundException,
+        "NotAuthorizedException": NotAuthorizedException,
+    }
+    
+    def __init__(self, interactions=None):
+        super(Cassette, self).__init__()
+        self.interactions = list(interactions or [])
+    
+    def __len__(self):
+        return len(self.interactions)
+    
+    @classmethod
+    def _open(cls, path, mode):
+        if path.endswith(".gz"):
+            return gzip.open(path, mode + "t", encoding="utf-8")
+        return open(path, mode, encoding="utf-8")
+    
+    def save(self, path):
+        with self._open(path, "w") as f:
+            for i in self.interactions:
+                f.write(json.dumps(i.to_dict(), separators=(",", ":")))
+                f.write("\n")
+    
+    @classmethod
+    def load(cls, path):
+        with cls._open(path, "r") as f:
+            return cls(Interaction.from_dict(json.loads(line)) for line in f if line.strip())
+
+# Connection saving all requests made by session.
+class RecordingConnection(Connection):
+    
+    def __init__(self, *args, **kwargs):
+        super(RecordingConnection, self).__init__(*args, **kwargs)
+        self.cassette = Cassette()
+        self._cassette_lock = threading.Lock()
+    
+    def _do_session_request(self, session, uri, parameters=None, method="get", files=None, **kwargs):
+        interaction = Interaction(method, uri, parameters, files)
+        # whole response is recorded anyway
+        kwargs.pop("stream", None)
+        try:
+            response = super(RecordingConnection, self)._do_session_request(session, uri, parameters, method, files, **kwargs)
+        except (NotFoundException, NotAuthorizedException) as e:
+            # api errors are replayed, failed requests without api response are not recorded
+            interaction.error = e.__class__.__name__
+            self._record(interaction)
+            raise
+        
+        # responses are modified by objects later on
+        interaction.response = copy.deepcopy(response)
+        self._record(interaction)
+        return response
+    
+    def _record(self, interaction):
+        with self._cassette_lock:
+            self.cassette.interactions.append(interaction)
+
+# Connection responding with recorded data, without network access.
+# Requests are matched by method, uri and parameters, any unrecorded request fails.
+class ReplayConnection(Connection):
+    
+    def __init__(self, cassette, app_key=None, ui=None, **kwargs):
+        super(ReplayConnection, self).__init__(app_key, ui, **kwargs)
+        if isinstance(cassette, str):
+            cassette = Cassette.load(cassette)
+        
+        self.cassette = cassette
+        self.played = []
+        
+        self._pending = {}
+        for i in cassette.interactions:
+            self._pending.setdefault(i.key, []).append(i)
+        
+        self._cassette_lock = threading.Lock()
+    
+    def connect(self, app_secret):
+        self.session = None
+    
+    def _do_session_request(self, session, uri, parameters=None, method="get", files=None, **kwargs):
+        request = Interaction(method, uri, parameters, files)
+        
+        with self._cassette_lock:
+            try:
+                interaction = self._pending[request.key].pop(0)
+            except (KeyError, IndexError):
+                self.played.append(request)
+                raise CassetteMismatch("Request not found in cassette: %s\n%s" % (request, self.get_diff())) from None
+            self.played.append(interaction)
+        
+        if interaction.error:
+            raise self.cassette.errors[interaction.error]()
+        return copy.deepcopy(interaction.response)
+    
+    def get_diff(self):
+        recorded = sorted(str(i) for i in self.cassette.interactions)
+        played = sorted(str(i) for i in self.played)
+        return "\n".join(difflib.unified_diff(recorded, played, "recorded", "played", lineterm=""))
+    
+    # fails if requests made differ from recorded ones, eg. when extra or missing calls were made
+    def verify(self):
+        if len(self.played) != len(self.cassette) or any(self._pending.values()):
+            raise CassetteMismatch("Made %d requests, %d were recorded:\n%s" % (len(self.played), len(self.cassette), self.get_diff()))
@@ -5,14 +5,25 @@ Created on 18.01.2017
 '''
 
 import requests
+import threading
+import time
+from requests.adapters import HTTPAdapter
+from contextlib import contextmanager
+from urllib.parse import urlencode
 from requests_oauthlib.oauth1_session import OAuth1Session
 from grello.utils import Logger
 from grello.objects import Board, Member
 from grello.context import Context
+from grello import registry
+from grello.ratelimit import RateLimiter
+from grello.metrics import null_metrics, get_endpoint_template
+from grello.webhooks import Webhooks, WebhookReceiver
+from grello.decoders import get_default_decoder
+from grello.snapshot import SnapshotStorage
 
 class Api(Logger):
     
-    def __init__(self, app_key, ui, token_mode=None, token_expiration=None):
+    def __init__(self, app_key, ui, token_mode=None, token_expiration=None, cache_policy=None, storage=None, rate_limiter=None, thread_safe=False, metrics=None, connection=None):
         super(Api, self).__init__()
         
         self.ui = ui
@@ -29,22 +40,95 @@ class Api(Logger):
             c_args['token_mode'] = self.token_mode
         if self.token_expiration is not None:
             c_args['token_expiration'] = self.token_expiration
+        if rate_limiter is not None:
+            c_args['rate_limiter'] = rate_limiter
+        if metrics is not None:
+            c_args['metrics'] = metrics
         
-        self.connection = Connection(**c_args)
-        self.context = Context(self.connection)
+        ctx_args = {}
+        if cache_policy is not None:
+            ctx_args["cache_policy"] = cache_policy
+        if storage is not None:
+            ctx_args["storage"] = storage
+        if thread_safe:
+            ctx_args["thread_safe"] = thread_safe
+        if metrics is not None:
+            ctx_args["metrics"] = metrics
+        
+        if connection is None:
+            connection = Connection(**c_args)
+        else:
+            # custom connection, eg. replaying recorded session, is already configured
+            ignored = sorted(set(c_args).difference(("app_key", "ui", "metrics")))
+            if ignored:
+                raise ValueError("Arguments %s cannot be used with custom connection" % ", ".join(ignored))
+            if metrics is not None:
+                connection.metrics = metrics
+        
+        self.connection = connection
+        self.context = Context(self.connection, **ctx_args)
+        
+        self.actions = self.context.actions
+        self.webhooks = Webhooks(self.connection)
         
     def connect(self, app_secret):
         self.connection.connect(app_secret)
+        
+        # "me" resolves to already known member, without fetching it again
+        member_id = getattr(self.connection, "member_id", None)
+        if member_id is not None:
+            self.context.repository.add_alias(Member, ("me",), (member_id,))
     
     def disconnect(self):
         self.connection.disconnect()
         self.context.quit()
     
-    def get_any(self, cls, **kwargs):
-        return self.context.repository.get_object(cls, **kwargs)
+    # field changes made inside block are sent with single request per object
+    def transaction(self, concurrency=None):
+        return self.context.transaction(concurrency)
+    
+    def flush(self):
+        self.context.flush()
+    
+    # applies action made by third party to cached objects
+    def apply_action(self, action):
+        return self.actions.apply(action)
+    
+    def create_webhook_receiver(self, app_secret, callback_url):
+        # actions are applied from server thread, unguarded context would be corrupted
+        if not self.context.thread_safe:
+            raise ValueError("Webhook receiver needs Api created with thread_safe=True")
+        return WebhookReceiver(self.actions, app_secret, callback_url)
+    
+    def get_any(self, cls, fields=None, **kwargs):
+        obj = self.context.repository.get_object(cls, **kwargs)
+        
+        if fields is not None:
+            self.context.repository.get_object_api_data(obj).fields = tuple(fields)
+        
+        return obj
+    
+    def get_board(self, board_id, expand=None):
+        board = self.get_any(Board, id=board_id)
+        
+        if expand:
+            parameters = dict(Board.EXPAND_ALL)
+            if isinstance(expand, dict):
+                parameters.update(expand)
+            parameters["member_fields"] = ",".join(registry.objects.get_default_fields(Member))
+            
+            self.context.repository.get_object_api_data(board).load(parameters)
+        
+        return board
+    
+    # objects from board snapshot are used instead of fetching them, changed ones are saved to previous storage
+    def load_snapshot(self, path):
+        repository = self.context.repository
+        repository.storage = SnapshotStorage(path, repository.storage, self.connection.decoder)
+        return self.get_board(repository.storage.board_id)
     
-    def get_board(self, board_id):
-        return self.get_any(Board, id=board_id)
+    def batch(self):
+        return self.connection.batch()
     
     def get_me(self):
         return self.get_any(Member, id="me")
@@ -53,9 +137,99 @@ class NotAuthorizedException(Exception):
     pass
 class NotFoundException(Exception):
     pass
+class RateLimitException(requests.exceptions.RequestException):
+    pass
+
+class BatchRequest(object):
+    
+    _result = None
+    _exception = None
+    done = False
+    
+    def __init__(self, uri, parameters=None, callback=None):
+        super(BatchRequest, self).__init__()
+        self.uri = uri
+        self.parameters = parameters
+        self.callback = callback
+    
+    @property
+    def url(self):
+        query = []
+        for k, v in (self.parameters or {}).items():
+            if v is None:
+                continue
+            if isinstance(v, (tuple, list)):
+                v = ",".join(v)
+            query.append((k, v))
+        
+        url = "/%s" % self.uri
+        if query:
+            # commas in values are quoted so they will not split batched urls
+            url += ("&" if "?" in url else "?") + urlencode(query)
+        return url
+    
+    def set_response(self, response):
+        self.done = True
+        
+        if "200" in response:
+            self._result = response["200"]
+            if self.callback:
+                self.callback(self._result)
+        else:
+            status = response.get("statusCode")
+            if status == 401:
+                self._exception = NotAuthorizedException()
+            elif status == 404:
+                self._exception = NotFoundException()
+            else:
+                self._exception = requests.exceptions.HTTPError("Batched request %s failed: %r" % (self.url, response))
+    
+    @property
+    def result(self):
+        if not self.done:
+            raise Exception("Batch was not sent yet")
+        if self._exception:
+            raise self._exception
+        return self._result
+
+class Batch(Logger):
+    
+    max_urls = 10
+    
+    def __init__(self, connection):
+        super(Batch, self).__init__()
+        self.connection = connection
+        self._pending = []
+    
+    def __len__(self):
+        return len(self._pending)
+    
+    def get(self, uri, parameters=None, callback=None):
+        request = BatchRequest(uri, parameters, callback)
+        self._pending.append(request)
+        return request
+    
+    def load(self, obj):
+        from grello.context import manager
+        api_data = manager.find_context(obj).repository.get_object_api_data(obj)
+        
+        if not api_data.loaded:
+            return self.get(api_data.get_object_url(), api_data.get_load_parameters(), api_data.set_loaded_data)
+    
+    def flush(self):
+        while self._pending:
+            chunk = self._pending[:self.max_urls]
+            del self._pending[:self.max_urls]
+            
+            self.logger.info("Sending batch of %d requests", len(chunk))
+            responses = self.connection.do_batch_request([r.url for r in chunk])
+            
+            for r, response in zip(chunk, responses):
+                r.set_response(response)
 
 class Connection(Logger):
     
+    api_scheme = 'https'
     api_host = 'api.trello.com'
     api_version = 1
     app_name = "Grello"
@@ -66,45 +240,178 @@ class Connection(Logger):
     
     session = None
     
-    def __init__(self, app_key, ui, token_mode=MODE_READ|MODE_WRITE|MODE_ACCOUNT, token_expiration = "30days"):
+    # seconds, doubled on each retry
+    retry_delay = 0.1
+    
+    # token of connected session
+    token = None
+    # id of member owning the token, known as "me"
+    member_id = None
+    
+    def __init__(self, app_key, ui, token_mode=MODE_READ|MODE_WRITE|MODE_ACCOUNT, token_expiration = "30days", rate_limiter=None, pool_connections=10, pool_maxsize=10, metrics=None, decoder=None, adapter=None):
         super(Connection, self).__init__()
         self.app_key = app_key
         self.token_mode = token_mode
         self.token_expiration = token_expiration
         self.ui = ui
+        self.rate_limiter = rate_limiter or RateLimiter.for_key(app_key)
+        self.metrics = metrics or null_metrics
+        # faster json library is used when installed
+        self.decoder = decoder or get_default_decoder()
+        
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        # adapter shared with other connections, eg. by ApiPool
+        self.adapter = adapter
+        
+        # batches are not shared between threads
+        self._local = threading.local()
+    
+    @property
+    def current_batch(self):
+        return getattr(self._local, "batch", None)
+    
+    @current_batch.setter
+    def current_batch(self, batch):
+        self._local.batch = batch
     
     def connect(self, app_secret):
         self.session = self.get_session(app_secret)
     
+    def create_adapter(self):
+        if self.adapter is not None:
+            return self.adapter
+        # retries are handled by Connection
+        return HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize, max_retries=0)
+    
     def _create_session(self, resource_key, resource_secret, app_secret):
-        return OAuth1Session(
+        session = OAuth1Session(
             self.app_key,
             client_secret=app_secret,
             resource_owner_key=resource_key,
             resource_owner_secret=resource_secret
         )
+        session.mount("%s://" % self.api_scheme, self.create_adapter())
+        return session
+    
+    # uses already known token, without verifying it
+    def connect_token(self, app_secret, token, token_secret):
+        self.session = self._create_session(token, token_secret, app_secret)
+        self.token = token
     
     def disconnect(self):
         if self.session:
+            if self.adapter is not None:
+                # shared connections are kept open for other sessions
+                self.session.adapters.pop("%s://" % self.api_scheme, None)
             self.session.close()
             self.session = None
     
-    def do_request(self, *args, **kwargs):
-        return self._do_session_request(self.session, *args, **kwargs)
+    def do_request(self, uri, parameters=None, method="get", files=None, **kwargs):
+        batch = self.current_batch
+        if batch is not None and len(batch) and method == "get" and not files:
+            # lazy request cannot wait for flush, it is only sent together with already queued ones
+            request = batch.get(uri, parameters)
+            batch.flush()
+            return request.result
+        
+        return self._do_session_request(self.session, uri, parameters, method, files, **kwargs)
+    
+    def do_batch_request(self, urls):
+        return self._do_session_request(self.session, "batch", {"urls": ",".join(urls)})
+    
+    @contextmanager
+    def batch(self):
+        if self.current_batch is not None:
+            yield self.current_batch
+            return
+        
+        self.current_batch = Batch(self)
+        try:
+            yield self.current_batch
+            self.current_batch.flush()
+        finally:
+            self.current_batch = None
+    
+    # streamed response is returned as items generator, for json arrays only
+    def _do_session_request(self, session, uri, parameters=None, method="get", files = None, max_retries = 3, stream=False):
+        if stream:
+            items = self._send_session_request(session, uri, parameters, method, files, max_retries, stream=True)
+            return self._iter_stream(items, session, uri, parameters, method, files, max_retries)
+        return self._send_session_request(session, uri, parameters, method, files, max_retries)
+    
+    # body can fail while items are read, then request is sent again and already yielded items are skipped
+    def _iter_stream(self, items, session, uri, parameters, method, files, max_retries):
+        endpoint = get_endpoint_template(uri)
+        yielded = 0
+        i = 0
+        while True:
+            try:
+                for n, item in enumerate(items):
+                    if n >= yielded:
+                        yielded += 1
+                        yield item
+                return
+            except requests.exceptions.RequestException:
+                self.metrics.inc("grello_requests_total", method=method, endpoint=endpoint, status="error")
+                if i >= max_retries:
+                    raise
+            finally:
+                items.close()
+            
+            i += 1
+            self.logger.warning("Reading response failed, retry %d of %d", i, max_retries)
+            self.metrics.inc("grello_request_retries_total", method=method, endpoint=endpoint)
+            time.sleep(self.retry_delay * 2**(i-1))
+            items = self._send_session_request(session, uri, parameters, method, files, max_retries - i, stream=True)
     
-    def _do_session_request(self, session, uri, parameters=None, method="get", files = None, max_retries = 3):
+    def _send_session_request(self, session, uri, parameters=None, method="get", files=None, max_retries=3, stream=False):
         self.logger.info("Requesting %s:%s", method, uri)
         
+        endpoint = get_endpoint_template(uri)
+        
         last_exception = None
         for i in range(0, max_retries+1):
             
             if i > 0:
                 self.logger.info("Retry %d of %d", i, max_retries)
+                self.metrics.inc("grello_request_retries_total", method=method, endpoint=endpoint)
+            
+            self.rate_limiter.acquire()
             
             try:
-                r = getattr(session, method)("https://%s/%d/%s" % (self.api_host, self.api_version, uri), params=parameters, files=files)
-                if r.status_code == 200:
-                    ret = r.json()
+                start = time.monotonic()
+                request_kwargs = {"params": parameters, "files": files}
+                if stream:
+                    request_kwargs["stream"] = True
+                
+                try:
+                    r = getattr(session, method)("%s://%s/%d/%s" % (self.api_scheme, self.api_host, self.api_version, uri), **request_kwargs)
+                except requests.exceptions.RequestException:
+                    self.metrics.inc("grello_requests_total", method=method, endpoint=endpoint, status="error")
+                    raise
+                finally:
+                    self.metrics.observe("grello_request_duration_seconds", time.monotonic() - start, method=method, endpoint=endpoint)
+                
+                self.metrics.inc("grello_requests_total", method=method, endpoint=endpoint, status=str(r.status_code))
+                self.rate_limiter.update(r.headers)
+                
+                if stream and r.status_code != 200:
+                    # connection is released only after streamed body is closed
+                    r.close()
+                
+                if r.status_code == 429:
+                    delay = self._get_retry_after(r, i)
+                    self.logger.warning("Request was throttled, waiting %.2fs", delay)
+                    self.rate_limiter.pause(delay)
+                    last_exception = RateLimitException(response=r)
+                    continue
+                elif r.status_code == 200:
+                    if stream:
+                        self.logger.debug("Streaming response")
+                        return self.decoder.iter_array(r)
+                    
+                    ret = self.decoder.decode(r)
                     self.logger.debug("Response: %r", ret)
                     return ret
                 elif r.status_code == 401:
@@ -116,9 +423,20 @@ class Connection(Logger):
             
             except requests.exceptions.RequestException as e:
                 last_exception = e
+                if i < max_retries:
+                    time.sleep(self.retry_delay * 2**i)
                 continue
         
         raise last_exception
+    
+    def _get_retry_after(self, response, retry):
+        value = response.headers.get("Retry-After")
+        if isinstance(value, (str, int)):
+            try:
+                return float(value)
+            except ValueError:
+                pass
+        return self.retry_delay * 2**retry
 
     def _do_auth(self, client_secret):
         modes={self.MODE_READ: "read", self.MODE_WRITE: "write", self.MODE_ACCOUNT: "account"}
@@ -169,14 +487,17 @@ class Connection(Logger):
             token, token_secret = self._do_auth(app_secret)
             self.ui.save_keys(token, token_secret)
             session = self._create_session(token, token_secret, app_secret)
+            self.member_id = self._do_session_request(session, 'tokens/%s' % token)["idMember"]
         
+        self.token = token
         return session
     
     def get_session_for_token(self, token, token_secret, app_secret):
         session = self._create_session(token, token_secret, app_secret)
         try:
-            self._do_session_request(session, 'tokens/%s' % token)
+            data = self._do_session_request(session, 'tokens/%s' % token)
         except NotAuthorizedException:
             return None
         
+        self.member_id = data["idMember"]
         return session
@@ -3,46 +3,116 @@ Created on 22.01.2017
 
 @author: glorpen
 '''
+import threading
+from contextlib import contextmanager
 from grello.repository import Repository
-from grello.registry import events, BoundEventDispatcher
+from grello.registry import events, BoundEventDispatcher, FieldsProjection
+from grello.utils import null_lock
+from grello.transaction import Transaction
+from grello.actions import ActionApplier
+from grello.metrics import null_metrics
 
 class ObjectNotKnownException(Exception):
     pass
 
+# Active contexts, there can be thousands of them, eg. with ApiPool.
 class Manager(object):
     
     def __init__(self):
         super(Manager, self).__init__()
-        self.contexts = []
+        self.contexts = {}
+        # services of each context, objects have its context in api data
+        self._owners = {}
+        self._lock = threading.Lock()
     
     def add(self, context):
-        self.contexts.append(context)
+        with self._lock:
+            self.contexts[id(context)] = context
+            for s in context.repository.services.values():
+                self._owners[id(s)] = context
     
     def remove(self, context):
-        self.contexts.remove(context)
+        with self._lock:
+            del self.contexts[id(context)]
+            for s in context.repository.services.values():
+                self._owners.pop(id(s), None)
     
     def find_context(self, obj):
-        for c in self.contexts:
-            if c.repository.is_known(obj):
-                return c
-        raise ObjectNotKnownException()
+        api_data = getattr(obj, "_api_data", None)
+        if api_data is not None and api_data._context is not None:
+            return api_data._context
+        
+        try:
+            return self._owners[id(obj)]
+        except KeyError:
+            raise ObjectNotKnownException() from None
 
 manager = Manager()
 
 class Context(object):
-    def __init__(self, connection):
+    # thread_safe context can be shared by many threads, at cost of locking
+    def __init__(self, connection, cache_policy=None, storage=None, thread_safe=False, metrics=None):
         super(Context, self).__init__()
         
-        manager.add(self)
+        self.thread_safe = thread_safe
+        self.metrics = metrics or null_metrics
+        self._local = threading.local()
+        # guards decoded values and collections of all objects
+        self.values_lock = self.create_lock()
         
-        self.repository = Repository(self)
+        # fields requested by loads, default ones and learned missing ones
+        self.projection = FieldsProjection()
+        
+        self.repository = Repository(self, cache_policy, storage)
         self.connection = connection
         self.event_dispatcher = BoundEventDispatcher(self)
+        self.actions = ActionApplier(self)
         
         self.repository.set_service(self)
         self.repository.set_service(self.event_dispatcher)
         self.repository.set_service(self.repository)
+        self.repository.set_service(self.repository.indexes)
         self.repository.set_service(self.connection)
+        
+        manager.add(self)
+    
+    @property
+    def current_transaction(self):
+        return getattr(self._local, "transaction", None)
+    
+    @current_transaction.setter
+    def current_transaction(self, transaction):
+        self._local.transaction = transaction
+    
+    @contextmanager
+    def transaction(self, concurrency=None):
+        # updates are sent from many threads, unguarded context would be corrupted
+        if concurrency and not self.thread_safe:
+            raise ValueError("Concurrent transaction needs Api created with thread_safe=True")
+        
+        if self.current_transaction is not None:
+            yield self.current_transaction
+            return
+        
+        self.current_transaction = Transaction(self.connection, concurrency)
+        try:
+            yield self.current_transaction
+            self.current_transaction.flush()
+        except:
+            self.current_transaction.rollback()
+            raise
+        finally:
+            self.current_transaction = None
+    
+    def flush(self):
+        if self.current_transaction is not None:
+            self.current_transaction.flush()
+    
+    def create_lock(self):
+        return threading.RLock() if self.thread_safe else null_lock
     
     def quit(self):
         manager.remove(self)
+        
+        if self.repository.storage is not None:
+            self.repository.storage.flush()
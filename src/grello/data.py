@@ -4,33 +4,59 @@ Created on 18.01.2017
 @author: glorpen
 '''
 
+import threading
+from concurrent.futures import Future, wait
+from contextlib import contextmanager
 from collections import OrderedDict
-from grello import registry
-from grello.utils import Logger
+from grello import registry, fields
+from grello.utils import Logger, python_to_trello
 
 class InvalidIdException(Exception):
     pass
 
 class ApiData(Logger):
     
-    loaded = False
-    _collected_fields = None
+    # many objects are cached, so state is kept in slots and created only when needed
+    __slots__ = (
+        "logger", "obj", "_context", "dirty", "size", "data_version", "stored",
+        "fields", "data", "loaded_data", "last_action", "values", "collections", "loading",
+    )
+    
+    # Trello limit of items returned by paginated requests
+    page_size = 1000
     
     def __init__(self, obj, context):
         super(ApiData, self).__init__()
         self.obj = obj
         self._context = context
+        # assigned values not yet sent to api, by data field name
+        self.dirty = None
+        # estimated data size, when cache has bytes budget
+        self.size = 0
+        # incremented on each data change, used to skip loads made by other threads
+        self.data_version = 0
+        # data from persistent storage, used after revalidation
+        self.stored = None
+        # fields requested when loading this object, instead of class projection
+        self.fields = None
+        # last data set, partial changes are merged into it
+        self.data = None
+        # data read by fields, with local changes
+        self.loaded_data = None
+        # id of last action applied by sync
+        self.last_action = None
+        # decoded or assigned values and created collections, by field name
+        self.values = None
+        self.collections = None
+        # future and thread of running load
+        self.loading = None
+        
+        # direct handle, so field access does not need to search for object context
+        obj._api_data = self
     
     @property
-    def _fields(self):
-        if self._collected_fields is None:
-            fields = {}
-            fields_by_name = {}
-            for k,f in registry.objects.get_fields(self.obj.__class__).items():
-                fields_by_name[k] = fields[id(f)] = f.create_data(self.obj, self)
-            self._collected_fields = {"id": fields, "name":fields_by_name}
-        
-        return self._collected_fields
+    def loaded(self):
+        return self.loaded_data is not None
     
     def set(self, data=None, ids=None):
         if ids:
@@ -51,7 +77,7 @@ class ApiData(Logger):
                     raise InvalidIdException("Empty id field: %r" % i)
             except AttributeError:
                 raise InvalidIdException("Id field %r was not set" % i)
-        
+    
     def set_ids(self, **kwargs):
         for name, value in kwargs.items():
             if name not in self.get_id_fields_name():
@@ -68,25 +94,227 @@ class ApiData(Logger):
                 old_ids = self.get_ids()
             
             self.set_ids(id=data["id"])
+        
+        self.data = data
+        
+        values = None
+        if self.dirty:
+            # local changes are kept until they are sent, data has api values and simple fields keep assigned ones
+            data = dict(data, **dict((k, python_to_trello(v)) for k, v in self.dirty.items()))
+            values = dict(
+                (f.name, self.dirty[f.data_name]) for f in registry.objects.get_fields(self.obj.__class__).values()
+                if getattr(f, "data_name", None) in self.dirty
+            )
+        
+        # fields are decoded again from new data, created collections are kept
+        self.loaded_data = data
+        self.values = values
+        
+        self.data_version += 1
+        
+        # listeners get object with new data already set, eg. to merge it with other object under new id
+        if id_changed:
+            self.logger.info("Changed object id from %r to %r", old_ids, self.get_ids())
+            self._context.event_dispatcher.trigger("object.id_changed", self.obj, old_ids)
+    
+    # sets data loaded for already cached object and updates repository
+    def set_loaded_data(self, data):
+        self.set_data(data)
+        self._context.repository.update_object(self.obj)
+    
+    # returns data version and data for decoding fields, loads object when needed
+    def get_loaded_data(self, field=None):
+        if self.loaded_data is None:
+            self.load(field=field)
+        
+        version, data = self.data_version, self.loaded_data
+        if data is None:
+            raise Exception("No data to load")
+        return version, data
+    
+    # keeps field value, unless object data changed since it was decoded
+    def store_value(self, name, value, version=None):
+        with self._context.values_lock:
+            if version is not None and version != self.data_version:
+                return
+            if self.values is None:
+                self.values = {}
+            self.values[name] = value
+    
+    def store_collection(self, name, collection):
+        with self._context.values_lock:
+            if self.collections is None:
+                self.collections = {}
+            return self.collections.setdefault(name, collection)
+    
+    # merges changed values, eg. from actions, into object data
+    def patch(self, data):
+        if self.data is None:
+            # not loaded object has nothing to update
+            return
+        
+        data = dict(self.data, **data)
+        self.set_loaded_data(data)
+        self._context.repository.persist(self.obj, data)
+    
+    def _get_fields(self, cls, fields=None):
+        if fields is None:
+            fields = self._context.projection.get(cls)
+        
+        # stored objects are revalidated by its last activity date
+        activity_field = registry.objects.get_activity_field(cls)
+        if fields is not None and activity_field and self._context.repository.storage:
+            fields = fields + (activity_field,)
+        
+        return fields
+    
+    def get_load_parameters(self, parameters=None):
+        params = {"fields": self._get_fields(self.obj.__class__, self.fields)}
+        if parameters:
+            params.update(parameters)
+        return params
+    
+    def is_stored_valid(self, stored):
+        storage = self._context.repository.storage
+        
+        if storage.is_fresh(stored):
+            return True
+        
+        activity_field = registry.objects.get_activity_field(self.obj.__class__)
+        if activity_field is None or stored.last_activity is None:
+            return False
+        
+        data = self._context.connection.do_request(self.get_object_url(), {"fields": activity_field}, method="get")
+        if data.get(activity_field) != stored.last_activity:
+            return False
+        
+        storage.touch(self._context.repository.get_storage_key(self.obj))
+        return True
+    
+    # field is name of object field which triggered loading
+    def load(self, parameters=None, field=None):
+        self._context.metrics.inc("grello_loads_total", object=self.obj.__class__.__qualname__, field=field or "")
+        
+        if parameters:
+            self._load(parameters)
+            return
+        
+        version = self.data_version
+        thread = threading.get_ident()
+        
+        # concurrent loads of the same object wait for the one already running, lock is held only to register it
+        with self._context.repository.loading_lock:
+            loading = self.loading
+            if loading is None:
+                future = Future()
+                self.loading = (future, thread)
+        
+        if loading is not None:
+            future, owner = loading
+            if owner != thread:
+                future.result()
+                return
+            # nested load made by loading thread would wait for itself
+            self._load(version=version)
+            return
+        
+        try:
+            self._load(version=version)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(None)
+        finally:
+            self.loading = None
+    
+    # blocks loads of this object by other threads, eg. while data of its alias object is merged into it
+    @contextmanager
+    def exclusive(self):
+        thread = threading.get_ident()
+        while True:
+            with self._context.repository.loading_lock:
+                loading = self.loading
+                if loading is None:
+                    future = Future()
+                    self.loading = (future, thread)
+                    break
             
-            if id_changed:
-                self.logger.info("Changed object id from %r to %r", old_ids, self.get_ids())
-                self._context.event_dispatcher.trigger("object.id_changed", self.obj, old_ids)
+            if loading[1] == thread:
+                yield
+                return
+            wait((loading[0],))
         
-        for f in registry.objects.get_fields(self.obj.__class__).values():
-            f.get_data(self.obj).data_to_load = data
+        try:
+            yield
+        finally:
+            self.loading = None
+            future.set_result(None)
     
-        self.loaded = True
+    def _load(self, parameters=None, version=None):
+        if version is not None and version != self.data_version:
+            # loaded by other thread in meantime
+            return
+        
+        if self.stored is not None and not parameters:
+            stored, self.stored = self.stored, None
+            if self.is_stored_valid(stored):
+                self.logger.info("Using stored data for %r", self.get_ids())
+                self.set_loaded_data(stored.data)
+                return
+        
+        data = self._context.connection.do_request(self.get_object_url(), self.get_load_parameters(parameters), method="get")
+        self.set_loaded_data(data)
+        self._context.repository.persist(self.obj, data)
     
-    def load(self):
-        data = self._context.connection.do_request(self.get_object_url(), {"fields": registry.objects.get_default_fields(self.obj.__class__)}, method="get")
-        self.set_data(data)
+    # fetches field missing from loaded data together with other missing fields, with single request
+    def fetch_missing(self, name):
+        cls = self.obj.__class__
+        # next objects of the same class are loaded with this field
+        self._context.projection.learn(cls, name)
+        
+        data = self.loaded_data
+        fields = tuple(f for f in self._get_fields(cls, self.fields) or () if f not in data)
+        if name not in fields:
+            fields += (name,)
+        
+        self.logger.debug("Fetching missing fields %r of %r", fields, self.get_ids())
+        self._context.metrics.inc("grello_field_fetches_total", object=cls.__qualname__, field=name)
+        self.patch(self._context.connection.do_request(self.get_object_url(), {"fields": fields}, method="get"))
+    
+    # changes are sent when transaction is flushed, if there is any
+    def update_field(self, name, value):
+        transaction = self._context.current_transaction
+        if transaction is not None:
+            if self.dirty is None:
+                self.dirty = {}
+            self.dirty[name] = value
+            transaction.add(self, name, value)
+        else:
+            self._context.connection.do_request("%s/%s" % (self.get_object_url(), name), parameters={"value": python_to_trello(value)}, method="put")
+        
+        self._context.repository.indexes.update(self.obj, {name: python_to_trello(value)}, partial=True)
+    
+    def clean(self, changes):
+        if self.dirty is None:
+            return
+        for name, value in changes.items():
+            if self.dirty.get(name, value) == value:
+                self.dirty.pop(name, None)
+    
+    # drops changes which failed to be sent, fields and indexes are read again from last fetched data
+    def revert(self, changes):
+        self.clean(changes)
+        if self.data is not None:
+            self.set_loaded_data(self.data)
+        else:
+            self.values = None
+            self._context.repository.indexes.remove(self.obj)
     
     def get_field(self, field_or_name):
         if isinstance(field_or_name, str):
-            return self._fields["name"][field_or_name]
-        else:
-            return self._fields["id"][id(field_or_name)]
+            field_or_name = registry.objects.get_fields(self.obj.__class__)[field_or_name]
+        return fields.ApiData(field_or_name, self)
     
     def get_object_url(self):
         return registry.objects.get_url(self.obj.__class__).format(**self.get_ids())
@@ -94,19 +322,59 @@ class ApiData(Logger):
     def get_ids(self):
         return OrderedDict((name, getattr(self.obj, name)) for name in self.get_id_fields_name())
     
-    def fetch_objects(self, url, cls, parameters=None, **kwargs):
+    def fetch_objects(self, url, cls, parameters=None, embedded=None, **kwargs):
+        # objects already nested in parent data, eg. from expanded board request
+        if embedded is not None:
+            return self._context.repository.get_objects(cls, embedded, persist=False, **kwargs)
+        
         parameters = parameters or {}
-        parameters.update({"fields": registry.objects.get_default_fields(cls)})
+        parameters.update({"fields": self._get_fields(cls)})
         
-        data = self.do_request(url, method="get", parameters=parameters)
+        # items are created while response is read
+        data = self.do_request(url, method="get", parameters=parameters, stream=True)
         return self._context.repository.get_objects(cls, data=data, **kwargs)
     
+    # fetches objects page by page, next page is requested only when previous one is consumed,
+    # only for endpoints documented to return newest items first and to page with "before", eg. boards/{id}/cards
+    def stream_objects(self, url, cls, parameters=None, embedded=None, page_size=None, **kwargs):
+        repository = self._context.repository
+        
+        if embedded is not None:
+            yield from repository.iter_objects(cls, embedded, persist=False, **kwargs)
+            return
+        
+        page_size = page_size or self.page_size
+        
+        parameters = dict(parameters or {})
+        parameters.update({"fields": self._get_fields(cls), "limit": page_size})
+        
+        previous = None
+        while True:
+            page = self.do_request(url, method="get", parameters=dict(parameters), stream=True)
+            
+            count = 0
+            before = previous
+            for i in page:
+                count += 1
+                # ids are ordered by creation time, newer ones were already returned by previous page
+                if previous is not None and i["id"] >= previous:
+                    continue
+                if before is None or i["id"] < before:
+                    before = i["id"]
+                yield repository.get_object(cls, i, **kwargs)
+            
+            # short page is the last one, page without older items means "before" is ignored by api
+            if count < page_size or before == previous:
+                return
+            
+            parameters["before"] = previous = before
+    
     def fetch_object(self, url, cls, parameters=None, method='post', **kwargs):
         return self._context.repository.get_object(cls,
             data=self.do_request(url, method=method, parameters=parameters),
             **kwargs
         )
     
-    def do_request(self, url, parameters=None, method='get'):
+    def do_request(self, url, parameters=None, method='get', **kwargs):
         url = url.format(**self.get_ids())
-        return self._context.connection.do_request(url, parameters, method)
+        return self._context.connection.do_request(url, parameters, method, **kwargs)
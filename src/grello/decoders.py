@@ -0,0 +1,145 @@
+'''
+Created on 18.10.2026
+
+@author: glorpen
+'''
+import codecs
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+_whitespace = " \t\n\r"
+
+# Decodes api responses with stdlib json module.
+class JsonDecoder(object):
+    
+    name = "json"
+    # bytes read at once by streaming parser
+    chunk_size = 64 * 1024
+    # responses of known and smaller length (before decompression) are decoded at once, with faster decoder
+    stream_threshold = 1024 * 1024
+    
+    def loads(self, data):
+        return json.loads(data)
+    
+    def decode(self, response):
+        return response.json()
+    
+    def is_streamed(self, response):
+        length = response.headers.get("Content-Length")
+        return not (isinstance(length, str) and length.isdigit() and int(length) <= self.stream_threshold)
+    
+    # yields items of json array as soon as they are read, without keeping whole response
+    def iter_array(self, response):
+        try:
+            if self.is_streamed(response):
+                yield from self.iter_array_chunks(response.iter_content(self.chunk_size))
+            else:
+                items = self.decode(response)
+                if not isinstance(items, list):
+                    raise ValueError("Expected json array, got %r" % type(items))
+                yield from items
+        finally:
+            response.close()
+    
+    def iter_array_chunks(self, chunks):
+        decoder = json.JSONDecoder()
+        text_decoder = codecs.getincrementaldecoder("utf-8")()
+        chunks = iter(chunks)
+        
+        buffer = ""
+        pos = 0
+        started = False
+        finished = False
+        eof = False
+        
+        while True:
+            # skip whitespace and separators, then decode item when it is followed by more data
+            while pos < len(buffer) and buffer[pos] in _whitespace:
+                pos += 1
+            
+            if pos < len(buffer):
+                c = buffer[pos]
+                if not started:
+                    if c != "[":
+                        raise ValueError("Expected json array, got %r" % c)
+                    started = True
+                    pos += 1
+                    continue
+                
+                if finished:
+                    raise ValueError("Unexpected data after json array: %r" % c)
+                
+                if c == "]":
+                    finished = True
+                    pos += 1
+                    continue
+                
+                if c == ",":
+                    pos += 1
+                    continue
+                
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+                except ValueError:
+                    if eof:
+                        raise
+                    item = end = None
+                
+                # scalar items can be cut in half at buffer end, eg. numbers
+                if end is not None and (end < len(buffer) or eof):
+                    yield item
+                    pos = end
+                    continue
+            
+            if eof:
+                if not finished:
+                    raise ValueError("Unterminated json array")
+                return
+            
+            # drop consumed text before reading more
+            buffer = buffer[pos:]
+            pos = 0
+            
+            try:
+                buffer += text_decoder.decode(next(chunks))
+            except StopIteration:
+                buffer += text_decoder.decode(b"", final=True)
+                eof = True
+
+# Faster decoders, used when installed.
+
+class OrjsonDecoder(JsonDecoder):
+    
+    name = "orjson"
+    
+    def loads(self, data):
+        return orjson.loads(data)
+    
+    def decode(self, response):
+        return orjson.loads(response.content)
+
+class UjsonDecoder(JsonDecoder):
+    
+    name = "ujson"
+    
+    def loads(self, data):
+        return ujson.loads(data)
+    
+    def decode(self, response):
+        return ujson.loads(response.content)
+
+def get_default_decoder():
+    if orjson is not None:
+        return OrjsonDecoder()
+    if ujson is not None:
+        return UjsonDecoder()
+    return JsonDecoder()
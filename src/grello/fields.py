@@ -3,85 +3,122 @@ Created on 21.01.2017
 
 @author: glorpen
 '''
-import functools
-from grello.utils import python_to_trello, fill_args
-from inspect import signature
+from grello.utils import InjectionPlan
 
+# Handle for single field of an object, values are kept by object's ApiData.
 class ApiData(object):
-    data_to_load = None
     
-    def __init__(self, data_requestor, loader, setter=None):
-        super(ApiData, self).__init__()
-        
-        self._data_requestor = data_requestor
-        self._loader = loader
-        self._setter = setter
+    __slots__ = ("field", "api_data")
     
-    def _do_load(self, data, **kwargs):
-        return self._loader(data, **kwargs)
+    def __init__(self, field, api_data):
+        super(ApiData, self).__init__()
+        self.field = field
+        self.api_data = api_data
     
     @property
     def loaded(self):
-        return hasattr(self.value)
+        return self.field.is_loaded(self.api_data)
+    
+    @property
+    def value(self):
+        return self.field.get_value(self.api_data)
     
     def get_value(self):
-        
-        if self.data_to_load is None and not hasattr(self, "value"):
-            self._data_requestor()
-        
-        if self.data_to_load is not None:
-            self.value = self._do_load(self.data_to_load)
-            self.data_to_load = None
-        
-        try:
-            return self.value
-        except AttributeError:
-            raise Exception("No data to load") from None
+        return self.field.get_value(self.api_data)
     
     def set_value(self, value):
-        if self._setter is None:
-            raise Exception("Setting value is not supported")
-        self._setter(value)
-        self.value = value
-        self.data_to_load = None
+        self.field.set_value(self.api_data, value)
 
+# Fields are shared by all objects of a class, so object state is passed as its ApiData.
 class api_field(object):
     
     f_loader = None
     f_setter = None
     
+    loader_plan = None
+    setter_plan = None
+    
+    name = None
+    # data key read by field, missing one is fetched
+    data_name = None
+    
+    # decoded values are kept until object data changes
+    cached = True
+    # missing data field is fetched alone when loader fails to find it
+    fetch_missing = True
+    
     def __init__(self, loader=None):
         super(api_field, self).__init__()
         if loader:
             self.loader(loader)
     
-    def create_data(self, obj, api_data):
-        return ApiData(
-            loader = fill_args(self.f_loader, obj),
-            setter = fill_args(self.f_setter, obj) if self.f_setter else None,
-            data_requestor = api_data.load
-        )
-    
-    def get_data(self, obj):
-        from grello.context import manager
-        # TODO:
-        context = manager.find_context(obj)
-        api_data = context.repository.get_object_api_data(obj)
-        
-        return api_data.get_field(self)
+    def __set_name__(self, owner, name):
+        if self.name is None:
+            self.name = name
+    
+    def get_api_data(self, obj):
+        try:
+            return obj._api_data
+        except AttributeError:
+            from grello.context import manager
+            return manager.find_context(obj).repository.get_object_api_data(obj)
     
     def __get__(self, obj, cls=None):
-        return self.get_data(obj).get_value()
+        return self.get_value(self.get_api_data(obj))
     
     def __set__(self, obj, value):
-        return self.get_data(obj).set_value(value)
+        return self.set_value(self.get_api_data(obj), value)
+    
+    def decode(self, api_data, data, **kwargs):
+        return self.loader_plan.call(api_data, data, **kwargs)
+    
+    def _decode_fetching(self, api_data, data):
+        try:
+            return self.decode(api_data, data)
+        except KeyError as e:
+            # other errors of loaders are not hidden by requests
+            if not self.fetch_missing or self.data_name is None or e.args != (self.data_name,) or self.data_name in data:
+                raise
+        
+        # field was not included in loaded data
+        api_data.fetch_missing(self.data_name)
+        return self.decode(api_data, api_data.loaded_data)
+    
+    def is_loaded(self, api_data):
+        values = api_data.values
+        return values is not None and self.name in values
+    
+    def get_value(self, api_data):
+        values = api_data.values
+        if values is not None:
+            try:
+                return values[self.name]
+            except KeyError:
+                pass
+        
+        version, data = api_data.get_loaded_data(self.name)
+        value = self._decode_fetching(api_data, data)
+        
+        if self.cached:
+            api_data.store_value(self.name, value, version)
+        
+        return value
+    
+    def set_value(self, api_data, value):
+        if self.setter_plan is None:
+            raise Exception("Setting value is not supported")
+        
+        self.setter_plan.call(api_data, value)
+        api_data.store_value(self.name, value)
     
     def loader(self, f):
         self.f_loader = f
+        self.loader_plan = InjectionPlan.get(f)
         return self
     
     def setter(self, f):
         self.f_setter = f
+        self.setter_plan = InjectionPlan.get(f)
         return self
 
 class simple_api_field(api_field):
@@ -90,136 +127,215 @@ class simple_api_field(api_field):
     
     def __init__(self, data_name, writable=True):
         super(simple_api_field, self).__init__(loader=self.simple_loader)
+        self.setter(self.f_setter)
         self.data_name = data_name
         self.writable = writable
     
-    def simple_loader(self, obj, data):
+    def loader(self, f):
+        # plain values are read from object data on each access, only custom loaders results are kept
+        self.cached = f != self.simple_loader
+        return super(simple_api_field, self).loader(f)
+    
+    def decode(self, api_data, data, **kwargs):
+        if self.cached:
+            return super(simple_api_field, self).decode(api_data, data, **kwargs)
+        return self.simple_loader(api_data.obj, data, api_data)
+    
+    def simple_loader(self, obj, data, api_data):
         return data[self.data_name]
     
-    def f_setter(self, obj, value, connection, api_data):
+    def is_loaded(self, api_data):
+        if super(simple_api_field, self).is_loaded(api_data):
+            return True
+        data = api_data.loaded_data
+        return data is not None and self.data_name in data
+    
+    def f_setter(self, obj, value, api_data):
         if not self.writable:
             raise AttributeError("Trello field %s is not writable" % self.data_name)
         
-        # skip request if value didn't change
-        if self.__get__(obj) == value:
+        # skip request if value didn't change, unknown value is not loaded just for comparison
+        if self.is_loaded(api_data) and self.get_value(api_data) == value:
             return
         
-        value = python_to_trello(value)
-        
-        connection.do_request("%s/%s" % (api_data.get_object_url(), self.data_name), parameters={"value": value}, method="put")
+        api_data.update_field(self.data_name, value)
 
 
 class ApiCollection(object):
     
-    _api_add = None
-    _api_remove = None
+    # state of partially fetched collection is kept in _loading: fetched items and items generator
+    __slots__ = ("_field", "_api_data", "_data", "_kwargs", "_items", "_loading", "_lock")
     
-    def __init__(self, items_generator, adder=None, remover=None):
+    def __init__(self, field, api_data, data, kwargs=None):
         super(ApiCollection, self).__init__()
-        self._items_generator = items_generator
-        
-        self._api_add = adder
-        self._api_remove = remover
+        self._field = field
+        self._api_data = api_data
+        self._data = data
+        self._kwargs = kwargs
+        self._loading = None
+        # guards only this collection, next page is fetched by single iterating thread
+        self._lock = api_data._context.create_lock()
+    
+    def _items_generator(self):
+        return self._field.decode(self._api_data, self._data, **(self._kwargs or {}))
     
     @property
     def items(self):
         try:
             return self._items
         except AttributeError:
-            self._items = list(self._items_generator())
+            for _ in self._iter_loading():
+                pass
             return self._items
     
+    # yields items as they are fetched, fetched ones are kept for next iterations
+    def _iter_loading(self):
+        with self._lock:
+            if self._loading is None and not self.loaded:
+                self._loading = ([], iter(self._items_generator()))
+            loading = self._loading
+        
+        if loading is None:
+            yield from self._items
+            return
+        
+        items, generator = loading
+        i = 0
+        while True:
+            with self._lock:
+                if i >= len(items):
+                    if self.loaded:
+                        return
+                    
+                    try:
+                        item = next(generator)
+                    except StopIteration:
+                        self._items = items
+                        self._loading = None
+                        return
+                    except:
+                        self._loading = None
+                        raise
+                    
+                    items.append(item)
+                    self._field.on_add(self._api_data, item)
+                
+                item = items[i]
+            
+            yield item
+            i += 1
+    
+    # yields items without keeping them in collection, so memory usage does not grow with collection size
+    def stream(self):
+        if self.loaded:
+            yield from self._items
+        else:
+            yield from self._items_generator()
+    
     @property
     def loaded(self):
         return hasattr(self, "_items")
     
     def add(self, *args, **kwargs):
-        if self._api_add is None:
-            raise Exception("Adding is not supported")
-        
-        item = self._api_add(*args, **kwargs)
+        item = self._field.add_item(self._api_data, *args, **kwargs)
         
         if not self.loaded:
             return item
         
-        self.items.append(item)
+        self.append(item)
         return item
     
     def remove(self, item):
-        if self._api_remove is None:
-            raise Exception("Removing is not supported")
-        
-        self._api_remove(item)
+        self._field.remove_item(self._api_data, item)
         
         if not self.loaded:
             return
         
         self.items.remove(item)
+        self._field.on_remove(self._api_data, item)
+    
+    # adds item to loaded collection without api request
+    def append(self, item):
+        self.items.append(item)
+        self._field.on_add(self._api_data, item)
+    
+    # removes item from loaded collection, if present, without api request
+    def discard(self, item):
+        try:
+            self.items.remove(item)
+        except ValueError:
+            return
+        
+        self._field.on_remove(self._api_data, item)
     
     def __repr__(self):
         return '<ApiCollection: %r>' % (self.items,)
     
     def __iter__(self):
-        yield from self.items
+        if self.loaded:
+            return iter(self._items)
+        return self._iter_loading()
     def __len__(self):
         return len(self.items)
     
     def __call__(self, **kwargs):
-        return self.__class__(
-            functools.partial(self._items_generator, **kwargs),
-            self._api_add,
-            self._api_remove
-        )
-
-
-class CollectionApiData(ApiData):
-    
-    def __init__(self, adder=None, remover=None, **kwargs):
-        super(CollectionApiData, self).__init__(**kwargs)
-        
-        self.f_add = adder
-        self.f_remove = remover
-    
-    def _do_load(self, data):
-        loader = functools.partial(super(CollectionApiData, self)._do_load, data)
-    
-        return ApiCollection(
-            loader,
-            adder=self.f_add,
-            remover=self.f_remove
-        )
-    
-    def set_value(self, value):
-        raise AttributeError("Collection cannot be replaced")
-    
-    def get_value(self):
-        try:
-            return self.value
-        except AttributeError:
-            pass
-        
-        return super(CollectionApiData, self).get_value()
+        return self.__class__(self._field, self._api_data, self._data, dict(self._kwargs or {}, **kwargs))
 
 class collection_api_field(api_field):
     
     f_add = None
     f_remove = None
     
+    add_plan = None
+    remove_plan = None
+    
+    fetch_missing = False
+    
     def setter(self, f):
         raise AttributeError("Collection cannot be replaced")
     
     def add(self, f):
         self.f_add = f
+        self.add_plan = InjectionPlan.get(f)
         return self
     
     def remove(self, f):
         self.f_remove = f
+        self.remove_plan = InjectionPlan.get(f)
         return self
     
-    def create_data(self, obj, api_data):
-        return CollectionApiData(
-            loader = fill_args(self.f_loader, obj),
-            remover = fill_args(self.f_remove, obj) if self.f_remove else None,
-            adder = fill_args(self.f_add, obj) if self.f_add else None,
-            data_requestor = api_data.load
-        )
+    def is_loaded(self, api_data):
+        collections = api_data.collections
+        return collections is not None and self.name in collections and collections[self.name].loaded
+    
+    def get_value(self, api_data):
+        collections = api_data.collections
+        if collections is not None:
+            try:
+                return collections[self.name]
+            except KeyError:
+                pass
+        
+        _, data = api_data.get_loaded_data(self.name)
+        # collection is created only once, even when loaded by many threads
+        return api_data.store_collection(self.name, ApiCollection(self, api_data, data))
+    
+    def set_value(self, api_data, value):
+        raise AttributeError("Collection cannot be replaced")
+    
+    def add_item(self, api_data, *args, **kwargs):
+        if self.add_plan is None:
+            raise Exception("Adding is not supported")
+        return self.add_plan.call(api_data, *args, **kwargs)
+    
+    def remove_item(self, api_data, item):
+        if self.remove_plan is None:
+            raise Exception("Removing is not supported")
+        self.remove_plan.call(api_data, item)
+    
+    # collection items are referenced by its owner, used for dispatching targeted events
+    def on_add(self, api_data, item):
+        api_data._context.event_dispatcher.add_reference(api_data.obj, item)
+    
+    def on_remove(self, api_data, item):
+        api_data._context.event_dispatcher.remove_reference(api_data.obj, item)
@@ -0,0 +1,123 @@
+'''
+Created on 18.10.2026
+
+@author: glorpen
+'''
+import re
+import threading
+
+re_id = re.compile(r"^([0-9a-fA-F]{24}|[0-9a-fA-F]{64}|[0-9]+)$")
+
+# replaces ids in request uri, so requests for different objects are counted together
+def get_endpoint_template(uri):
+    return "/".join("{id}" if re_id.match(p) else p for p in uri.split("?", 1)[0].split("/"))
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_labels(labels, extra=None):
+    labels = list(labels)
+    if extra:
+        labels.append(extra)
+    if not labels:
+        return ""
+    return "{%s}" % ",".join('%s="%s"' % (k, _escape(v)) for k, v in labels)
+
+# In-process counters and histograms, labels are passed as keyword arguments.
+class Metrics(object):
+    
+    buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+    
+    def __init__(self, buckets=None):
+        super(Metrics, self).__init__()
+        if buckets is not None:
+            self.buckets = tuple(sorted(buckets))
+        
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+    
+    def _get_key(self, name, labels):
+        return (name, tuple(sorted(labels.items())))
+    
+    def inc(self, name, value=1, **labels):
+        key = self._get_key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+    
+    def observe(self, name, value, **labels):
+        key = self._get_key(name, labels)
+        with self._lock:
+            try:
+                h = self._histograms[key]
+            except KeyError:
+                # count per bucket, then sum and count of all values
+                h = self._histograms[key] = [0] * (len(self.buckets) + 2)
+            
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    h[i] += 1
+                    break
+            h[-2] += value
+            h[-1] += 1
+    
+    def get(self, name, **labels):
+        with self._lock:
+            return self._counters.get(self._get_key(name, labels), 0)
+    
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = dict((k, list(v)) for k, v in self._histograms.items())
+        
+        ret = {"counters": {}, "histograms": {}}
+        for (name, labels), value in counters.items():
+            ret["counters"].setdefault(name, []).append((dict(labels), value))
+        
+        for (name, labels), h in histograms.items():
+            ret["histograms"].setdefault(name, []).append((dict(labels), {
+                "buckets": list(zip(self.buckets, h[:-2])),
+                "sum": h[-2],
+                "count": h[-1],
+            }))
+        
+        return ret
+    
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+    
+    def to_prometheus(self):
+        snapshot = self.snapshot()
+        lines = []
+        
+        for name in sorted(snapshot["counters"]):
+            lines.append("# TYPE %s counter" % name)
+            for labels, value in sorted(snapshot["counters"][name], key=lambda i: sorted(i[0].items())):
+                lines.append("%s%s %s" % (name, _format_labels(sorted(labels.items())), value))
+        
+        for name in sorted(snapshot["histograms"]):
+            lines.append("# TYPE %s histogram" % name)
+            for labels, h in sorted(snapshot["histograms"][name], key=lambda i: sorted(i[0].items())):
+                labels = sorted(labels.items())
+                cumulative = 0
+                for b, count in h["buckets"]:
+                    cumulative += count
+                    lines.append("%s_bucket%s %d" % (name, _format_labels(labels, ("le", b)), cumulative))
+                lines.append("%s_bucket%s %d" % (name, _format_labels(labels, ("le", "+Inf")), h["count"]))
+                lines.append("%s_sum%s %s" % (name, _format_labels(labels), h["sum"]))
+                lines.append("%s_count%s %d" % (name, _format_labels(labels), h["count"]))
+        
+        return "\n".join(lines) + "\n"
+
+# Default metrics, nothing is collected.
+class NullMetrics(Metrics):
+    
+    def inc(self, name, value=1, **labels):
+        pass
+    
+    def observe(self, name, value, **labels):
+        pass
+
+null_metrics = NullMetrics()
@@ -8,6 +8,14 @@ from grello.fields import api_field, simple_api_field, collection_api_field
 import datetime
 from grello.registry import events, api_object
 
+# moves flat list of nested resources (eg. cards from expanded board) into parent's data
+def _nest(parents, children, name, ref):
+    by_parent = {}
+    for c in children:
+        by_parent.setdefault(c[ref], []).append(c)
+    for p in parents:
+        p.setdefault(name, by_parent.get(p["id"], []))
+
 @api_object(
     url = "cards/{card_id}/attachments/{id}"
 )
@@ -80,7 +88,7 @@ class Checklist(object):
     
     @collection_api_field
     def items(self, data, api_data):
-        return api_data.fetch_objects("checklists/{id}/checkItems", Checkitem, checklist_id=self.id, card_id=self.card.id)
+        return api_data.fetch_objects("checklists/{id}/checkItems", Checkitem, embedded=data.get("checkItems"), checklist_id=self.id, card_id=self.card.id)
     
     @items.remove
     def items(self, connection, item):
@@ -96,7 +104,9 @@ class Checklist(object):
 
 @api_object(
     url = "cards/{id}",
-    default_fields = ("name","desc","subscribed","closed","dueComplete","due","idAttachmentCover","idBoard", "idList")
+    default_fields = ("name","desc","subscribed","closed","dueComplete","due","idAttachmentCover","idBoard", "idList"),
+    activity_field = "dateLastActivity",
+    alias_fields = ("shortLink",)
 )
 class Card(object):
 
@@ -124,8 +134,8 @@ class Card(object):
         return repository.get_object(List, id=data["idList"])
     
     @list.setter
-    def cover(self, connection, list):
-        connection.do_request("cards/%s" % self.id, method="put", parameters={"idList": list.id})
+    def cover(self, api_data, list):
+        api_data.update_field("idList", list.id)
     
     @due.loader
     def due(self, data):
@@ -134,7 +144,7 @@ class Card(object):
     
     @collection_api_field
     def attachments(self, data, api_data):
-        return api_data.fetch_objects("cards/{id}/attachments", Attachment, card_id = self.id)
+        return api_data.fetch_objects("cards/{id}/attachments", Attachment, embedded=data.get("attachments"), card_id = self.id)
     
     @attachments.add
     def attachments(self, connection, repository, file=None, name=None, url=None, mime_type=None):
@@ -154,6 +164,8 @@ class Card(object):
     @collection_api_field
     def labels(self, data, api_data, repository):
         # TODO: should add new labels to board.labels.items, change it to set() ? 
+        if "labels" in data:
+            return repository.get_objects(Label, data["labels"], persist=False)
         return (repository.get_object(Label, id=i) for i in api_data.do_request("cards/{id}/idLabels"))
     
     @labels.add
@@ -175,17 +187,13 @@ class Card(object):
         connection.do_request("cards/%s/idLabels/%s" % (self.id, label.id), method="delete")
         event_dispatcher.trigger("label.unassigned", self, label)
     
-    @events.listener("label.removed")
+    @events.listener("label.removed", target="subject")
     def on_label_removed(self, source, subject):
-        # labels are fetched together with Card data
-        try:
-            self.labels.items.remove(subject)
-        except ValueError:
-            pass
+        self.labels.discard(subject)
     
     @collection_api_field
     def checklists(self, data, api_data):
-        return api_data.fetch_objects("cards/{id}/checklists", Checklist)
+        return api_data.fetch_objects("cards/{id}/checklists", Checklist, embedded=data.get("checklists"))
     
     @checklists.add
     def checklists(self, api_data, name, pos=None):
@@ -205,14 +213,14 @@ class Card(object):
             return repository.get_object(Attachment, card_id = self.id, id = cover_id)
     
     @cover.setter
-    def cover(self, connection, attachment):
-        connection.do_request("cards/%s/idAttachmentCover" % self.id, method="put", parameters={"value": attachment.id})
+    def cover(self, api_data, attachment):
+        api_data.update_field("idAttachmentCover", attachment.id)
 
     # TODO board getter?
     
     @collection_api_field
     def members(self, data, api_data):
-        return api_data.fetch_objects("cards/{id}/members", Member)
+        return api_data.fetch_objects("cards/{id}/members", Member, embedded=data.get("members"))
     
     @members.add
     def members(self, connection, member):
@@ -235,10 +243,12 @@ class List(object):
     
     @collection_api_field
     def cards(self, data, api_data, filter=Card.FILTER_VISIBLE):
-        url = ""
+        parameters = {}
         if filter != Card.FILTER_VISIBLE:
-            url = "?filter=%s" % filter
-        return api_data.fetch_objects("lists/{id}/cards" + url, Card)
+            parameters["filter"] = filter
+            # embedded cards are fetched with default filter
+            data = {}
+        return api_data.fetch_objects("lists/{id}/cards", Card, parameters, embedded=data.get("cards"))
     
     @cards.add
     def cards(self, repository, connection, name, description=None, members=None, due=None):
@@ -261,10 +271,21 @@ class List(object):
 
 @api_object(
     url = "boards/{id}",
-    default_fields = ("name", "desc", "subscribed")
+    default_fields = ("name", "desc", "subscribed"),
+    activity_field = "dateLastActivity",
+    alias_fields = ("shortLink",)
 )
 class Board(Logger):
     
+    # nested resources fetched with Api.get_board(id, expand=True)
+    EXPAND_ALL = {
+        "lists": "open",
+        "cards": "visible",
+        "labels": "all",
+        "members": "all",
+        "checklists": "all",
+    }
+    
     name = simple_api_field("name")
     description = simple_api_field("desc")
     subscribed = simple_api_field("subscribed")
@@ -272,9 +293,34 @@ class Board(Logger):
     def __repr__(self):
         return '<Board %r>' % (self.id,)
     
+    # applies changes made since last sync to cached objects, first call only marks starting point
+    # so changes made between fetching the board and first call are not applied
+    def sync(self, since=None):
+        from grello.context import manager
+        return manager.find_context(self).actions.sync(self, "boards/{id}/actions", since)
+    
+    # writes board with its lists, cards, labels, members and loaded card collections to file
+    def export(self, path):
+        from grello.context import manager
+        from grello.snapshot import SnapshotWriter
+        return SnapshotWriter(manager.find_context(self).repository, path).write(self)
+    
     @collection_api_field
     def lists(self, data, api_data):
-        return api_data.fetch_objects("boards/{id}/lists", List)
+        # flat lists from expanded board response, snapshots have cards already nested
+        if isinstance(data.get("lists"), list) and "cards" in data:
+            cards = data["cards"]
+            
+            if "checklists" in data:
+                _nest(cards, data["checklists"], "checklists", "idCard")
+            if "members" in data:
+                members = dict((m["id"], m) for m in data["members"])
+                for c in cards:
+                    c.setdefault("members", [members[i] for i in c.get("idMembers", ()) if i in members])
+            
+            _nest(data["lists"], cards, "cards", "idList")
+        
+        return api_data.fetch_objects("boards/{id}/lists", List, embedded=data.get("lists"))
     
     @lists.add
     def lists(self, api_data, name, pos=None):
@@ -286,11 +332,7 @@ class Board(Logger):
     
     @collection_api_field
     def labels(self, data, api_data):
-        items = api_data.fetch_objects("boards/{id}/labels", Label, parameters={"limit":1000})
-        # hm, there is no pagination
-        if len(items) == 1000:
-            self.logger.error("Label count for %r exceeds 1000 limit, adding new labels will create duplicates", self)
-        return items
+        return api_data.fetch_objects("boards/{id}/labels", Label, embedded=data.get("labels"))
     
     @labels.add
     def labels(self, api_data, name, color = None):
@@ -301,17 +343,24 @@ class Board(Logger):
         connection.do_request("labels/%s" % label.id, method='delete')
         event_dispatcher.trigger("label.removed", self, label)
     
-    @events.listener("label.created")
+    # label belongs to single board, only ones created by its loaded cards are added here
+    @events.listener("label.created", target="source")
     def on_label_created(self, api_data, source, label):
-        if source is self:
-            return
         if api_data.get_field("labels").loaded:
             if label not in self.labels.items:
-                self.labels.items.append(label)
+                self.labels.append(label)
+    
+    @collection_api_field
+    def cards(self, data, api_data, filter=Card.FILTER_VISIBLE):
+        parameters = {}
+        if filter != Card.FILTER_VISIBLE:
+            parameters["filter"] = filter
+            data = {}
+        return api_data.stream_objects("boards/{id}/cards", Card, parameters, embedded=data.get("cards"))
     
     @collection_api_field
     def members(self, data, api_data):
-        return api_data.fetch_objects("board/{id}/members", Member)
+        return api_data.fetch_objects("board/{id}/members", Member, embedded=data.get("members"))
     
 @api_object(
     url = "notifications/{id}"
@@ -346,7 +395,8 @@ class Notification(object):
 
 @api_object(
     url = "members/{id}",
-    default_fields = ("email","username","fullName","url")
+    default_fields = ("email","username","fullName","url"),
+    alias_fields = ("username",)
 )
 class Member(object):
     
@@ -365,5 +415,5 @@ class Member(object):
     
     @collection_api_field
     def notifications(self, data, api_data):
-        return api_data.fetch_objects("members/{id}/notifications", Notification)
+        return api_data.stream_objects("members/{id}/notifications", Notification)
     
\ No newline at end of file
@@ -0,0 +1,213 @@
+'''
+Created on 18.10.2026
+
+@author: glorpen
+'''
+import threading
+import time
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
+from grello.connection import Api, Connection
+from grello.storage import Storage, StoredData
+from grello.utils import Logger
+
+# only fields visible with any token are shared between users, other ones are fetched by each user
+public_fields = {
+    "Member": ("id", "username", "fullName", "initials", "avatarHash", "url"),
+    "Board": ("id", "name", "desc", "closed", "url", "shortUrl", "shortLink", "prefs", "dateLastActivity"),
+}
+
+def _get_public(data, class_name):
+    return dict((k, data[k]) for k in public_fields[class_name] if k in data)
+
+def _public_member(data):
+    return _get_public(data, "Member")
+
+def _public_board(data):
+    # boards are shared only when fetched with "prefs" field
+    prefs = data.get("prefs")
+    if isinstance(prefs, dict) and prefs.get("permissionLevel") == "public":
+        return _get_public(data, "Board")
+
+class SharedData(StoredData):
+    pass
+
+# Data of objects visible with any token, eg. member profiles and public boards, shared by all users of ApiPool.
+class SharedCache(object):
+    
+    # class name to function returning shareable part of data or None
+    filters = {
+        "Member": _public_member,
+        "Board": _public_board,
+    }
+    
+    def __init__(self, max_entries=100000, max_age=300):
+        super(SharedCache, self).__init__()
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.stats = {"hits": 0, "misses": 0}
+        
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._data)
+    
+    # storage keys are built by Repository, eg. "Member['member_id']"
+    def _get_filter(self, uid):
+        return self.filters.get(uid[:uid.find("[")])
+    
+    def is_fresh(self, stored):
+        return stored.fetched + self.max_age > time.time()
+    
+    def load(self, uid):
+        with self._lock:
+            stored = self._data.get(uid)
+            if stored is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            self._data.move_to_end(uid)
+        # data of loaded objects is changed by its users, eg. with fetched missing fields
+        return SharedData(dict(stored.data), stored.fetched, stored.last_activity)
+    
+    def save(self, uid, data, last_activity=None):
+        f = self._get_filter(uid)
+        data = f(data) if f else None
+        if data is None:
+            return
+        
+        with self._lock:
+            self._data[uid] = SharedData(data, time.time(), last_activity)
+            self._data.move_to_end(uid)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+    
+    def touch(self, uid):
+        with self._lock:
+            stored = self._data.get(uid)
+            if stored is not None:
+                stored.fetched = time.time()
+    
+    def remove(self, uid):
+        with self._lock:
+            self._data.pop(uid, None)
+
+# Storage of single user reading shared data first, other data is kept in wrapped storage.
+class SharedStorage(Storage):
+    
+    def __init__(self, shared, storage=None):
+        super(SharedStorage, self).__init__()
+        self.shared = shared
+        self.storage = storage
+    
+    def load(self, uid):
+        stored = self.shared.load(uid)
+        if stored is None and self.storage is not None:
+            stored = self.storage.load(uid)
+        return stored
+    
+    def is_fresh(self, stored):
+        if isinstance(stored, SharedData):
+            return self.shared.is_fresh(stored)
+        return self.storage.is_fresh(stored)
+    
+    def save(self, uid, data, last_activity=None):
+        self.shared.save(uid, data, last_activity)
+        if self.storage is not None:
+            self.storage.save(uid, data, last_activity)
+    
+    def touch(self, uid):
+        self.shared.touch(uid)
+        if self.storage is not None:
+            self.storage.touch(uid)
+    
+    def remove(self, uid):
+        self.shared.remove(uid)
+        if self.storage is not None:
+            self.storage.remove(uid)
+    
+    def flush(self):
+        if self.storage is not None:
+            self.storage.flush()
+
+# Api instances for many users of one app, sharing http connections.
+# Least recently used ones are disconnected when there is more than max_tenants of them.
+class ApiPool(Logger):
+    
+    connection_class = Connection
+    
+    def __init__(self, app_key, app_secret, max_tenants=None, shared_cache=None, storage_factory=None,
+                 pool_connections=10, pool_maxsize=100, rate_limiter=None, metrics=None, decoder=None, **api_kwargs):
+        super(ApiPool, self).__init__()
+        self.app_key = app_key
+        self.app_secret = app_secret
+        self.max_tenants = max_tenants
+        self.shared_cache = shared_cache
+        # creates storage for given token, storages keep data of single user
+        self.storage_factory = storage_factory
+        
+        self.rate_limiter = rate_limiter
+        self.metrics = metrics
+        self.decoder = decoder
+        self.api_kwargs = api_kwargs
+        
+        # retries are handled by Connection
+        self.adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=0)
+        
+        self._apis = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._apis)
+    
+    def __contains__(self, token):
+        return token in self._apis
+    
+    def create_connection(self):
+        return self.connection_class(self.app_key, None, rate_limiter=self.rate_limiter, metrics=self.metrics, decoder=self.decoder, adapter=self.adapter)
+    
+    def create_api(self, token, token_secret):
+        connection = self.create_connection()
+        connection.connect_token(self.app_secret, token, token_secret)
+        
+        storage = self.storage_factory(token) if self.storage_factory else None
+        if self.shared_cache is not None:
+            storage = SharedStorage(self.shared_cache, storage)
+        
+        return Api(self.app_key, None, connection=connection, storage=storage, metrics=self.metrics, **self.api_kwargs)
+    
+    def get(self, token, token_secret):
+        with self._lock:
+            api = self._apis.get(token)
+            if api is not None:
+                self._apis.move_to_end(token)
+                return api
+            
+            api = self._apis[token] = self.create_api(token, token_secret)
+            
+            evicted = []
+            if self.max_tenants is not None:
+                while len(self._apis) > self.max_tenants:
+                    evicted.append(self._apis.popitem(last=False)[1])
+        
+        for a in evicted:
+            self.logger.info("Disconnecting least recently used Api")
+            a.disconnect()
+        
+        return api
+    
+    def remove(self, token):
+        with self._lock:
+            api = self._apis.pop(token, None)
+        if api is not None:
+            api.disconnect()
+    
+    def close(self):
+        with self._lock:
+            apis = list(self._apis.values())
+            self._apis.clear()
+        
+        for a in apis:
+            a.disconnect()
+        self.adapter.close()
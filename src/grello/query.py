@@ -0,0 +1,298 @@
+'''
+Created on 18.10.2026
+
+@author: glorpen
+'''
+import bisect
+import datetime
+from grello.objects import Card, Label, List, Member
+from grello.registry import events
+from grello.utils import python_to_trello
+
+# Objects of single class by values read from its data.
+# Getter returns indexed values and raises KeyError when data does not contain them.
+class Index(object):
+    
+    def __init__(self, name, data_names, getter, value_class=None):
+        super(Index, self).__init__()
+        self.name = name
+        self.data_names = data_names
+        self.getter = getter
+        # class of objects which ids are indexed
+        self.value_class = value_class
+        
+        self.objects = {}
+    
+    def add(self, obj, values):
+        for v in values:
+            try:
+                self.objects[v].add(obj)
+            except KeyError:
+                self.objects[v] = {obj}
+    
+    def remove(self, obj, values):
+        for v in values:
+            objects = self.objects.get(v)
+            if objects is not None:
+                objects.discard(obj)
+                if not objects:
+                    del self.objects[v]
+    
+    def get(self, value):
+        return self.objects.get(value, ())
+
+# Index with sorted values, for range lookups.
+class SortedIndex(Index):
+    
+    def __init__(self, *args, **kwargs):
+        super(SortedIndex, self).__init__(*args, **kwargs)
+        self.keys = []
+    
+    def add(self, obj, values):
+        for v in values:
+            if v not in self.objects:
+                bisect.insort(self.keys, v)
+        super(SortedIndex, self).add(obj, values)
+    
+    def remove(self, obj, values):
+        super(SortedIndex, self).remove(obj, values)
+        for v in values:
+            if v not in self.objects:
+                i = bisect.bisect_left(self.keys, v)
+                if i < len(self.keys) and self.keys[i] == v:
+                    del self.keys[i]
+    
+    # objects with values in range [start, end)
+    def get_range(self, start=None, end=None):
+        lo = 0 if start is None else bisect.bisect_left(self.keys, start)
+        hi = len(self.keys) if end is None else bisect.bisect_left(self.keys, end)
+        
+        ret = set()
+        for k in self.keys[lo:hi]:
+            ret.update(self.objects[k])
+        return ret
+
+class ClassIndexes(object):
+    
+    def __init__(self, indexes):
+        super(ClassIndexes, self).__init__()
+        self.indexes = dict((i.name, i) for i in indexes)
+        # indexed values by object, all known objects of class
+        self.values = {}
+    
+    def _set_values(self, obj, index, old, new):
+        if old != new:
+            index.remove(obj, old)
+            index.add(obj, new)
+    
+    # partial data updates only indexes reading given data fields
+    def update(self, obj, data, partial=False):
+        old = self.values.get(obj, {})
+        new = dict(old) if partial else {}
+        
+        for name, index in self.indexes.items():
+            if partial and not any(n in data for n in index.data_names):
+                continue
+            
+            try:
+                values = tuple(index.getter(data))
+            except KeyError:
+                # unknown values are not indexed
+                new.pop(name, None)
+                continue
+            
+            new[name] = values
+        
+        for name, index in self.indexes.items():
+            self._set_values(obj, index, old.get(name, ()), new.get(name, ()))
+        
+        self.values[obj] = new
+    
+    def remove(self, obj):
+        old = self.values.pop(obj, None)
+        if old is not None:
+            for name, values in old.items():
+                self.indexes[name].remove(obj, values)
+    
+    def add_value(self, obj, name, value):
+        values = self.values.get(obj)
+        if values is None or name not in values or value in values[name]:
+            # values not known yet are read from data later
+            return
+        
+        values[name] += (value,)
+        self.indexes[name].add(obj, (value,))
+    
+    def remove_value(self, obj, name, value):
+        values = self.values.get(obj)
+        if values is None or value not in values.get(name, ()):
+            return
+        
+        values[name] = tuple(v for v in values[name] if v != value)
+        self.indexes[name].remove(obj, (value,))
+    
+    def replace_value(self, name, old, new=None):
+        for obj in tuple(self.indexes[name].get(old)):
+            self.remove_value(obj, name, old)
+            if new is not None:
+                self.add_value(obj, name, new)
+
+def _get_labels(data):
+    if "idLabels" in data:
+        return data["idLabels"]
+    return [l["id"] for l in data["labels"]]
+
+def _get_due(data):
+    # iso dates are sorted as strings
+    return (data["due"],) if data["due"] else ()
+
+def create_indexes():
+    return {
+        Card.__qualname__: ClassIndexes((
+            Index("list", ("idList",), lambda data: (data["idList"],), List),
+            Index("label", ("idLabels", "labels"), _get_labels, Label),
+            Index("member", ("idMembers",), lambda data: data["idMembers"], Member),
+            Index("closed", ("closed",), lambda data: (data["closed"] in (True, "true"),)),
+            SortedIndex("due", ("due",), _get_due),
+        )),
+    }
+
+# Secondary indexes of cached objects, updated when object data changes.
+class Indexes(object):
+    
+    def __init__(self, context):
+        super(Indexes, self).__init__()
+        self._lock = context.create_lock()
+        self._classes = create_indexes()
+    
+    def update(self, obj, data, partial=False):
+        indexes = self._classes.get(obj.__class__.__qualname__)
+        if indexes is not None:
+            with self._lock:
+                indexes.update(obj, data, partial)
+    
+    def remove(self, obj):
+        indexes = self._classes.get(obj.__class__.__qualname__)
+        if indexes is not None:
+            with self._lock:
+                indexes.remove(obj)
+    
+    # returns (index name, start, end) for range criteria, eg. due_before
+    def _get_range(self, indexes, name, value):
+        for suffix, is_start in (("_before", False), ("_after", True)):
+            if name.endswith(suffix) and isinstance(indexes.indexes.get(name[:-len(suffix)]), SortedIndex):
+                if isinstance(value, datetime.datetime) and value.microsecond % 1000:
+                    # indexed dates have milliseconds precision, so bound is rounded up to keep comparisons exact
+                    value += datetime.timedelta(microseconds=1000 - value.microsecond % 1000)
+                value = python_to_trello(value)
+                return (name[:-len(suffix)], value, None) if is_start else (name[:-len(suffix)], None, value)
+        return None
+    
+    def _get_set(self, indexes, name, value):
+        try:
+            index = indexes.indexes[name]
+        except KeyError:
+            raise ValueError("Unknown index %r, available ones: %r" % (name, sorted(indexes.indexes))) from None
+        
+        # objects are indexed by its ids
+        return index.get(getattr(value, "id", value))
+    
+    def _filter_range(self, indexes, objects, name, start, end):
+        values = indexes.values
+        ret = []
+        for o in objects:
+            for v in values[o].get(name, ()):
+                if (start is None or v >= start) and (end is None or v < end):
+                    ret.append(o)
+                    break
+        return ret
+    
+    def find(self, cls, criteria):
+        try:
+            indexes = self._classes[cls.__qualname__]
+        except KeyError:
+            raise ValueError("Objects of %r are not indexed" % cls.__qualname__) from None
+        
+        sets = []
+        ranges = []
+        for name, value in criteria:
+            r = self._get_range(indexes, name, value)
+            if r is None:
+                sets.append((name, value))
+            else:
+                ranges.append(r)
+        
+        with self._lock:
+            if sets:
+                sets = sorted((self._get_set(indexes, name, value) for name, value in sets), key=len)
+                ret = set(sets[0])
+                for s in sets[1:]:
+                    ret.intersection_update(s)
+                    if not ret:
+                        break
+            elif ranges:
+                # ranges are checked on already matched objects, only first one is looked up in index
+                ret = indexes.indexes[ranges[0][0]].get_range(*ranges[0][1:])
+                ranges = ranges[1:]
+            else:
+                return list(indexes.values)
+            
+            for r in ranges:
+                ret = self._filter_range(indexes, ret, *r)
+            return list(ret)
+    
+    def _get_indexes_by_value_class(self, cls):
+        for indexes in self._classes.values():
+            for index in indexes.indexes.values():
+                if index.value_class is cls:
+                    yield indexes, index.name
+    
+    @events.listener("label.assigned")
+    def on_label_assigned(self, source, label):
+        indexes = self._classes.get(source.__class__.__qualname__)
+        if indexes is not None:
+            with self._lock:
+                indexes.add_value(source, "label", label.id)
+    
+    @events.listener("label.unassigned")
+    def on_label_unassigned(self, source, label):
+        indexes = self._classes.get(source.__class__.__qualname__)
+        if indexes is not None:
+            with self._lock:
+                indexes.remove_value(source, "label", label.id)
+    
+    @events.listener("label.removed")
+    def on_label_removed(self, source, subject):
+        with self._lock:
+            for indexes, name in self._get_indexes_by_value_class(subject.__class__):
+                indexes.replace_value(name, subject.id)
+    
+    @events.listener("object.id_changed")
+    def on_id_change(self, obj, old_ids):
+        if "id" not in old_ids:
+            return
+        
+        with self._lock:
+            for indexes, name in self._get_indexes_by_value_class(obj.__class__):
+                indexes.replace_value(name, old_ids["id"], obj.id)
+
+# Objects matching all criteria, answered from indexes of cached objects.
+class Query(object):
+    
+    def __init__(self, indexes, cls, criteria=()):
+        super(Query, self).__init__()
+        self._indexes = indexes
+        self.cls = cls
+        self.criteria = tuple(criteria)
+    
+    def where(self, **criteria):
+        return self.__class__(self._indexes, self.cls, self.criteria + tuple(sorted(criteria.items())))
+    
+    def all(self):
+        return self._indexes.find(self.cls, self.criteria)
+    
+    def __iter__(self):
+        return iter(self.all())
+    
+    def __len__(self):
+        return len(self.all())
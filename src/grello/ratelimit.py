@@ -0,0 +1,135 @@
+'''
+Created on 18.10.2026
+
+@author: glorpen
+'''
+import threading
+import time
+from contextlib import ExitStack
+from grello.utils import Logger
+
+class TokenBucket(object):
+    
+    def __init__(self, capacity, period):
+        super(TokenBucket, self).__init__()
+        self.capacity = capacity
+        self.period = period
+        
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0
+        
+        # bucket can be shared by many limiters, eg. of all users of one app key
+        self.lock = threading.Lock()
+    
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / self.period)
+        self.updated = now
+    
+    def get_wait_time(self, now):
+        self.refill(now)
+        wait = max(0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) * self.period / self.capacity)
+        return wait
+    
+    def set_remaining(self, remaining):
+        self.tokens = min(self.tokens, remaining)
+
+class RateLimiter(Logger):
+    
+    # Trello limits, requests per 10 seconds
+    token_limit = 100
+    key_limit = 300
+    period = 10
+    
+    # buckets shared by all connections using the same app key
+    _key_buckets = {}
+    _key_buckets_lock = threading.Lock()
+    
+    def __init__(self, token_bucket, key_bucket=None):
+        super(RateLimiter, self).__init__()
+        self.token_bucket = token_bucket
+        self.key_bucket = key_bucket
+        
+        self._lock = threading.Lock()
+        
+        self.waiting = 0
+        self.stats = {"requests": 0, "throttled": 0, "waits": 0, "wait_time": 0.0, "max_wait_time": 0.0}
+    
+    @classmethod
+    def for_key(cls, app_key, token_limit=None, key_limit=None, period=None):
+        with cls._key_buckets_lock:
+            try:
+                key_bucket = cls._key_buckets[app_key]
+            except KeyError:
+                key_bucket = cls._key_buckets[app_key] = TokenBucket(key_limit or cls.key_limit, period or cls.period)
+        
+        if (key_limit and key_limit != key_bucket.capacity) or (period and period != key_bucket.period):
+            raise ValueError("App key %r is already limited to %d requests per %ss" % (app_key, key_bucket.capacity, key_bucket.period))
+        
+        period = period or cls.period
+        
+        return cls(TokenBucket(token_limit or cls.token_limit, period), key_bucket)
+    
+    # sorted, so locks of shared buckets are always taken in the same order
+    @property
+    def buckets(self):
+        return sorted((b for b in (self.token_bucket, self.key_bucket) if b is not None), key=id)
+    
+    def acquire(self):
+        waited = 0
+        with self._lock:
+            self.waiting += 1
+        buckets = self.buckets
+        try:
+            while True:
+                with ExitStack() as stack:
+                    for b in buckets:
+                        stack.enter_context(b.lock)
+                    
+                    now = time.monotonic()
+                    wait = max(b.get_wait_time(now) for b in buckets)
+                    if wait <= 0:
+                        for b in buckets:
+                            b.tokens -= 1
+                        break
+                
+                self.logger.debug("Rate limit reached, waiting %.2fs", wait)
+                time.sleep(wait)
+                waited += wait
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        
+        with self._lock:
+            self.stats["requests"] += 1
+            if waited:
+                self.stats["waits"] += 1
+                self.stats["wait_time"] += waited
+                self.stats["max_wait_time"] = max(self.stats["max_wait_time"], waited)
+    
+    def pause(self, seconds):
+        with self._lock:
+            self.stats["throttled"] += 1
+        
+        until = time.monotonic() + seconds
+        for b in self.buckets:
+            with b.lock:
+                b.blocked_until = max(b.blocked_until, until)
+    
+    def update(self, headers):
+        for bucket, header in ((self.token_bucket, "x-rate-limit-api-token-remaining"), (self.key_bucket, "x-rate-limit-api-key-remaining")):
+            value = headers.get(header)
+            if bucket is not None and isinstance(value, (str, int)):
+                try:
+                    value = int(value)
+                except ValueError:
+                    continue
+                with bucket.lock:
+                    bucket.set_remaining(value)
+    
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["waiting"] = self.waiting
+        return stats
@@ -3,9 +3,10 @@ Created on 08.01.2017
 
 @author: glorpen
 '''
-from grello.utils import fill_args
+from grello.utils import InjectionPlan
 from grello.fields import api_field
 import re
+import weakref
 
 class EventDispatcher(object):
     
@@ -19,12 +20,23 @@ class EventDispatcher(object):
         
         return self.listeners[event]
     
-    def listener(self, event):
+    # when target argument name is given, listener is called only on objects
+    # which have event subject in one of its loaded collections
+    def listener(self, event, target=None):
         def inner(f):
-            self.get_listeners_for_event(event).append(f)
+            self.get_listeners_for_event(event).append(RegisteredListener(f, target))
             return f
         return inner
 
+class RegisteredListener(object):
+    
+    def __init__(self, f, target=None):
+        super(RegisteredListener, self).__init__()
+        self.callable = f
+        self.plan = InjectionPlan.get(f)
+        self.parent_name = f.__qualname__.rsplit(".", 1)[0]
+        self.target = None if target is None else self.plan.positional.index(target)
+
 
 events = EventDispatcher()
 
@@ -32,35 +44,79 @@ class BoundEventDispatcher(object):
     def __init__(self, context):
         super(BoundEventDispatcher, self).__init__()
         self._context = context
-
+        self._references = weakref.WeakKeyDictionary()
+        self._service_calls = {}
+        self._lock = context.create_lock()
+    
+    def add_reference(self, owner, item):
+        with self._lock:
+            try:
+                owners = self._references[item]
+            except KeyError:
+                owners = self._references[item] = weakref.WeakSet()
+            owners.add(owner)
+    
+    def remove_reference(self, owner, item):
+        with self._lock:
+            try:
+                self._references[item].discard(owner)
+            except KeyError:
+                pass
+    
+    def get_referrers(self, item):
+        with self._lock:
+            try:
+                return tuple(self._references[item])
+            except KeyError:
+                return ()
+    
+    def _get_service_call(self, listener, service):
+        try:
+            return self._service_calls[listener]
+        except KeyError:
+            call = self._service_calls[listener] = listener.plan.bind(self._context, service)
+            return call
+    
     def trigger(self, event, *args, **kwargs):
         repository = self._context.repository
+        calls = 0
         
         for l in events.get_listeners_for_event(event):
-            parent_name = l.__qualname__.rsplit(".", 1)[0]
-            for v in repository.get_object_cache(parent_name).values():
-                fill_args(l, v.object, context=self._context)(*args, **kwargs)
+            if l.target is None:
+                objects = repository.get_cached_objects(l.parent_name)
+            else:
+                objects = [o for o in self.get_referrers(args[l.target]) if o.__class__.__qualname__ == l.parent_name]
+            
+            calls += len(objects)
+            for o in objects:
+                l.plan.call(repository.get_object_api_data(o), *args, **kwargs)
             
             try:
-                service = repository.get_service(parent_name)
+                service = repository.get_service(l.parent_name)
             except KeyError:
                 pass
             else:
-                fill_args(l, service=service, context=self._context)(*args, **kwargs)
+                calls += 1
+                self._get_service_call(l, service)(*args, **kwargs)
+        
+        metrics = self._context.metrics
+        metrics.inc("grello_events_total", event=event)
+        metrics.inc("grello_event_listener_calls_total", calls, event=event)
 
 class RegisteredObject(object):
     
     re_id_fields = re.compile(r"{([^}]+)}")
     
-    def __init__(self, cls, url, fields):
+    def __init__(self, cls, url, fields, activity_field=None, alias_fields=()):
         super(RegisteredObject, self).__init__()
         self.cls = cls
         self.url = url
         self.fields = fields
-    
-    @property
-    def id_fields(self):
-        return self.re_id_fields.findall(self.url)
+        self.activity_field = activity_field
+        # data fields usable in place of id, eg. card shortLink
+        self.alias_fields = tuple(alias_fields)
+        
+        self.id_fields = tuple(self.re_id_fields.findall(url))
 
 class ApiObjectRegistry(object):
     
@@ -70,9 +126,9 @@ class ApiObjectRegistry(object):
         self._objects = {}
         self._class_fields = {}
     
-    def register(self, url, default_fields=None):
+    def register(self, url, default_fields=None, activity_field=None, alias_fields=()):
         def inner(cls):
-            self._objects[cls.__qualname__] = RegisteredObject(cls, url, default_fields)
+            self._objects[cls.__qualname__] = RegisteredObject(cls, url, default_fields, activity_field, alias_fields)
             return cls
         return inner
     
@@ -97,8 +153,40 @@ class ApiObjectRegistry(object):
     def get_default_fields(self, cls):
         return self._objects[cls.__qualname__].fields
     
+    # fields requested for objects of given class, default ones and learned ones missing from them
+    def get_fields_projection(self, cls, learned_fields=None):
+        fields = self._objects[cls.__qualname__].fields
+        
+        # objects without default fields are loaded with all fields
+        if fields is None or not learned_fields:
+            return fields
+        
+        return fields + tuple(sorted(learned_fields.difference(fields)))
+    
+    def get_alias_fields(self, cls):
+        return self._objects[cls.__qualname__].alias_fields
+    
+    def get_activity_field(self, cls):
+        return self._objects[cls.__qualname__].activity_field
+    
     def get_url(self, cls):
         return self._objects[cls.__qualname__].url 
 
 objects = ApiObjectRegistry()
 api_object = objects.register
+
+# Data fields read by objects in one context but missing from its default fields, by class name.
+class FieldsProjection(object):
+    
+    def __init__(self):
+        super(FieldsProjection, self).__init__()
+        self._learned = {}
+    
+    def learn(self, cls, name):
+        self._learned.setdefault(cls.__qualname__, set()).add(name)
+    
+    def get(self, cls):
+        return objects.get_fields_projection(cls, self._learned.get(cls.__qualname__))
+    
+    def reset(self):
+        self._learned.clear()
@@ -3,28 +3,68 @@ Created on 08.01.2017
 
 @author: glorpen
 '''
-from grello.registry import events
-from grello.utils import get_uid
+from collections import OrderedDict
+import weakref
+from grello.registry import events, objects
+from grello.utils import get_size
 from grello.data import ApiData
+from grello.query import Indexes, Query
 
 class CachedObject(object):
-    api_data = None
-    object = None
+    
+    __slots__ = ("api_data", "object")
     
     def __init__(self, object, api_data):
         super(CachedObject, self).__init__()
         self.api_data = api_data
         self.object = object
 
+# Limits of objects kept in Repository, least recently used objects are evicted first.
+# max_entries is a number or dict of class name to number, max_bytes is a budget for estimated data size.
+class CachePolicy(object):
+    
+    def __init__(self, max_entries=None, max_bytes=None):
+        super(CachePolicy, self).__init__()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+    
+    def get_max_entries(self, class_name):
+        if isinstance(self.max_entries, dict):
+            return self.max_entries.get(class_name)
+        return self.max_entries
+
 class Repository(object):
     
-    def __init__(self, context):
+    def __init__(self, context, cache_policy=None, storage=None):
         super(Repository, self).__init__()
         self.cache = {}
         self.services = {}
-        self.ids = []
+        self.ids = set()
+        
+        self.cache_policy = cache_policy or CachePolicy()
+        self.storage = storage
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "revived": 0}
+        self.size = 0
+        
+        # all cached objects, least recently used first
+        self._lru = OrderedDict()
+        # evicted objects are tracked until nothing else references them
+        self._evicted = {}
+        # alternative keys of cached objects, eg. ("me",) or card shortLink, to canonical key
+        self._aliases = {}
+        # alternative keys by canonical key, removed with its object
+        self._alias_keys = {}
+        
+        self._lock = context.create_lock()
+        # guards registering of running object loads
+        self.loading_lock = context.create_lock()
         
         self._context = context
+        self.indexes = Indexes(context)
+    
+    # objects matching criteria, from cached objects only, eg. query(Card).where(label=label, due_before=date)
+    def query(self, cls):
+        return Query(self.indexes, cls)
     
     def _as_class_name(self, cls):
         if isinstance(cls, str):
@@ -35,65 +75,325 @@ class Repository(object):
     def get_object_cache(self, cls):
         k = self._as_class_name(cls)
         if k not in self.cache:
-            self.cache[k]={}
+            self.cache[k]=OrderedDict()
         return self.cache[k]
     
+    def _get_evicted_cache(self, cls):
+        k = self._as_class_name(cls)
+        if k not in self._evicted:
+            self._evicted[k] = weakref.WeakValueDictionary()
+        return self._evicted[k]
+    
+    def _get_aliases(self, cls):
+        k = self._as_class_name(cls)
+        if k not in self._aliases:
+            self._aliases[k] = {}
+        return self._aliases[k]
+    
+    def _add_alias(self, class_name, alias, uid):
+        self._get_aliases(class_name)[alias] = uid
+        self._alias_keys.setdefault(class_name, {}).setdefault(uid, set()).add(alias)
+    
+    # alternative key known before object is loaded, eg. ("me",) of connected member
+    def add_alias(self, cls, alias, uid):
+        with self._lock:
+            self._add_alias(self._as_class_name(cls), alias, uid)
+    
+    def _remove_aliases(self, class_name, uid):
+        aliases = self._get_aliases(class_name)
+        for k in self._alias_keys.get(class_name, {}).pop(uid, ()):
+            if aliases.get(k) == uid:
+                del aliases[k]
+    
+    def get_cached_objects(self, cls):
+        objects = [v.object for v in self.get_object_cache(cls).values()]
+        objects.extend(self._get_evicted_cache(cls).values())
+        return objects
+    
     def set_service(self, o):
         self.services[o.__class__.__qualname__] = o
-        self.ids.append(id(o))
+        self.ids.add(id(o))
     
     def get_service(self, cls):
         k = self._as_class_name(cls)
         return self.services[k]
     
-    def get_objects(self, cls, data, **kwargs):
-        return tuple(self.get_object(cls, i, **kwargs) for i in data)
+    def get_objects(self, cls, data, persist=True, **kwargs):
+        return tuple(self.iter_objects(cls, data, persist, **kwargs))
+    
+    def iter_objects(self, cls, data, persist=True, **kwargs):
+        for i in data:
+            yield self.get_object(cls, i, persist, **kwargs)
+    
+    # identity map key, tuple of id values in url order
+    def _get_object_key(self, cls, data=None, kwargs={}):
+        data = data or {}
+        try:
+            return tuple(data[n] if n in data else kwargs[n] for n in objects.get_id_fields_name(cls))
+        except KeyError:
+            raise Exception("Not all ids found") from None
     
-    def _get_object_key(self, cls, id_dict={}):
-        return"".join([cls.__qualname__, repr(list(id_dict.values()))])
+    def _resolve_key(self, cls, uid):
+        return self._get_aliases(cls).get(uid, uid)
+    
+    # objects embedded in other object data are not persisted, they are stored with its parent
+    def get_object(self, cls, data=None, persist=True, **kwargs):
+        with self._lock:
+            return self._get_object(cls, data, kwargs, persist)
+    
+    # returns cached object or None, without creating new one
+    def find_object(self, cls, **kwargs):
+        uid = self._get_object_key(cls, None, kwargs)
+        
+        with self._lock:
+            uid = self._resolve_key(cls, uid)
+            co = self.get_object_cache(cls).get(uid)
+            if co is not None:
+                return co.object
+            return self._get_evicted_cache(cls).get(uid)
     
-    def get_object(self, cls, data=None, **kwargs):
-        uid = self._get_object_key(cls, get_uid(cls, data, kwargs))
+    def _get_object(self, cls, data, kwargs, persist=True):
+        uid = self._get_object_key(cls, data, kwargs)
         
         cache = self.get_object_cache(cls)
+        if uid not in cache:
+            canonical_uid = self._resolve_key(cls, uid)
+            if canonical_uid != uid:
+                # new object gets real ids instead of alias ones
+                uid = canonical_uid
+                kwargs = dict(kwargs, **dict(zip(objects.get_id_fields_name(cls), uid)))
         
         if uid in cache:
+            self.stats["hits"] += 1
+            self._context.metrics.inc("grello_cache_requests_total", object=cls.__qualname__, result="hit")
+            co = cache[uid]
+            previous = co.api_data.data
             if data:
-                cache[uid].api_data.set_data(data)
+                co.api_data.set_data(data)
+                self.update_object(co.object)
+            self._touch(cls.__qualname__, uid, co)
         else:
-            o = cls()
-            #TODO: pass context?
-            api_data = ApiData(o, context=self._context)
+            o = self._get_evicted_cache(cls).pop(uid, None)
+            previous = None
             
-            cache[uid] = CachedObject(o, api_data)
-            self.ids.append(id(o))
+            if o is None:
+                self.stats["misses"] += 1
+                self._context.metrics.inc("grello_cache_requests_total", object=cls.__qualname__, result="miss")
+                o = cls()
+                #TODO: pass context?
+                api_data = ApiData(o, context=self._context)
+                co = CachedObject(o, api_data)
+                api_data.set(data, kwargs)
+                
+                if self.storage is not None and data is None:
+                    api_data.stored = self.storage.load(self._get_storage_key(cls, uid))
+            else:
+                self.stats["revived"] += 1
+                self._context.metrics.inc("grello_cache_requests_total", object=cls.__qualname__, result="revived")
+                co = CachedObject(o, o._api_data)
+                previous = co.api_data.data
+                if data:
+                    co.api_data.set_data(data)
             
-            api_data.set(data, kwargs)
+            self._add(cls.__qualname__, uid, co)
+            self._touch(cls.__qualname__, uid, co)
+            # object is cached first, so its size and aliases are tracked
+            if co.api_data.loaded:
+                self.update_object(co.object)
+            self._evict(cls.__qualname__)
             #self.events_dispatcher.trigger("factory.create", self, o)
         
-        return cache[uid].object
+        # unchanged data is not written again
+        if data and persist and data != previous:
+            self.persist(co.object, data)
+        
+        return co.object
+    
+    # updates estimated size, secondary indexes and aliases after object data was set
+    def update_object(self, obj):
+        api_data = self.get_object_api_data(obj)
+        data = api_data.loaded_data
+        
+        if self.tracks_size:
+            size = get_size(api_data.data)
+            self.resize(obj, size - api_data.size)
+            api_data.size = size
+        
+        self.indexes.update(obj, data)
+        
+        alias_fields = objects.get_alias_fields(obj.__class__)
+        if alias_fields and id(obj) in self.ids:
+            uid = (data["id"],)
+            class_name = obj.__class__.__qualname__
+            with self._lock:
+                for name in alias_fields:
+                    value = data.get(name)
+                    if value is not None:
+                        self._add_alias(class_name, (value,), uid)
+    
+    # storages keep string keys, eg. "Card['card_id']"
+    def _get_storage_key(self, cls, uid):
+        return "".join([cls.__qualname__, repr(list(uid))])
+    
+    def get_storage_key(self, obj):
+        return self._get_storage_key(obj.__class__, self._get_object_key(obj.__class__, self.get_object_api_data(obj).get_ids()))
+    
+    def persist(self, obj, data):
+        if self.storage is None:
+            return
+        
+        activity_field = objects.get_activity_field(obj.__class__)
+        last_activity = data.get(activity_field) if activity_field else None
+        
+        self.storage.save(self.get_storage_key(obj), data, last_activity)
+    
+    # estimated data size is tracked only when there is a budget for it
+    @property
+    def tracks_size(self):
+        return self.cache_policy.max_bytes is not None
+    
+    # called when data of object changes
+    def resize(self, obj, delta):
+        if id(obj) not in self.ids:
+            return
+        
+        with self._lock:
+            self.size += delta
+            self._evict_bytes()
+    
+    def _add(self, class_name, uid, co):
+        self.cache[class_name][uid] = co
+        self.ids.add(id(co.object))
+        self.size += co.api_data.size
+    
+    def _touch(self, class_name, uid, co):
+        self.cache[class_name].move_to_end(uid)
+        
+        key = (class_name, uid)
+        self._lru[key] = co
+        self._lru.move_to_end(key)
+    
+    def _evict(self, class_name):
+        cache = self.cache[class_name]
+        max_entries = self.cache_policy.get_max_entries(class_name)
+        
+        if max_entries is not None:
+            while len(cache) > max_entries:
+                # first key is the least recently used one
+                self._evict_object(class_name, next(iter(cache)))
+        
+        self._evict_bytes()
+    
+    def _evict_bytes(self):
+        max_bytes = self.cache_policy.max_bytes
+        if max_bytes is not None:
+            while self.size > max_bytes and len(self._lru) > 1:
+                self._evict_object(*next(iter(self._lru)))
+    
+    def _evict_object(self, class_name, uid):
+        co = self._remove(class_name, uid)
+        self._remove_aliases(class_name, uid)
+        self.indexes.remove(co.object)
+        self._get_evicted_cache(class_name)[uid] = co.object
+        self.stats["evictions"] += 1
+        self._context.metrics.inc("grello_cache_evictions_total", object=class_name)
+    
+    def _remove(self, class_name, uid):
+        co = self.cache[class_name].pop(uid)
+        del self._lru[(class_name, uid)]
+        self.size -= co.api_data.size
+        self.ids.discard(id(co.object))
+        return co
+    
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["entries"] = len(self._lru)
+        stats["bytes"] = self.size
+        return stats
     
     def get_object_api_data(self, obj):
-        uid = self._get_object_key(obj.__class__, get_uid(obj.__class__, data=obj.__dict__))
+        api_data = getattr(obj, "_api_data", None)
+        if api_data is not None and api_data._context is self._context:
+            return api_data
+        
+        uid = self._get_object_key(obj.__class__, obj.__dict__)
         cache = self.get_object_cache(obj.__class__)
         return cache[uid].api_data
     
     @events.listener("label.removed")
+    @events.listener("card.removed")
     def on_object_remove(self, source, subject):
         uid = self._get_object_key(subject.__class__, self.get_object_api_data(subject).get_ids())
-        self.get_object_cache(subject.__class__).pop(uid, None)
-        self.ids.remove(id(subject))
+        class_name = subject.__class__.__qualname__
+        
+        with self._lock:
+            if uid in self.get_object_cache(class_name):
+                self._remove(class_name, uid)
+            self._get_evicted_cache(class_name).pop(uid, None)
+            self._remove_aliases(class_name, uid)
+        self.indexes.remove(subject)
+        
+        if self.storage is not None:
+            self.storage.remove(self._get_storage_key(subject.__class__, uid))
     
     @events.listener("object.id_changed")
     def on_id_change(self, obj, old_ids):
-        cache = self.get_object_cache(obj.__class__)
+        class_name = obj.__class__.__qualname__
+        cache = self.get_object_cache(class_name)
         
         old_uid = self._get_object_key(obj.__class__, old_ids)
-        co = cache[old_uid]
-        new_uid = self._get_object_key(obj.__class__, co.api_data.get_ids())
+        new_uid = self._get_object_key(obj.__class__, self.get_object_api_data(obj).get_ids())
+        
+        with self._lock:
+            evicted = self._get_evicted_cache(class_name)
+            # object fetched by alias, eg. "me", is the same entity as already known one
+            existing = cache[new_uid].object if new_uid in cache else evicted.get(new_uid)
+            
+            if existing is None:
+                if old_uid in cache:
+                    co = self._remove(class_name, old_uid)
+                    self._remove_aliases(class_name, old_uid)
+                    self._add(class_name, new_uid, co)
+                    self._touch(class_name, new_uid, co)
+                else:
+                    evicted.pop(old_uid, None)
+                    evicted[new_uid] = obj
+            
+            if existing is None or existing is obj:
+                # aliases are kept only for cached objects
+                if new_uid in cache:
+                    self._add_alias(class_name, old_uid, new_uid)
+                return
+        
+        # canonical object can be loaded by other thread, so it is merged only when its load ends
+        with existing._api_data.exclusive():
+            with self._lock:
+                self._merge_object(class_name, obj, existing, old_uid, new_uid)
+                self._add_alias(class_name, old_uid, new_uid)
+    
+    # object under alias key shares state with the canonical one from now on
+    def _merge_object(self, class_name, obj, canonical, old_uid, new_uid):
+        if old_uid in self.cache[class_name]:
+            self._remove(class_name, old_uid)
+            self._remove_aliases(class_name, old_uid)
+        evicted = self._get_evicted_cache(class_name)
+        evicted.pop(old_uid, None)
+        self.indexes.remove(obj)
+        
+        cache = self.cache[class_name]
+        if new_uid not in cache:
+            evicted.pop(new_uid, None)
+            self._add(class_name, new_uid, CachedObject(canonical, canonical._api_data))
+        co = cache[new_uid]
+        
+        alias_data = obj._api_data
+        co.api_data.set_data(alias_data.data)
+        self.update_object(co.object)
+        # rest of alias data loading, eg. index updates, applies to canonical object
+        alias_data.obj = co.object
+        obj._api_data = co.api_data
         
-        del cache[old_uid]
-        cache[new_uid] = co
+        self._touch(class_name, new_uid, co)
     
     def is_known(self, obj):
         return id(obj) in self.ids
@@ -0,0 +1,251 @@
+'''
+Created on 18.10.2026
+
+@author: glorpen
+'''
+import hashlib
+import json
+import mmap
+import os
+import struct
+import time
+from grello.decoders import get_default_decoder
+from grello.objects import Board, List, Card, Checklist
+from grello.storage import Storage, StoredData
+
+# File layout: header, records, meta json and index sorted by key hash.
+# Record is body and key lengths, key and json of {"d": object data, "r": {data key: [referenced records offsets]}}.
+# Referenced records are written first, so references point to already written records.
+_header = struct.Struct("<8sQQQQ")
+_entry = struct.Struct("<QQ")
+_record = struct.Struct("<IH")
+
+MAGIC = b"GRSNAP01"
+
+# data keys read by collection loaders, by class and field name
+collection_keys = {
+    Board: {"lists": "lists", "cards": "cards", "labels": "labels", "members": "members"},
+    List: {"cards": "cards"},
+    Card: {"labels": "labels", "members": "members", "checklists": "checklists", "attachments": "attachments"},
+    Checklist: {"items": "checkItems"},
+}
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+# Data read from snapshot, not persisted again when objects are hydrated from it.
+class SnapshotRecord(dict):
+    __slots__ = ()
+
+# Embedded items of collection, decoded one by one when iterated.
+class SnapshotItems(object):
+    
+    __slots__ = ("_storage", "_offsets")
+    
+    def __init__(self, storage, offsets):
+        super(SnapshotItems, self).__init__()
+        self._storage = storage
+        self._offsets = offsets
+    
+    def __iter__(self):
+        for o in self._offsets:
+            yield self._storage.read_data(o)
+    
+    def __len__(self):
+        return len(self._offsets)
+
+# converts snapshot data to plain json data, eg. for other storages
+def to_plain_data(data):
+    return dict(
+        (k, [to_plain_data(i) for i in v] if isinstance(v, SnapshotItems) else v)
+        for k, v in data.items()
+    )
+
+class SnapshotWriter(object):
+    
+    def __init__(self, repository, path):
+        super(SnapshotWriter, self).__init__()
+        self.repository = repository
+        self.path = path
+    
+    def _get_key(self, obj):
+        return self.repository.get_storage_key(obj)
+    
+    def _write_object(self, f, obj, root=False):
+        key = self._get_key(obj)
+        try:
+            return self._offsets[key]
+        except KeyError:
+            pass
+        
+        api_data = self.repository.get_object_api_data(obj)
+        if not api_data.loaded:
+            api_data.load()
+        
+        data = dict(api_data.data)
+        refs = {}
+        
+        if root:
+            # flat resources of expanded board are exported as its objects
+            for k in Board.EXPAND_ALL:
+                data.pop(k, None)
+        
+        for name, data_key in collection_keys.get(obj.__class__, {}).items():
+            # nested collections are exported only when known, so export does not fetch them one by one
+            if not root and data_key not in data and not api_data.get_field(name).loaded:
+                continue
+            
+            data.pop(data_key, None)
+            refs[data_key] = [self._write_object(f, i) for i in getattr(obj, name)]
+        
+        record = {"d": data}
+        if refs:
+            record["r"] = refs
+        
+        encoded_key = key.encode("utf-8")
+        body = json.dumps(record, separators=(",", ":")).encode("utf-8")
+        
+        offset = self._offsets[key] = f.tell()
+        self._entries.append((_hash(encoded_key), offset))
+        
+        f.write(_record.pack(len(body), len(encoded_key)))
+        f.write(encoded_key)
+        f.write(body)
+        
+        return offset
+    
+    def write(self, board):
+        tmp_path = "%s.tmp" % self.path
+        self._offsets = {}
+        self._entries = []
+        
+        with open(tmp_path, "wb") as f:
+            f.write(b"\0" * _header.size)
+            
+            self._write_object(f, board, True)
+            
+            meta = json.dumps({"board": board.id, "created": time.time(), "objects": len(self._entries)}).encode("utf-8")
+            meta_offset = f.tell()
+            f.write(meta)
+            
+            index_offset = f.tell()
+            self._entries.sort()
+            for e in self._entries:
+                f.write(_entry.pack(*e))
+            
+            f.seek(0)
+            f.write(_header.pack(MAGIC, meta_offset, len(meta), index_offset, len(self._entries)))
+        
+        os.replace(tmp_path, self.path)
+        return len(self._entries)
+
+# Read only storage with objects from snapshot file, objects changed later are handled by wrapped storage.
+class SnapshotStorage(Storage):
+    
+    def __init__(self, path, storage=None, decoder=None):
+        super(SnapshotStorage, self).__init__()
+        self.storage = storage
+        self.decoder = decoder or get_default_decoder()
+        
+        # keys of objects which snapshot data is outdated
+        self._changed = set()
+        
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        magic, meta_offset, meta_length, self._index_offset, self._count = _header.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError("%r is not a snapshot file" % path)
+        
+        self.meta = json.loads(self._mmap[meta_offset:meta_offset + meta_length])
+    
+    @property
+    def board_id(self):
+        return self.meta["board"]
+    
+    def __len__(self):
+        return self._count
+    
+    def _find(self, key):
+        key = key.encode("utf-8")
+        h = _hash(key)
+        
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if _entry.unpack_from(self._mmap, self._index_offset + mid * _entry.size)[0] < h:
+                lo = mid + 1
+            else:
+                hi = mid
+        
+        # keys with same hash are next to each other
+        while lo < self._count:
+            entry_hash, offset = _entry.unpack_from(self._mmap, self._index_offset + lo * _entry.size)
+            if entry_hash != h:
+                return None
+            
+            key_length = _record.unpack_from(self._mmap, offset)[1]
+            start = offset + _record.size
+            if self._mmap[start:start + key_length] == key:
+                return offset
+            lo += 1
+        
+        return None
+    
+    def read_data(self, offset):
+        body_length, key_length = _record.unpack_from(self._mmap, offset)
+        start = offset + _record.size + key_length
+        
+        record = self.decoder.loads(self._mmap[start:start + body_length])
+        data = SnapshotRecord(record["d"])
+        for data_key, offsets in record.get("r", {}).items():
+            data[data_key] = SnapshotItems(self, offsets)
+        return data
+    
+    def load_data(self, key):
+        offset = self._find(key)
+        if offset is None:
+            raise KeyError(key)
+        return self.read_data(offset)
+    
+    def load(self, uid):
+        if uid not in self._changed:
+            try:
+                return StoredData(self.load_data(uid), self.meta["created"])
+            except KeyError:
+                pass
+        
+        if self.storage is not None:
+            return self.storage.load(uid)
+    
+    def is_fresh(self, stored):
+        # snapshot is used without network access
+        if isinstance(stored.data, SnapshotRecord):
+            return True
+        return self.storage.is_fresh(stored)
+    
+    def save(self, uid, data, last_activity=None):
+        if isinstance(data, SnapshotRecord):
+            return
+        
+        self._changed.add(uid)
+        if self.storage is not None:
+            # changed data can still have collections read from snapshot
+            self.storage.save(uid, to_plain_data(data), last_activity)
+    
+    def touch(self, uid):
+        if self.storage is not None:
+            self.storage.touch(uid)
+    
+    def remove(self, uid):
+        self._changed.add(uid)
+        if self.storage is not None:
+            self.storage.remove(uid)
+    
+    def flush(self):
+        if self.storage is not None:
+            self.storage.flush()
+    
+    def close(self):
+        self._mmap.close()
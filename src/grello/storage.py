@@ -0,0 +1,125 @@
+'''
+Created on 18.10.2026
+
+@author: glorpen
+'''
+import json
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import time
+
+class StoredData(object):
+    
+    def __init__(self, data, fetched, last_activity=None):
+        super(StoredData, self).__init__()
+        self.data = data
+        self.fetched = fetched
+        self.last_activity = last_activity
+
+class Storage(ABC):
+    
+    # stored data younger than max_age seconds is used without revalidation
+    def __init__(self, max_age=0):
+        super(Storage, self).__init__()
+        self.max_age = max_age
+    
+    def is_fresh(self, stored):
+        return stored.fetched + self.max_age > time.time()
+    
+    @abstractmethod
+    def load(self, uid):
+        pass
+    
+    @abstractmethod
+    def save(self, uid, data, last_activity=None):
+        pass
+    
+    @abstractmethod
+    def touch(self, uid):
+        pass
+    
+    @abstractmethod
+    def remove(self, uid):
+        pass
+    
+    def flush(self):
+        pass
+
+# Changes are buffered and written in single transaction, each commit_every changes or on flush.
+class SqliteStorage(Storage):
+    
+    commit_every = 100
+    
+    def __init__(self, path, max_age=0):
+        super(SqliteStorage, self).__init__(max_age)
+        
+        self._lock = threading.Lock()
+        # uid to StoredData to write, or None for removed objects
+        self._writes = {}
+        self._touched = 0
+        
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("""CREATE TABLE IF NOT EXISTS objects (
+            uid TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            fetched REAL NOT NULL,
+            last_activity TEXT
+        )""")
+        self.db.commit()
+    
+    def _changed(self):
+        if len(self._writes) + self._touched >= self.commit_every:
+            self._write()
+    
+    def _write(self):
+        saved = [(uid, json.dumps(s.data, separators=(",", ":")), s.fetched, s.last_activity) for uid, s in self._writes.items() if s is not None]
+        removed = [(uid,) for uid, s in self._writes.items() if s is None]
+        
+        if saved:
+            self.db.executemany("INSERT OR REPLACE INTO objects (uid, data, fetched, last_activity) VALUES (?, ?, ?, ?)", saved)
+        if removed:
+            self.db.executemany("DELETE FROM objects WHERE uid = ?", removed)
+        self.db.commit()
+        
+        self._writes.clear()
+        self._touched = 0
+    
+    def load(self, uid):
+        with self._lock:
+            if uid in self._writes:
+                return self._writes[uid]
+            row = self.db.execute("SELECT data, fetched, last_activity FROM objects WHERE uid = ?", (uid,)).fetchone()
+        
+        if row is None:
+            return None
+        
+        return StoredData(json.loads(row[0]), row[1], row[2])
+    
+    def save(self, uid, data, last_activity=None):
+        with self._lock:
+            self._writes[uid] = StoredData(data, time.time(), last_activity)
+            self._changed()
+    
+    def touch(self, uid):
+        with self._lock:
+            stored = self._writes.get(uid)
+            if stored is not None:
+                stored.fetched = time.time()
+            elif uid not in self._writes:
+                self.db.execute("UPDATE objects SET fetched = ? WHERE uid = ?", (time.time(), uid))
+                self._touched += 1
+                self._changed()
+    
+    def remove(self, uid):
+        with self._lock:
+            self._writes[uid] = None
+            self._changed()
+    
+    def flush(self):
+        with self._lock:
+            self._write()
+    
+    def close(self):
+        self.flush()
+        self.db.close()
@@ -0,0 +1,78 @@
+'''
+Created on 18.10.2026
+
+@author: glorpen
+'''
+import unittest
+import asyncio
+import threading
+import time
+from grello.connection import Api
+from grello.aio import AsyncApi
+from grello.objects import List
+
+class StandInConnection(object):
+    
+    def __init__(self, delay=0.05):
+        super(StandInConnection, self).__init__()
+        self.delay = delay
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+    
+    def do_request(self, uri, parameters=None, method="get", files=None, **kwargs):
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        
+        time.sleep(self.delay)
+        
+        with self._lock:
+            self.running -= 1
+        
+        list_id = uri.split("/")[1]
+        return [{"id": "%s_card_%d" % (list_id, i), "name": "card"} for i in range(3)]
+
+class TestAsyncApi(unittest.TestCase):
+    
+    def test_concurrent_collections(self):
+        api = Api(None, None, thread_safe=True)
+        connection = api.context.connection = StandInConnection()
+        aapi = AsyncApi(api, concurrency=4)
+        
+        lists = [api.get_any(List, id="list_%d" % i) for i in range(10)]
+        for l in lists:
+            l._api_data.set_data({"id": l.id, "name": "list", "pos": 1})
+        
+        try:
+            cards = asyncio.run(aapi.gather_items(lists, "cards"))
+        finally:
+            aapi.close()
+            api.disconnect()
+        
+        self.assertEqual([len(c) for c in cards], [3] * 10)
+        self.assertEqual(cards[1][0].id, "list_1_card_0")
+        self.assertEqual(connection.max_running, 4, "Collections are fetched concurrently up to given limit")
+    
+    def test_many_loops(self):
+        api = Api(None, None, thread_safe=True)
+        api.context.connection = StandInConnection(0)
+        aapi = AsyncApi(api, concurrency=2)
+        
+        lst = api.get_any(List, id="list_id")
+        lst._api_data.set_data({"id": "list_id", "name": "list", "pos": 1})
+        
+        try:
+            for _ in range(2):
+                self.assertEqual(len(asyncio.run(aapi.items(lst.cards))), 3, "Api can be used by subsequent event loops")
+        finally:
+            aapi.close()
+            api.disconnect()
+    
+    def test_thread_safe_context(self):
+        api = Api(None, None)
+        try:
+            with self.assertRaises(ValueError):
+                AsyncApi(api)
+        finally:
+            api.disconnect()
@@ -0,0 +1,70 @@
+'''
+Created on 18.10.2026
+
+@author: glorpen
+'''
+import os
+import tempfile
+import unittest
+from grello.connection import Api
+from grello.cassette import RecordingConnection, ReplayConnection, CassetteMismatch
+from grello.tests.fake import FakeTrello
+
+def walk(api, board_id, with_labels=False):
+    board = api.get_board(board_id)
+    for l in board.lists:
+        for c in l.cards:
+            c.name
+            if with_labels:
+                [label.name for label in c.labels]
+
+class TestCassette(unittest.TestCase):
+    
+    def setUp(self):
+        fake = FakeTrello()
+        self.board_id = fake.generate_board(lists=2, cards=4)
+        fake.serve()
+        
+        api = fake.create_api(RecordingConnection)
+        try:
+            walk(api, self.board_id)
+        finally:
+            api.disconnect()
+            fake.shutdown()
+        
+        fd, self.path = tempfile.mkstemp(suffix=".jsonl.gz")
+        os.close(fd)
+        api.connection.cassette.save(self.path)
+        
+        self.recorded = len(api.connection.cassette)
+    
+    def tearDown(self):
+        os.unlink(self.path)
+    
+    def test_replay(self):
+        connection = ReplayConnection(self.path)
+        api = Api(None, None, connection=connection)
+        
+        walk(api, self.board_id)
+        
+        connection.verify()
+        self.assertEqual(len(connection.played), self.recorded)
+    
+    def test_extra_requests(self):
+        connection = ReplayConnection(self.path)
+        api = Api(None, None, connection=connection)
+        
+        with self.assertRaises(CassetteMismatch) as cm:
+            walk(api, self.board_id, with_labels=True)
+        
+        self.assertIn("+GET cards/", str(cm.exception), "Diff of extra calls is shown")
+    
+    def test_missing_requests(self):
+        connection = ReplayConnection(self.path)
+        api = Api(None, None, connection=connection)
+        
+        api.get_board(self.board_id).name
+        
+        with self.assertRaises(CassetteMismatch) as cm:
+            connection.verify()
+        self.assertIn("-GET lists/", str(cm.exception))
@@ -4,10 +4,14 @@ Created on 26.01.2017
 @author: glorpen
 '''
 import unittest
-from grello.connection import Api, Connection
+import threading
+from grello.connection import Api, Connection, NotFoundException
 from unittest.mock import patch, MagicMock
-from grello.objects import Member, Board
-from requests.exceptions import RequestException
+from grello.objects import Member, Board, Card
+from requests.exceptions import RequestException, ChunkedEncodingError
+from grello.ratelimit import RateLimiter, TokenBucket
+from grello.decoders import JsonDecoder
+from grello.tests.fake import FakeTrello, create_api
 
 class TestApi(unittest.TestCase):
     def test_connection_creating(self):
@@ -33,6 +37,27 @@ class TestApi(unittest.TestCase):
                 ctx.assert_called_once_with(con_instance)
                 con_instance.connect.assert_called_once_with(app_secret)
     
+    def test_custom_connection(self):
+        connection = Connection(None, None)
+        metrics = MagicMock()
+        
+        with self.assertRaises(ValueError, msg="Connection arguments are not silently ignored"):
+            Api(None, None, rate_limiter=RateLimiter(TokenBucket(1, 1)), connection=connection)
+        
+        a = Api(None, None, metrics=metrics, connection=connection)
+        try:
+            self.assertIs(a.connection, connection)
+            self.assertIs(connection.metrics, metrics, "Metrics are used by custom connection")
+        finally:
+            a.disconnect()
+        
+        limiter = RateLimiter(TokenBucket(1, 1))
+        a = create_api(("127.0.0.1", 1), rate_limiter=limiter)
+        try:
+            self.assertIs(a.connection.rate_limiter, limiter, "Fake api rate limiter can be overridden")
+        finally:
+            a.disconnect()
+    
     def test_quit(self):
         a = Api(None, None)
         a.context = MagicMock()
@@ -71,7 +96,7 @@ class TestConnection(unittest.TestCase):
         with patch("grello.connection.requests") as r:
             r.exceptions.RequestException = request_error
             
-            c = Connection(app_key, ui)
+            c = Connection(app_key, ui, decoder=JsonDecoder())
             
             r_get = MagicMock()
             r_get.status_code = 200
@@ -101,6 +126,25 @@ class TestConnection(unittest.TestCase):
                 c.do_request(test_uri, {})
             self.assertEqual(c_get.call_count, 4, "repeat request on exception")
     
+    def test_interrupted_stream(self):
+        metrics = MagicMock()
+        c = Connection("app_key", None, decoder=JsonDecoder(), metrics=metrics)
+        c.retry_delay = 0
+        c.session = MagicMock()
+        
+        def interrupted():
+            yield b'[{"id": 1},'
+            raise ChunkedEncodingError()
+        
+        responses = [MagicMock(status_code=200, headers={}) for _ in range(2)]
+        responses[0].iter_content.return_value = interrupted()
+        responses[1].iter_content.return_value = [b'[{"id": 1}, {"id": 2}]']
+        c.session.get.side_effect = responses
+        
+        self.assertEqual(list(c.do_request("test_uri", stream=True)), [{"id": 1}, {"id": 2}], "Read items are not repeated")
+        self.assertEqual(c.session.get.call_count, 2, "Request is sent again when body read fails")
+        metrics.inc.assert_any_call("grello_request_retries_total", method="get", endpoint="test_uri")
+    
     def test_token_creation(self):
         app_secret = "test_secret"
         known_token = ("test_token", "test_secret")
@@ -110,11 +154,142 @@ class TestConnection(unittest.TestCase):
         
         response = MagicMock()
         response.status_code = 200
+        response.json.return_value = {"id": "token_id", "idMember": "member_id"}
         
         with patch("grello.connection.OAuth1Session") as s:
             s().get.return_value = response
-            c = Connection("app_key", ui=ui)
+            c = Connection("app_key", ui=ui, decoder=JsonDecoder())
             c.connect(app_secret)
         
             s().get.assert_called_once_with('https://api.trello.com/1/tokens/test_token', files=None, params=None)
             # token should be checked for validity
+        
+        self.assertEqual(c.member_id, "member_id", "Member of token is known")
+
+class TestBatch(unittest.TestCase):
+    
+    def test_batching(self):
+        c = Connection("app_key", MagicMock(), decoder=JsonDecoder())
+        c.session = MagicMock()
+        
+        response = MagicMock()
+        response.status_code = 200
+        response.json.side_effect = lambda: [{"200": {"id": i}} for i in range(10)]
+        c.session.get.return_value = response
+        
+        callback = MagicMock()
+        
+        with c.batch() as b:
+            requests = [b.get("cards/%d" % i, {"fields": ("name", "desc")}, callback) for i in range(12)]
+            # lazy request is sent together with queued ones, as third item in second chunk
+            self.assertEqual(c.do_request("cards/12"), {"id": 2})
+        
+        self.assertEqual(c.session.get.call_count, 2, "Requests are sent in chunks of 10")
+        
+        urls = c.session.get.call_args_list[0][1]["params"]["urls"].split(",")
+        self.assertEqual(len(urls), 10)
+        self.assertEqual(urls[0], "/cards/0?fields=name%2Cdesc")
+        
+        self.assertEqual(requests[3].result, {"id": 3})
+        self.assertEqual(callback.call_count, 12)
+    
+    def test_lazy_request_without_queue(self):
+        c = Connection("app_key", MagicMock(), decoder=JsonDecoder())
+        c.session = MagicMock()
+        
+        response = MagicMock()
+        response.status_code = 200
+        response.json.return_value = {"id": "card_id"}
+        c.session.get.return_value = response
+        
+        with c.batch():
+            c.do_request("cards/card_id")
+        
+        self.assertEqual(c.session.get.call_args[0][0], "https://api.trello.com/1/cards/card_id", "Single request is not sent through batch endpoint")
+    
+    def test_coalescing(self):
+        fake = FakeTrello()
+        board_id = fake.generate_board(lists=1, cards=5)
+        fake.serve()
+        api = fake.create_api()
+        try:
+            cards = [api.get_any(Card, id=i) for i, c in fake.cards.items() if c["idBoard"] == board_id]
+            
+            with api.batch() as batch:
+                for card in cards:
+                    batch.load(card)
+            
+            self.assertEqual([c.name for c in cards], ["card %d" % i for i in range(5)])
+            self.assertEqual([r[1] for r in fake.requests], ["batch"], "Queued loads are sent in single request")
+        finally:
+            api.disconnect()
+            fake.shutdown()
+    
+    def test_failed_request(self):
+        c = Connection("app_key", MagicMock(), decoder=JsonDecoder())
+        c.session = MagicMock()
+        
+        response = MagicMock()
+        response.status_code = 200
+        response.json.return_value = [{"name": "NotFound", "statusCode": 404}]
+        c.session.get.return_value = response
+        
+        with c.batch() as b:
+            r = b.get("cards/some_id")
+        
+        with self.assertRaises(NotFoundException):
+            r.result
+
+class TestRateLimiter(unittest.TestCase):
+    
+    def test_bucket(self):
+        limiter = RateLimiter(TokenBucket(2, 0.2))
+        
+        for _ in range(3):
+            limiter.acquire()
+        
+        stats = limiter.get_stats()
+        self.assertEqual(stats["requests"], 3)
+        self.assertEqual(stats["waits"], 1, "Third request waits for free token")
+        self.assertGreater(stats["wait_time"], 0.05)
+    
+    def test_shared_key_bucket(self):
+        limiters = [RateLimiter.for_key("shared_app_key", token_limit=1000, key_limit=1000, period=10**6) for _ in range(8)]
+        key_bucket = limiters[0].key_bucket
+        
+        def run(limiter):
+            for _ in range(100):
+                limiter.acquire()
+        
+        threads = [threading.Thread(target=run, args=(l,)) for l in limiters]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        
+        self.assertIs(limiters[1].key_bucket, key_bucket)
+        self.assertAlmostEqual(key_bucket.tokens, 200, delta=1, msg="Requests of all limiters are counted by key bucket")
+        
+        with self.assertRaises(ValueError, msg="Other limit for the same key is not ignored"):
+            RateLimiter.for_key("shared_app_key", key_limit=10)
+    
+    def test_throttled_response(self):
+        limiter = RateLimiter(TokenBucket(100, 10))
+        c = Connection("app_key", MagicMock(), rate_limiter=limiter, decoder=JsonDecoder())
+        c.session = MagicMock()
+        
+        throttled = MagicMock()
+        throttled.status_code = 429
+        throttled.headers = {"Retry-After": "0.1", "x-rate-limit-api-token-remaining": "0"}
+        ok = MagicMock()
+        ok.status_code = 200
+        ok.headers = {}
+        ok.json.return_value = {"id": "some_id"}
+        
+        c.session.get.side_effect = [throttled, ok]
+        
+        self.assertEqual(c.do_request("cards/some_id"), {"id": "some_id"})
+        
+        stats = limiter.get_stats()
+        self.assertEqual(stats["throttled"], 1)
+        self.assertGreaterEqual(stats["wait_time"], 0.09, "Retry-After is honored")
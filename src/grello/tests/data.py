@@ -4,8 +4,17 @@ Created on 14.01.2017
 @author: glorpen
 '''
 import unittest
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from grello.data import InvalidIdException, ApiData
 from unittest.mock import patch, MagicMock
+from grello.repository import Repository
+from grello.context import Context
+from grello.objects import Label, Card
+from grello.connection import Api
+from grello import registry
+from grello.registry import FieldsProjection
 
 class SomeObject(object): pass
 
@@ -35,3 +44,146 @@ class TestApiData(unittest.TestCase):
         self.assertObjectsIds({"ids":{"id":1}}, False, "Throws exception when partial ids are given")
         self.assertObjectsIds({"ids":{"id":1,"id2":2}}, {"id":1,"id2":2}, "All ids are passed to object")
         self.assertObjectsIds({"ids":{"id2":2},"data":{"id":1, "some_data":"some"}}, {"id":1,"id2":2}, "Some ids are set from passed data")
+    
+    def test_object_binding(self):
+        context = MagicMock()
+        repository = Repository(context)
+        
+        label = repository.get_object(Label, data={"id": "some_id", "name": "some_name", "color": None})
+        
+        self.assertIs(repository.get_object_api_data(label), label._api_data)
+        
+        with patch("grello.context.manager") as manager:
+            self.assertEqual(label.name, "some_name")
+            self.assertFalse(manager.find_context.called, "Field access does not search for context")
+
+class TestThreadSafety(unittest.TestCase):
+    
+    def test_concurrent_loading(self):
+        connection = MagicMock()
+        def do_request(*args, **kwargs):
+            time.sleep(0.05)
+            return {"id": "some_id", "name": "some_name", "color": None}
+        connection.do_request.side_effect = do_request
+        
+        context = Context(connection, thread_safe=True)
+        try:
+            label = context.repository.get_object(Label, id="some_id")
+            
+            with ThreadPoolExecutor(5) as executor:
+                names = list(executor.map(lambda _: label.name, range(5)))
+        finally:
+            context.quit()
+        
+        self.assertEqual(names, ["some_name"] * 5)
+        self.assertEqual(connection.do_request.call_count, 1, "Object is loaded only once")
+    
+    def test_independent_loading(self):
+        connection = MagicMock()
+        lock = threading.Lock()
+        running = [0, 0]
+        def do_request(url, *args, **kwargs):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+            return {"id": url.split("/")[1], "name": "some_name", "color": None}
+        connection.do_request.side_effect = do_request
+        
+        context = Context(connection, thread_safe=True)
+        try:
+            labels = [context.repository.get_object(Label, id="label_%d" % i) for i in range(4)]
+            
+            with ThreadPoolExecutor(4) as executor:
+                list(executor.map(lambda l: l.name, labels))
+        finally:
+            context.quit()
+        
+        self.assertEqual(connection.do_request.call_count, 4)
+        self.assertEqual(running[1], 4, "Loads of different objects do not wait for each other")
+
+class TestFieldsProjection(unittest.TestCase):
+    
+    def test_default_fields(self):
+        context = MagicMock()
+        context.repository.storage = None
+        context.projection = FieldsProjection()
+        repository = Repository(context)
+        
+        card = repository.get_object(Card, data={"id": "card_id", "name": "some_name", "idBoard": "board_id", "idList": "list_id"})
+        api_data = repository.get_object_api_data(card)
+        default_fields = registry.objects.get_default_fields(Card)
+        
+        self.assertEqual(card.name, "some_name")
+        self.assertEqual(api_data.get_load_parameters()["fields"], default_fields, "Default fields are requested after any access")
+        
+        context.projection.learn(Card, "shortLink")
+        self.assertEqual(api_data.get_load_parameters()["fields"], default_fields + ("shortLink",), "Learned fields are added to default ones")
+    
+    def test_separate_contexts(self):
+        first = Api(None, None)
+        second = Api(None, None)
+        try:
+            first.context.projection.learn(Card, "shortLink")
+            
+            self.assertEqual(first.context.projection.get(Card), registry.objects.get_default_fields(Card) + ("shortLink",))
+            self.assertEqual(second.context.projection.get(Card), registry.objects.get_default_fields(Card), "Learned fields are not shared between contexts")
+        finally:
+            first.disconnect()
+            second.disconnect()
+    
+    def test_missing_field(self):
+        context = MagicMock()
+        context.repository.storage = None
+        context.projection = FieldsProjection()
+        context.connection.do_request.return_value = {"id": "card_id", "desc": "some_desc", "closed": False}
+        repository = Repository(context)
+        
+        data = {"id": "card_id", "name": "some_name"}
+        card = repository.get_object(Card, data=data)
+        
+        self.assertEqual(card.description, "some_desc")
+        context.connection.do_request.assert_called_once_with("cards/card_id", {"fields": ("desc", "subscribed", "closed", "dueComplete", "due", "idAttachmentCover", "idBoard", "idList")}, method="get")
+        self.assertEqual(data, {"id": "card_id", "name": "some_name"}, "Data given to object is not changed")
+        
+        self.assertIs(card.closed, False)
+        self.assertEqual(card.name, "some_name")
+        with self.assertRaises(KeyError, msg="Data keys read by custom loaders are not fetched"):
+            card.list
+        self.assertEqual(context.connection.do_request.call_count, 1, "Missing fields are fetched with single request")
+    
+    def test_fields_override(self):
+        with patch("grello.connection.Connection"):
+            api = Api("app_key", MagicMock())
+        api.context.connection.do_request.return_value = {"id": "card_id", "name": "some_name"}
+        
+        card = api.get_any(Card, id="card_id", fields=["name"])
+        
+        self.assertEqual(card.name, "some_name")
+        api.context.connection.do_request.assert_called_once_with("cards/card_id", {"fields": ("name",)}, method="get")
+
+class TestCompactData(unittest.TestCase):
+    
+    def test_lazy_decoding(self):
+        context = MagicMock()
+        context.repository.storage = None
+        repository = Repository(context)
+        
+        card = repository.get_object(Card, data={"id": "card_id", "name": "some_name", "due": None, "labels": []})
+        api_data = repository.get_object_api_data(card)
+        
+        self.assertFalse(hasattr(api_data, "__dict__"), "Object data is kept in slots")
+        self.assertIsNone(api_data.values, "Fields are not decoded before access")
+        
+        self.assertEqual(card.name, "some_name")
+        self.assertIsNone(card.due)
+        self.assertEqual(set(api_data.values), {"due"}, "Only custom loaders results are kept")
+        
+        labels = card.labels
+        api_data.set_data({"id": "card_id", "name": "other_name", "due": "2026-10-18T00:00:00.000Z", "labels": []})
+        
+        self.assertEqual(card.name, "other_name")
+        self.assertEqual(card.due.year, 2026, "Values are decoded again from new data")
+        self.assertIs(card.labels, labels, "Collections are kept")
@@ -0,0 +1,47 @@
+'''
+Created on 18.10.2026
+
+@author: glorpen
+'''
+import json
+import unittest
+from unittest.mock import MagicMock
+from grello.decoders import JsonDecoder
+
+def split(data, size):
+    return [data[i:i+size] for i in range(0, len(data), size)]
+
+class TestJsonDecoder(unittest.TestCase):
+    
+    def test_streaming(self):
+        items = [{"id": "card_id", "name": "zażółć \\\"]}", "pos": 12345}, 12345, "text", [1, [2]], None]
+        data = json.dumps(items, ensure_ascii=False).encode("utf-8")
+        
+        for size in (1, 2, 3, 7, len(data)):
+            self.assertEqual(list(JsonDecoder().iter_array_chunks(split(data, size))), items, "Items are decoded from %d bytes chunks" % size)
+        
+        self.assertEqual(list(JsonDecoder().iter_array_chunks([b" [ ] "])), [])
+    
+    def test_invalid_data(self):
+        for data in (b'{"id": 1}', b'[1, 2', b'[1] 2', b'[{"id": 1]'):
+            with self.assertRaises(ValueError, msg="Invalid array %r" % data):
+                list(JsonDecoder().iter_array_chunks(split(data, 2)))
+    
+    def test_response_closing(self):
+        response = MagicMock()
+        response.iter_content.return_value = [b'[{"id": 1},', b' {"id": 2}]']
+        
+        items = JsonDecoder().iter_array(response)
+        self.assertEqual(next(items), {"id": 1})
+        response.close.assert_not_called()
+        
+        items.close()
+        response.close.assert_called_once_with()
+    
+    def test_small_response(self):
+        response = MagicMock(headers={"Content-Length": "20"})
+        response.json.return_value = [{"id": 1}]
+        
+        self.assertEqual(list(JsonDecoder().iter_array(response)), [{"id": 1}], "Response of known small length is decoded at once")
+        response.iter_content.assert_not_called()
+        response.close.assert_called_once_with()
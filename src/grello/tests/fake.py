@@ -0,0 +1,529 @@
+'''
+Created on 18.10.2026
+
+@author: glorpen
+'''
+import itertools
+import json
+import re
+import threading
+import time
+import requests
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from grello.connection import Api, Connection
+from grello.ratelimit import RateLimiter, TokenBucket
+
+class NotFound(Exception):
+    pass
+
+# fallback routes are matched after all others
+def _route(method, pattern, fallback=False):
+    def inner(f):
+        f.route = (method, re.compile("^%s$" % pattern), fallback)
+        return f
+    return inner
+
+# In-memory Trello, serves endpoints used by grello.objects.
+class FakeTrello(object):
+    
+    def __init__(self, latency=0):
+        super(FakeTrello, self).__init__()
+        self.latency = latency
+        
+        self.boards = {}
+        self.lists = {}
+        self.cards = {}
+        self.labels = {}
+        self.checklists = {}
+        self.checkitems = {}
+        self.members = {}
+        self.notifications = {}
+        self.attachments = {}
+        
+        # (method, path, params) of each handled request
+        self.requests = []
+        
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+        self._routes = sorted((getattr(self, n) for n in dir(self) if hasattr(getattr(self, n), "route")), key=lambda f: f.route[2])
+        
+        self.me = self._add(self.members, {"username": "me", "fullName": "Me", "email": "me@example.com", "url": "url"})
+        self.server = None
+    
+    def new_id(self):
+        return "%024x" % next(self._ids)
+    
+    def _add(self, store, data):
+        data["id"] = self.new_id()
+        store[data["id"]] = data
+        return data
+    
+    def generate_board(self, lists=5, cards=100, labels=6, checklists=0, checkitems=3, members=3):
+        board = self._add(self.boards, {"name": "board", "desc": "", "subscribed": False, "closed": False, "dateLastActivity": "2026-01-01T00:00:00.000Z"})
+        board_members = [self.me] + [
+            self._add(self.members, {"username": "user%d" % i, "fullName": "User %d" % i, "email": None, "url": "url"}) for i in range(members - 1)
+        ]
+        board["idMembers"] = [m["id"] for m in board_members]
+        
+        board_labels = [self._add(self.labels, {"name": "label %d" % i, "color": "red", "idBoard": board["id"], "uses": 0}) for i in range(labels)]
+        board_lists = [self._add(self.lists, {"name": "list %d" % i, "pos": i, "closed": False, "idBoard": board["id"]}) for i in range(lists)]
+        
+        for i in range(cards):
+            card = self._add(self.cards, {
+                "name": "card %d" % i, "desc": "description %d" % i, "subscribed": False, "closed": False,
+                "dueComplete": False, "due": None, "idAttachmentCover": None, "pos": i,
+                "idBoard": board["id"], "idList": board_lists[i % lists]["id"] if lists else None,
+                "idLabels": [board_labels[i % labels]["id"]] if labels else [],
+                "idMembers": [board_members[i % members]["id"]] if members else [],
+                "dateLastActivity": "2026-01-01T00:00:00.000Z",
+            })
+            for l in card["idLabels"]:
+                self.labels[l]["uses"] += 1
+            
+            for j in range(checklists):
+                checklist = self._add(self.checklists, {"name": "checklist %d" % j, "pos": j, "idCard": card["id"], "idBoard": board["id"]})
+                for k in range(checkitems):
+                    self._add(self.checkitems, {"name": "item %d" % k, "pos": k, "state": "incomplete", "idChecklist": checklist["id"]})
+        
+        return board["id"]
+    
+    # serialization
+    
+    def _fields(self, data, fields, extra=None):
+        ret = dict(data)
+        if extra:
+            ret.update(extra())
+        if fields and fields != ["all"]:
+            ret = dict((k, v) for k, v in ret.items() if k in fields or k == "id")
+        return ret
+    
+    def card(self, card, fields=None):
+        return self._fields(card, fields, lambda: {"labels": [self.labels[i] for i in card["idLabels"]]})
+    
+    def checklist(self, checklist, fields=None):
+        return self._fields(checklist, fields, lambda: {"checkItems": self._children(self.checkitems, "idChecklist", checklist["id"])})
+    
+    def _children(self, store, ref, parent_id, filter=None):
+        items = [i for i in store.values() if i.get(ref) == parent_id]
+        if filter == "open" or filter == "visible":
+            items = [i for i in items if not i.get("closed")]
+        return items
+    
+    # paging of endpoints supporting "before", other ones return all items
+    def _page(self, items, params):
+        # newest first, like Trello
+        items = sorted(items, key=lambda i: i["id"], reverse=True)
+        if "before" in params:
+            items = [i for i in items if i["id"] < params["before"]]
+        if "limit" in params:
+            items = items[:int(params["limit"])]
+        return items
+    
+    def _get(self, store, object_id):
+        try:
+            return store[object_id]
+        except KeyError:
+            raise NotFound() from None
+    
+    def _set_field(self, store, object_id, field, params):
+        obj = self._get(store, object_id)
+        value = params["value"]
+        if value in ("true", "false"):
+            value = value == "true"
+        obj[field] = value
+        return obj
+    
+    # routes
+    
+    @_route("get", r"boards/(\w+)")
+    def get_board(self, params, board_id):
+        board = self._get(self.boards, board_id)
+        ret = self._fields(board, params.get("fields"))
+        
+        if "lists" in params:
+            ret["lists"] = self._children(self.lists, "idBoard", board_id, params["lists"])
+        if "cards" in params:
+            ret["cards"] = [self.card(c) for c in self._children(self.cards, "idBoard", board_id, params["cards"])]
+        if "labels" in params:
+            ret["labels"] = self._children(self.labels, "idBoard", board_id)
+        if "members" in params:
+            ret["members"] = [self._fields(self.members[i], params.get("member_fields")) for i in board["idMembers"]]
+        if "checklists" in params:
+            ret["checklists"] = [self.checklist(c) for c in self._children(self.checklists, "idBoard", board_id)]
+        return ret
+    
+    @_route("get", r"boards/(\w+)/lists")
+    def get_board_lists(self, params, board_id):
+        return [self._fields(l, params.get("fields")) for l in self._children(self.lists, "idBoard", board_id, "open")]
+    
+    @_route("post", r"boards/(\w+)/lists")
+    def add_board_list(self, params, board_id):
+        return self._add(self.lists, {"name": params["name"], "pos": params.get("pos"), "closed": False, "idBoard": board_id})
+    
+    @_route("get", r"boards/(\w+)/labels")
+    def get_board_labels(self, params, board_id):
+        return [self._fields(l, params.get("fields")) for l in self._children(self.labels, "idBoard", board_id)]
+    
+    @_route("post", r"boards/(\w+)/labels")
+    def add_board_label(self, params, board_id):
+        return self._add(self.labels, {"name": params["name"], "color": params.get("color"), "idBoard": board_id, "uses": 0})
+    
+    @_route("get", r"boards/(\w+)/cards")
+    def get_board_cards(self, params, board_id):
+        cards = self._children(self.cards, "idBoard", board_id, params.get("filter", "visible"))
+        return [self.card(c, params.get("fields")) for c in self._page(cards, params)]
+    
+    @_route("get", r"boards?/(\w+)/members")
+    def get_board_members(self, params, board_id):
+        return [self._fields(self.members[i], params.get("fields")) for i in self._get(self.boards, board_id)["idMembers"]]
+    
+    @_route("get", r"boards/(\w+)/actions")
+    def get_board_actions(self, params, board_id):
+        return []
+    
+    @_route("get", r"lists/(\w+)")
+    def get_list(self, params, list_id):
+        return self._fields(self._get(self.lists, list_id), params.get("fields"))
+    
+    @_route("put", r"lists/(\w+)/(\w+)", fallback=True)
+    def set_list_field(self, params, list_id, field):
+        return self._set_field(self.lists, list_id, field, params)
+    
+    @_route("get", r"lists/(\w+)/cards")
+    def get_list_cards(self, params, list_id):
+        cards = self._children(self.cards, "idList", list_id, params.get("filter", "visible"))
+        return [self.card(c, params.get("fields")) for c in cards]
+    
+    @_route("post", r"lists/(\w+)/cards")
+    def add_list_card(self, params, list_id):
+        lst = self._get(self.lists, list_id)
+        return self.card(self._add(self.cards, {
+            "name": params["name"], "desc": params.get("desc", ""), "subscribed": False, "closed": False,
+            "dueComplete": False, "due": params.get("due"), "idAttachmentCover": None, "pos": 0,
+            "idBoard": lst["idBoard"], "idList": list_id, "idLabels": [],
+            "idMembers": params["idMembers"].split(",") if params.get("idMembers") else [],
+            "dateLastActivity": "2026-01-01T00:00:00.000Z",
+        }))
+    
+    @_route("get", r"cards/(\w+)")
+    def get_card(self, params, card_id):
+        return self.card(self._get(self.cards, card_id), params.get("fields"))
+    
+    @_route("put", r"cards/(\w+)")
+    def update_card(self, params, card_id):
+        card = self._get(self.cards, card_id)
+        for k, v in params.items():
+            card[k] = (v == "true") if v in ("true", "false") else v
+        return self.card(card)
+    
+    @_route("get", r"cards/(\w+)/idLabels")
+    def get_card_label_ids(self, params, card_id):
+        return self._get(self.cards, card_id)["idLabels"]
+    
+    @_route("post", r"cards/(\w+)/idLabels")
+    def add_card_label(self, params, card_id):
+        card = self._get(self.cards, card_id)
+        if params["value"] not in card["idLabels"]:
+            card["idLabels"].append(params["value"])
+            self.labels[params["value"]]["uses"] += 1
+        return card["idLabels"]
+    
+    @_route("post", r"cards/(\w+)/labels")
+    def add_card_new_label(self, params, card_id):
+        card = self._get(self.cards, card_id)
+        label = self._add(self.labels, {"name": params["name"], "color": params.get("color"), "idBoard": card["idBoard"], "uses": 1})
+        card["idLabels"].append(label["id"])
+        return label
+    
+    @_route("delete", r"cards/(\w+)/idLabels/(\w+)")
+    def remove_card_label(self, params, card_id, label_id):
+        self._get(self.cards, card_id)["idLabels"].remove(label_id)
+        self.labels[label_id]["uses"] -= 1
+        return {"_value": None}
+    
+    @_route("get", r"cards/(\w+)/checklists")
+    def get_card_checklists(self, params, card_id):
+        return [self.checklist(c, params.get("fields")) for c in self._children(self.checklists, "idCard", card_id)]
+    
+    @_route("post", r"cards/(\w+)/checklists")
+    def add_card_checklist(self, params, card_id):
+        card = self._get(self.cards, card_id)
+        return self.checklist(self._add(self.checklists, {"name": params["name"], "pos": params.get("pos"), "idCard": card_id, "idBoard": card["idBoard"]}))
+    
+    @_route("get", r"cards/(\w+)/members")
+    def get_card_members(self, params, card_id):
+        return [self._fields(self.members[i], params.get("fields")) for i in self._get(self.cards, card_id)["idMembers"]]
+    
+    @_route("post", r"cards/(\w+)/idMembers")
+    def add_card_member(self, params, card_id):
+        ids = self._get(self.cards, card_id)["idMembers"]
+        if params["value"] not in ids:
+            ids.append(params["value"])
+        return ids
+    
+    @_route("get", r"cards/(\w+)/attachments")
+    def get_card_attachments(self, params, card_id):
+        return [self._fields(a, params.get("fields")) for a in self._children(self.attachments, "idCard", card_id)]
+    
+    @_route("post", r"cards/(\w+)/attachments")
+    def add_card_attachment(self, params, card_id):
+        self._get(self.cards, card_id)
+        return self._add(self.attachments, {"name": params.get("name"), "mimeType": params.get("mimeType"), "url": params.get("url"), "bytes": 0, "idCard": card_id})
+    
+    @_route("get", r"cards/(\w+)/attachments/(\w+)")
+    def get_attachment(self, params, card_id, attachment_id):
+        return self._fields(self._get(self.attachments, attachment_id), params.get("fields"))
+    
+    @_route("get", r"cards/(\w+)/checklist/(\w+)/checkItem/(\w+)")
+    def get_checkitem(self, params, card_id, checklist_id, item_id):
+        return self._fields(self._get(self.checkitems, item_id), params.get("fields"))
+    
+    @_route("put", r"cards/(\w+)/checklist/(\w+)/checkItem/(\w+)/(\w+)")
+    def set_checkitem_field(self, params, card_id, checklist_id, item_id, field):
+        return self._set_field(self.checkitems, item_id, field, params)
+    
+    @_route("get", r"cards/(\w+)/(\w+)", fallback=True)
+    def get_card_field(self, params, card_id, field):
+        return {"_value": self._get(self.cards, card_id)[field]}
+    
+    @_route("put", r"cards/(\w+)/(\w+)", fallback=True)
+    def set_card_field(self, params, card_id, field):
+        return self.card(self._set_field(self.cards, card_id, field, params))
+    
+    @_route("get", r"labels/(\w+)")
+    def get_label(self, params, label_id):
+        return self._fields(self._get(self.labels, label_id), params.get("fields"))
+    
+    @_route("put", r"labels/(\w+)/(\w+)")
+    def set_label_field(self, params, label_id, field):
+        return self._set_field(self.labels, label_id, field, params)
+    
+    @_route("delete", r"labels/(\w+)")
+    def remove_label(self, params, label_id):
+        self._get(self.labels, label_id)
+        del self.labels[label_id]
+        for card in self.cards.values():
+            if label_id in card["idLabels"]:
+                card["idLabels"].remove(label_id)
+        return {"_value": None}
+    
+    @_route("get", r"checklists/(\w+)")
+    def get_checklist(self, params, checklist_id):
+        return self.checklist(self._get(self.checklists, checklist_id), params.get("fields"))
+    
+    @_route("delete", r"checklists/(\w+)")
+    def remove_checklist(self, params, checklist_id):
+        del self.checklists[checklist_id]
+        return {"_value": None}
+    
+    @_route("get", r"checklists/(\w+)/checkItems")
+    def get_checkitems(self, params, checklist_id):
+        return [self._fields(i, params.get("fields")) for i in self._children(self.checkitems, "idChecklist", checklist_id)]
+    
+    @_route("post", r"checklists/(\w+)/checkItems")
+    def add_checkitem(self, params, checklist_id):
+        self._get(self.checklists, checklist_id)
+        return self._add(self.checkitems, {
+            "name": params["name"], "pos": params.get("pos"),
+            "state": "complete" if params.get("checked") == "true" else "incomplete", "idChecklist": checklist_id
+        })
+    
+    @_route("delete", r"checklists/(\w+)/checkItems/(\w+)")
+    def remove_checkitem(self, params, checklist_id, item_id):
+        del self.checkitems[item_id]
+        return {"_value": None}
+    
+    def _get_member(self, member_id):
+        return self.me if member_id == "me" else self._get(self.members, member_id)
+    
+    @_route("get", r"members/(\w+)")
+    def get_member(self, params, member_id):
+        return self._fields(self._get_member(member_id), params.get("fields"))
+    
+    @_route("get", r"members/(\w+)/boards")
+    def get_member_boards(self, params, member_id):
+        member = self._get_member(member_id)
+        return [self._fields(b, params.get("fields")) for b in self.boards.values() if member["id"] in b["idMembers"]]
+    
+    @_route("get", r"members/(\w+)/cards")
+    def get_member_cards(self, params, member_id):
+        member = self._get_member(member_id)
+        cards = [c for c in self.cards.values() if member["id"] in c["idMembers"] and not c["closed"]]
+        return [self.card(c, params.get("fields")) for c in cards]
+    
+    @_route("get", r"members/(\w+)/notifications")
+    def get_member_notifications(self, params, member_id):
+        return [self._fields(n, params.get("fields")) for n in self._page(self.notifications.values(), params)]
+    
+    @_route("get", r"notifications/(\w+)")
+    def get_notification(self, params, notification_id):
+        return self._fields(self._get(self.notifications, notification_id), params.get("fields"))
+    
+    @_route("put", r"notifications/(\w+)/(\w+)")
+    def set_notification_field(self, params, notification_id, field):
+        return self._set_field(self.notifications, notification_id, field, params)
+    
+    # not Trello api, used by benchmarks running fake in other process
+    @_route("get", r"_fake/requests")
+    def get_request_count(self, params):
+        # this request is not counted
+        return {"count": len(self.requests) - 1}
+    
+    @_route("delete", r"_fake/requests")
+    def clear_requests(self, params):
+        self.reset_requests()
+        return {}
+    
+    @_route("get", r"tokens/(\w+)")
+    def get_token(self, params, token):
+        return {"id": token, "idMember": self.me["id"]}
+    
+    @_route("get", r"batch")
+    def batch(self, params):
+        ret = []
+        for url in params["urls"]:
+            u = urlsplit(url)
+            try:
+                ret.append({"200": self.dispatch("get", u.path.strip("/"), self.parse_params(u.query))})
+            except NotFound:
+                ret.append({"name": "NotFound", "message": "not found", "statusCode": 404})
+        return ret
+    
+    # requests handling
+    
+    def parse_params(self, query):
+        params = {}
+        for k, v in parse_qs(query).items():
+            if k == "urls":
+                params[k] = v[0].split(",") if len(v) == 1 else v
+            elif k in ("fields", "member_fields"):
+                params[k] = v if len(v) > 1 else v[0].split(",")
+            else:
+                params[k] = v[0]
+        return params
+    
+    def dispatch(self, method, path, params):
+        for f in self._routes:
+            m, pattern, _fallback = f.route
+            match = pattern.match(path)
+            if m == method and match:
+                with self._lock:
+                    return f(params, *match.groups())
+        raise NotFound()
+    
+    def handle(self, method, url):
+        u = urlsplit(url)
+        path = re.sub(r"^/1/", "", u.path)
+        params = self.parse_params(u.query)
+        
+        self.requests.append((method, path, params))
+        
+        if self.latency:
+            time.sleep(self.latency)
+        
+        return self.dispatch(method, path, params)
+    
+    @property
+    def request_count(self):
+        return len(self.requests)
+    
+    def reset_requests(self):
+        del self.requests[:]
+    
+    def serve(self, host="127.0.0.1", port=0):
+        fake = self
+        
+        class RequestHandler(BaseHTTPRequestHandler):
+            
+            # keep-alive connections
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+            
+            def _handle(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+                
+                try:
+                    body = json.dumps(fake.handle(method, self.path)).encode("utf-8")
+                except NotFound:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def do_GET(self):
+                self._handle("get")
+            
+            def do_POST(self):
+                self._handle("post")
+            
+            def do_PUT(self):
+                self._handle("put")
+            
+            def do_DELETE(self):
+                self._handle("delete")
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer((host, port), RequestHandler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server
+    
+    def shutdown(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+    
+    def create_api(self, connection_class=Connection, **kwargs):
+        return create_api(self.server.server_address[:2], connection_class, **kwargs)
+
+# creates Api connected to served fake, without authorization and rate limits
+def create_api(address, connection_class=Connection, **kwargs):
+    rate_limiter = kwargs.pop("rate_limiter", None) or RateLimiter(TokenBucket(10**9, 1))
+    connection = connection_class("app_key", None, rate_limiter=rate_limiter, metrics=kwargs.get("metrics"))
+    connection.api_scheme = "http"
+    connection.api_host = "%s:%d" % tuple(address)
+    connection.session = requests.Session()
+    # local server is never behind proxy
+    connection.session.trust_env = False
+    connection.session.mount("http://", connection.create_adapter())
+    
+    return Api("app_key", None, connection=connection, **kwargs)
+
+def main():
+    import argparse
+    import sys
+    
+    parser = argparse.ArgumentParser(description="Serves fake Trello api with generated board")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0, help="seconds added to each request")
+    parser.add_argument("--lists", type=int, default=5)
+    parser.add_argument("--cards", type=int, default=100)
+    parser.add_argument("--labels", type=int, default=6)
+    parser.add_argument("--checklists", type=int, default=0)
+    args = parser.parse_args()
+    
+    fake = FakeTrello(args.latency)
+    board_id = fake.generate_board(lists=args.lists, cards=args.cards, labels=args.labels, checklists=args.checklists)
+    server = fake.serve(port=args.port)
+    
+    print(json.dumps({"address": server.server_address[:2], "board": board_id}))
+    sys.stdout.flush()
+    
+    # runs until stdin is closed
+    sys.stdin.read()
+    fake.shutdown()
+
+if __name__ == "__main__":
+    main()
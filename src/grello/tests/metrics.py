@@ -0,0 +1,70 @@
+'''
+Created on 18.10.2026
+
+@author: glorpen
+'''
+import unittest
+from unittest.mock import MagicMock
+from requests.exceptions import RequestException
+from grello.metrics import Metrics, get_endpoint_template
+from grello.connection import Connection
+from grello.decoders import JsonDecoder
+from grello.context import Context
+from grello.objects import Label
+
+class TestMetrics(unittest.TestCase):
+    
+    def test_endpoint_template(self):
+        self.assertEqual(get_endpoint_template("cards/5a4b3c2d1e0f5a4b3c2d1e0f/desc"), "cards/{id}/desc")
+        self.assertEqual(get_endpoint_template("members/me/boards"), "members/me/boards")
+    
+    def test_prometheus_format(self):
+        m = Metrics(buckets=(0.1, 1))
+        m.inc("requests_total", endpoint="cards/{id}", status="200")
+        m.inc("requests_total", endpoint="cards/{id}", status="200")
+        m.observe("duration_seconds", 0.5, endpoint="cards/{id}")
+        
+        self.assertEqual(m.to_prometheus(), "\n".join([
+            '# TYPE requests_total counter',
+            'requests_total{endpoint="cards/{id}",status="200"} 2',
+            '# TYPE duration_seconds histogram',
+            'duration_seconds_bucket{endpoint="cards/{id}",le="0.1"} 0',
+            'duration_seconds_bucket{endpoint="cards/{id}",le="1"} 1',
+            'duration_seconds_bucket{endpoint="cards/{id}",le="+Inf"} 1',
+            'duration_seconds_sum{endpoint="cards/{id}"} 0.5',
+            'duration_seconds_count{endpoint="cards/{id}"} 1',
+        ]) + "\n")
+    
+    def test_requests(self):
+        m = Metrics()
+        c = Connection("app_key", MagicMock(), metrics=m, decoder=JsonDecoder())
+        c.retry_delay = 0
+        c.session = MagicMock()
+        
+        response = MagicMock()
+        response.status_code = 200
+        response.headers = {}
+        c.session.get.side_effect = [RequestException(), response]
+        
+        c.do_request("cards/5a4b3c2d1e0f5a4b3c2d1e0f")
+        
+        self.assertEqual(m.get("grello_requests_total", method="get", endpoint="cards/{id}", status="200"), 1)
+        self.assertEqual(m.get("grello_requests_total", method="get", endpoint="cards/{id}", status="error"), 1)
+        self.assertEqual(m.get("grello_request_retries_total", method="get", endpoint="cards/{id}"), 1)
+        self.assertEqual(m.snapshot()["histograms"]["grello_request_duration_seconds"][0][1]["count"], 2)
+    
+    def test_objects(self):
+        m = Metrics()
+        connection = MagicMock()
+        connection.do_request.return_value = {"id": "label_id", "name": "name", "color": None}
+        context = Context(connection, metrics=m)
+        try:
+            label = context.repository.get_object(Label, id="label_id")
+            context.repository.get_object(Label, id="label_id")
+            label.color
+        finally:
+            context.quit()
+        
+        self.assertEqual(m.get("grello_cache_requests_total", object="Label", result="miss"), 1)
+        self.assertEqual(m.get("grello_cache_requests_total", object="Label", result="hit"), 1)
+        self.assertEqual(m.get("grello_loads_total", object="Label", field="color"), 1)
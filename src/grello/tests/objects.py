@@ -6,14 +6,19 @@ Created on 14.01.2017
 import unittest
 from unittest import mock
 from grello.data import ApiData
-from grello.objects import Attachment, Label, Card
+from grello.objects import Attachment, Label, Card, List, Board
 from unittest.mock import patch
+from grello.connection import Api
+from grello.actions import ActionApplier
+from grello.tests.fake import FakeTrello
+from grello.registry import FieldsProjection
 
 class TestAttachment(unittest.TestCase):
     
     @patch("grello.context.manager")
     def test_loading_request(self, manager):
         context = mock.MagicMock()
+        context.projection = FieldsProjection()
         
         manager.find_context().return_value = context
         
@@ -31,6 +36,7 @@ class TestLabel(unittest.TestCase):
     @patch("grello.context.manager")
     def test_loading_request(self, manager):
         context = mock.MagicMock()
+        context.projection = FieldsProjection()
         
         manager.find_context.return_value = context
         
@@ -39,7 +45,7 @@ class TestLabel(unittest.TestCase):
         d = ApiData(a, context)
         d.load()
         
-        context.connection.do_request.assert_called_with('labels/some_id', {'fields': ('color', 'name', 'uses')}, method="get")
+        context.connection.do_request.assert_called_with('labels/some_id', {'fields': ('color', 'name')}, method="get")
     
     @patch("grello.context.manager")
     def test_assigment_trigger(self, manager):
@@ -60,4 +66,240 @@ class TestLabel(unittest.TestCase):
         ret = c.labels.add(label=l)
         self.assertIs(l, ret)
         
-        context.event_dispatcher.trigger.assert_called_with('label.assigned', c, l, None)
+        context.event_dispatcher.trigger.assert_called_with('label.assigned', c, l)
+
+def expanded_board_data():
+    return {
+        "id": "board_id", "name": "board", "desc": "", "subscribed": False,
+        "labels": [{"id": "label_id", "name": "label", "color": "red"}],
+        "members": [{"id": "member_id", "username": "user", "fullName": "User", "email": None, "url": "url"}],
+        "lists": [{"id": "list_id", "name": "list", "pos": 1}],
+        "cards": [{
+            "id": "card_id", "name": "card", "idList": "list_id", "idMembers": ["member_id"],
+            "labels": [{"id": "label_id", "name": "label", "color": "red"}]
+        }],
+        "checklists": [{
+            "id": "checklist_id", "name": "checklist", "pos": 1, "idCard": "card_id",
+            "checkItems": [{"id": "item_id", "name": "item", "pos": 1, "state": "complete"}]
+        }],
+    }
+
+class TestBoard(unittest.TestCase):
+    
+    def test_expanded_loading(self):
+        a = Api(None, None)
+        a.connection.do_request = mock.MagicMock(return_value=expanded_board_data())
+        
+        try:
+            board = a.get_board("board_id", expand=True)
+            
+            lists = board.lists.items
+            cards = lists[0].cards.items
+            card = cards[0]
+            
+            self.assertEqual(lists[0].name, "list")
+            self.assertEqual(card.name, "card")
+            self.assertIs(card.labels.items[0], board.labels.items[0], "Labels are same objects")
+            self.assertEqual(card.members.items[0].full_name, "User")
+            self.assertTrue(card.checklists.items[0].items.items[0].completed)
+            
+            self.assertEqual(a.connection.do_request.call_count, 1, "Whole board is fetched in single request")
+            
+            params = a.connection.do_request.call_args[0][1]
+            self.assertEqual(params["cards"], "visible")
+            self.assertEqual(params["fields"], ("name", "desc", "subscribed"))
+        finally:
+            a.disconnect()
+    
+    def test_label_removing(self):
+        a = Api(None, None)
+        a.connection.do_request = mock.MagicMock(return_value=expanded_board_data())
+        
+        try:
+            board = a.get_board("board_id", expand=True)
+            card = board.lists.items[0].cards.items[0]
+            label = card.labels.items[0]
+            
+            other_card = a.get_any(Card, id="other_card_id")
+            
+            board.labels.remove(label)
+            
+            self.assertEqual(card.labels.items, [], "Label is removed from card")
+            self.assertFalse(other_card._api_data.get_field("labels").loaded, "Cards without loaded label are not touched")
+            a.connection.do_request.assert_called_with("labels/label_id", method="delete")
+        finally:
+            a.disconnect()
+
+    def test_label_created(self):
+        a = Api(None, None)
+        a.connection.do_request = mock.MagicMock(return_value=expanded_board_data())
+        
+        try:
+            board = a.get_board("board_id", expand=True)
+            card = board.cards.items[0]
+            self.assertEqual(len(board.labels.items), 1)
+            other_board = a.context.repository.get_object(Board, data={"id": "other_board_id", "name": "other", "labels": []})
+            self.assertEqual(other_board.labels.items, [])
+            
+            a.apply_action({"type": "createLabel", "data": {
+                "label": {"id": "new_label_id", "name": "new", "color": "blue"}, "board": {"id": "board_id"},
+            }})
+            self.assertEqual([l.id for l in board.labels.items], ["label_id", "new_label_id"])
+            
+            a.connection.do_request = mock.MagicMock(return_value={"id": "card_label_id", "name": "card label", "color": "red"})
+            card.labels.add(name="card label", color="red")
+            self.assertEqual([l.id for l in board.labels.items], ["label_id", "new_label_id", "card_label_id"], "Label created by card is added to its board")
+            
+            self.assertEqual(other_board.labels.items, [], "Labels of other boards are not touched")
+        finally:
+            a.disconnect()
+    
+    @patch.object(ActionApplier, "page_size", 2)
+    def test_sync(self):
+        a = Api(None, None)
+        a.connection.do_request = mock.MagicMock(return_value=expanded_board_data())
+        
+        try:
+            board = a.get_board("board_id", expand=True)
+            lst = board.lists.items[0]
+            card = lst.cards.items[0]
+            
+            a.connection.do_request.side_effect = [
+                [{"id": "action_1", "type": "updateBoard", "data": {"board": {"id": "board_id", "name": "old"}}}],
+                [
+                    {"id": "action_4", "type": "createCard", "data": {"card": {"id": "new_card_id"}, "list": {"id": "list_id"}}},
+                    {"id": "action_3", "type": "updateCard", "data": {"card": {"id": "card_id", "name": "new name"}}},
+                ],
+                [{"id": "action_2", "type": "commentCard", "data": {}}],
+            ]
+            
+            self.assertEqual(board.sync(), 0, "First sync only sets starting point")
+            self.assertEqual(board.name, "board")
+            
+            self.assertEqual(board.sync(), 3)
+            self.assertEqual(card.name, "new name")
+            self.assertEqual([c.id for c in lst.cards.items], ["card_id", "new_card_id"])
+            
+            url, params = a.connection.do_request.call_args[0][:2]
+            self.assertEqual(url, "boards/board_id/actions")
+            self.assertEqual((params["since"], params["before"]), ("action_1", "action_3"), "Feed is paginated")
+        finally:
+            a.disconnect()
+    
+    def test_card_actions(self):
+        a = Api(None, None)
+        a.connection.do_request = mock.MagicMock(return_value=expanded_board_data())
+        
+        try:
+            board = a.get_board("board_id", expand=True)
+            lst = board.lists.items[0]
+            card = lst.cards.items[0]
+            repository = a.context.repository
+            
+            a.connection.do_request = mock.MagicMock(side_effect=AssertionError("Actions do not make requests"))
+            a.apply_action({"type": "createCard", "data": {
+                "card": {"id": "new_card_id", "name": "new card", "shortLink": "abc"},
+                "list": {"id": "list_id"}, "board": {"id": "board_id"},
+            }})
+            new_card = lst.cards.items[1]
+            self.assertEqual(new_card.name, "new card", "Created card has data from action")
+            self.assertIs(new_card.list, lst)
+            self.assertEqual(set(repository.query(Card).where(list=lst)), {card, new_card})
+            
+            a.apply_action({"type": "deleteCard", "data": {"card": {"id": "card_id"}, "list": {"id": "list_id"}, "board": {"id": "board_id"}}})
+            self.assertEqual(lst.cards.items, [new_card])
+            self.assertIsNone(repository.find_object(Card, id="card_id"), "Deleted card is removed from cache")
+            self.assertEqual(list(repository.query(Card).where(list=lst)), [new_card], "Deleted card is removed from indexes")
+        finally:
+            a.disconnect()
+
+class TestPagination(unittest.TestCase):
+    
+    @patch.object(ApiData, "page_size", 2)
+    def test_paginated_cards(self):
+        a = Api(None, None)
+        a.connection.do_request = mock.MagicMock(side_effect=[
+            [{"id": "card_3", "name": "card"}, {"id": "card_2", "name": "card"}],
+            [{"id": "card_1", "name": "card"}],
+        ])
+        
+        try:
+            l = a.get_any(Board, id="board_id")
+            l._api_data.set_data({"id": "board_id", "name": "board"})
+            
+            for c in l.cards:
+                break
+            
+            self.assertEqual(c.id, "card_3")
+            self.assertEqual(a.connection.do_request.call_count, 1, "Only first page is fetched before first item is returned")
+            
+            self.assertEqual([c.id for c in l.cards], ["card_3", "card_2", "card_1"])
+            self.assertEqual(a.connection.do_request.call_count, 2)
+            
+            params = a.connection.do_request.call_args[0][1]
+            self.assertEqual(params["before"], "card_2")
+            self.assertEqual(params["limit"], 2)
+        finally:
+            a.disconnect()
+    
+    @patch.object(ApiData, "page_size", 2)
+    def test_ignored_pagination(self):
+        a = Api(None, None)
+        # endpoint always returns the same full page
+        a.connection.do_request = mock.MagicMock(side_effect=lambda *args, **kwargs: [{"id": "card_3", "name": "card"}, {"id": "card_2", "name": "card"}])
+        
+        try:
+            l = a.get_any(Board, id="board_id")
+            l._api_data.set_data({"id": "board_id", "name": "board"})
+            
+            self.assertEqual([c.id for c in l.cards], ["card_3", "card_2"])
+            self.assertEqual(a.connection.do_request.call_count, 2, "Fetching stops when page has no older items")
+        finally:
+            a.disconnect()
+    
+    @patch.object(ApiData, "page_size", 2)
+    def test_unpaged_endpoint(self):
+        a = Api(None, None)
+        a.connection.do_request = mock.MagicMock(return_value=[{"id": "card_1", "name": "card"}, {"id": "card_3", "name": "card"}, {"id": "card_2", "name": "card"}])
+        
+        try:
+            l = a.get_any(List, id="list_id")
+            l._api_data.set_data({"id": "list_id", "name": "list", "pos": 1})
+            
+            self.assertEqual([c.id for c in l.cards], ["card_1", "card_3", "card_2"])
+            params = a.connection.do_request.call_args[0][1]
+            self.assertNotIn("limit", params, "List cards are fetched with single request")
+        finally:
+            a.disconnect()
+
+class TestEndToEnd(unittest.TestCase):
+    
+    def setUp(self):
+        self.fake = FakeTrello()
+        self.board_id = self.fake.generate_board(lists=2, cards=6, labels=2, checklists=1)
+        self.fake.serve()
+        self.api = self.fake.create_api()
+    
+    def tearDown(self):
+        self.api.disconnect()
+        self.fake.shutdown()
+    
+    def test_board_walk(self):
+        board = self.api.get_board(self.board_id, expand=True)
+        
+        cards = [c for l in board.lists for c in l.cards]
+        self.assertEqual(sorted(c.name for c in cards), ["card %d" % i for i in range(6)])
+        self.assertEqual(set(l.name for c in cards for l in c.labels), {"label 0", "label 1"})
+        self.assertEqual(sum(len(cl.items) for c in cards for cl in c.checklists), 18)
+        self.assertEqual(self.fake.request_count, 1)
+    
+    def test_updates(self):
+        card = self.api.get_board(self.board_id).cards.items[0]
+        
+        with self.api.transaction():
+            card.name = "new name"
+            card.description = "new desc"
+        
+        stored = self.fake.cards[card.id]
+        self.assertEqual((stored["name"], stored["desc"]), ("new name", "new desc"))
+        self.assertEqual([r[:2] for r in self.fake.requests[-1:]], [("put", "cards/%s" % card.id)])
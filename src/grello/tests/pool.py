@@ -0,0 +1,106 @@
+'''
+Created on 18.10.2026
+
+@author: glorpen
+'''
+import unittest
+from grello.pool import ApiPool, SharedCache
+from grello.objects import Member, Board
+from grello.ratelimit import RateLimiter, TokenBucket
+from grello.context import manager, ObjectNotKnownException
+from grello.tests.fake import FakeTrello
+
+class FakePool(ApiPool):
+    
+    def __init__(self, address, **kwargs):
+        super(FakePool, self).__init__("app_key", "app_secret", rate_limiter=RateLimiter(TokenBucket(10**9, 1)), **kwargs)
+        self.address = address
+    
+    def create_connection(self):
+        connection = super(FakePool, self).create_connection()
+        connection.api_scheme = "http"
+        connection.api_host = "%s:%d" % tuple(self.address)
+        return connection
+
+class TestApiPool(unittest.TestCase):
+    
+    def setUp(self):
+        self.fake = FakeTrello()
+        self.board_id = self.fake.generate_board(lists=1, cards=2)
+        self.fake.serve()
+    
+    def tearDown(self):
+        self.pool.close()
+        self.fake.shutdown()
+    
+    def create_pool(self, **kwargs):
+        self.pool = FakePool(self.fake.server.server_address[:2], **kwargs)
+        return self.pool
+    
+    def test_shared_connections(self):
+        pool = self.create_pool()
+        first = pool.get("token_1", "secret_1")
+        second = pool.get("token_2", "secret_2")
+        
+        self.assertIs(pool.get("token_1", "secret_1"), first)
+        self.assertIs(first.connection.session.get_adapter("http://"), second.connection.session.get_adapter("http://"))
+        
+        pool.remove("token_1")
+        self.assertNotIn("token_1", pool)
+        self.assertEqual(second.get_board(self.board_id).name, "board", "Shared connections are not closed with other session")
+    
+    def test_max_tenants(self):
+        pool = self.create_pool(max_tenants=1)
+        first = pool.get("token_1", "secret_1")
+        pool.get("token_2", "secret_2")
+        
+        self.assertEqual(len(pool), 1)
+        self.assertIsNone(first.connection.session, "Least recently used Api is disconnected")
+        with self.assertRaises(ObjectNotKnownException):
+            manager.find_context(first.context.repository)
+    
+    def test_shared_cache(self):
+        shared = SharedCache()
+        pool = self.create_pool(shared_cache=shared)
+        first = pool.get("token_1", "secret_1")
+        second = pool.get("token_2", "secret_2")
+        
+        self.fake.boards[self.board_id]["prefs"] = {"permissionLevel": "public"}
+        private_board_id = self.fake.generate_board(lists=0, cards=0)
+        member_id = self.fake.me["id"]
+        
+        for api in (first, second):
+            self.assertEqual(api.get_any(Member, id=member_id).full_name, "Me")
+            self.assertEqual(api.get_any(Board, id=self.board_id, fields=("name", "prefs")).name, "board")
+            api.get_any(Board, id=private_board_id, fields=("name", "prefs")).name
+        
+        self.assertEqual([r[1] for r in self.fake.requests], [
+            "members/%s" % member_id,
+            "boards/%s" % self.board_id,
+            "boards/%s" % private_board_id,
+            "boards/%s" % private_board_id,
+        ], "Public data is fetched once")
+        self.assertNotIn("email", shared.load("Member[%r]" % member_id).data, "Private fields are not shared")
+        self.assertIs(manager.find_context(first.context.repository), first.context)
+    
+    def test_private_fields(self):
+        shared = SharedCache()
+        pool = self.create_pool(shared_cache=shared)
+        first = pool.get("token_1", "secret_1")
+        second = pool.get("token_2", "secret_2")
+        
+        member_id = self.fake.me["id"]
+        self.fake.me.update({"aaEmail": "me@example.com", "idEnterprise": "enterprise_id", "confirmed": True, "memberType": "normal"})
+        
+        fields = ("fullName", "email", "aaEmail", "idEnterprise", "confirmed", "memberType")
+        self.assertEqual(first.get_any(Member, id=member_id, fields=fields).full_name, "Me")
+        
+        member = second.get_any(Member, id=member_id)
+        self.assertEqual(member.full_name, "Me")
+        self.assertEqual(len(self.fake.requests), 1, "Public fields are read from shared cache")
+        
+        data = second.context.repository.get_object_api_data(member).loaded_data
+        self.assertEqual(set(data), {"id", "fullName"}, "Private fields of other user are not shared")
+        
+        data["email"] = "other@example.com"
+        self.assertNotIn("email", shared.load("Member[%r]" % member_id).data, "Data changed by user is not shared")
@@ -0,0 +1,93 @@
+'''
+Created on 18.10.2026
+
+@author: glorpen
+'''
+import datetime
+import unittest
+from unittest.mock import MagicMock
+from grello.context import Context
+from grello.objects import Card, Label, List
+from grello.repository import CachePolicy
+
+def card_data(i, **kwargs):
+    data = {
+        "id": "card_%d" % i, "name": "card", "closed": False, "due": None,
+        "idList": "list_%d" % (i % 2), "idLabels": ["label_%d" % (i % 3)], "idMembers": ["member_%d" % (i % 2)],
+    }
+    data.update(kwargs)
+    return data
+
+class TestQuery(unittest.TestCase):
+    
+    def setUp(self):
+        self.context = Context(MagicMock())
+        self.repository = self.context.repository
+        self.cards = self.repository.get_objects(Card, [card_data(i) for i in range(12)])
+    
+    def tearDown(self):
+        self.context.quit()
+    
+    def assertFound(self, query, indices, msg=None):
+        self.assertEqual(sorted(c.id for c in query), sorted("card_%d" % i for i in indices), msg)
+    
+    def test_criteria(self):
+        label = self.repository.get_object(Label, id="label_0")
+        
+        self.assertFound(self.repository.query(Card).where(label=label), [0, 3, 6, 9], "Objects are matched by its id")
+        self.assertFound(self.repository.query(Card).where(label="label_0", member="member_1"), [3, 9])
+        self.assertFound(self.repository.query(Card).where(list=self.repository.get_object(List, id="list_0")).where(label="label_1"), [4, 10])
+        self.assertEqual(len(self.repository.query(Card)), 12)
+        
+        with self.assertRaises(ValueError):
+            self.repository.query(Card).where(unknown=1).all()
+    
+    def test_due_dates(self):
+        self.repository.get_object(Card, data=card_data(1, due="2026-10-18T10:00:00.000Z"))
+        self.repository.get_object(Card, data=card_data(2, due="2026-10-25T10:00:00.000Z"))
+        
+        self.assertFound(self.repository.query(Card).where(due_before=datetime.datetime(2026, 10, 20)), [1])
+        self.assertFound(self.repository.query(Card).where(due_after=datetime.datetime(2026, 10, 18), member="member_0"), [2])
+        
+        self.repository.get_object(Card, data=card_data(1))
+        self.assertFound(self.repository.query(Card).where(due_before=datetime.datetime(2026, 10, 20)), [], "Changed data is indexed")
+    
+    def test_due_bounds(self):
+        self.repository.get_object(Card, data=card_data(1, due="2026-10-18T10:00:00.000Z"))
+        self.repository.get_object(Card, data=card_data(2, due="2026-10-18T10:00:00.500Z"))
+        
+        self.assertFound(self.repository.query(Card).where(due_before=datetime.date(2026, 10, 19)), [1, 2], "Dates are taken as its midnight")
+        
+        cest = datetime.timezone(datetime.timedelta(hours=2))
+        self.assertFound(self.repository.query(Card).where(due_after=datetime.datetime(2026, 10, 18, 12, 0, 0, 100000, tzinfo=cest)), [2], "Aware datetimes are compared in UTC")
+        self.assertFound(self.repository.query(Card).where(due_before=datetime.datetime(2026, 10, 18, 10, 0, 0, 500)), [1], "Bounds are compared with milliseconds")
+        self.assertFound(self.repository.query(Card).where(due_after=datetime.datetime(2026, 10, 18, 10, 0, 0, 499999)), [2])
+    
+    def test_changes(self):
+        card = self.cards[0]
+        label = self.repository.get_object(Label, data={"id": "label_1", "name": "label", "color": None})
+        
+        card.labels.add(label=label)
+        self.assertFound(self.repository.query(Card).where(label="label_1"), [0, 1, 4, 7, 10], "Assigned labels are indexed")
+        
+        card.labels.remove(label)
+        self.assertFound(self.repository.query(Card).where(label="label_1"), [1, 4, 7, 10])
+        
+        with self.context.transaction():
+            card.closed = True
+            self.assertFound(self.repository.query(Card).where(closed=True), [0], "Values changed in transaction are indexed")
+        
+        self.context.event_dispatcher.trigger("label.removed", None, label)
+        self.assertFound(self.repository.query(Card).where(label="label_1"), [], "Removed labels are dropped")
+    
+    def test_evicted_objects(self):
+        context = Context(MagicMock(), CachePolicy(max_entries=2))
+        try:
+            cards = context.repository.get_objects(Card, [card_data(i) for i in range(4)])
+            self.assertFound(context.repository.query(Card), [2, 3], "Only cached objects are indexed")
+            
+            context.repository.get_object(Card, id="card_0")
+            self.assertFound(context.repository.query(Card).where(closed=False), [0, 3], "Revived objects are indexed")
+            del cards
+        finally:
+            context.quit()
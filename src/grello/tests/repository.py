@@ -0,0 +1,249 @@
+'''
+Created on 18.10.2026
+
+@author: glorpen
+'''
+import unittest
+import gc
+import threading
+import time
+from unittest.mock import MagicMock
+from grello.repository import Repository, CachePolicy
+from grello.objects import Label, Card, Member
+from grello.storage import SqliteStorage, Storage
+from grello.utils import get_size
+from grello.registry import FieldsProjection
+from grello.connection import Api
+
+def label_data(i):
+    return {"id": "label_%d" % i, "name": "label %d" % i, "color": None}
+
+class TestRepository(unittest.TestCase):
+    
+    def test_max_entries(self):
+        repository = Repository(MagicMock(), CachePolicy(max_entries={"Label": 2}))
+        
+        first = repository.get_object(Label, data=label_data(1))
+        repository.get_object(Label, data=label_data(2))
+        # marks first label as recently used
+        repository.get_object(Label, id="label_1")
+        repository.get_object(Label, data=label_data(3))
+        
+        self.assertEqual(len(repository.get_object_cache(Label)), 2)
+        self.assertEqual(repository.get_stats()["evictions"], 1)
+        self.assertIs(repository.get_object(Label, id="label_1"), first, "Least recently used object is evicted")
+    
+    def test_referenced_objects(self):
+        repository = Repository(MagicMock(), CachePolicy(max_entries=1))
+        
+        first = repository.get_object(Label, data=label_data(1))
+        repository.get_object(Label, data=label_data(2))
+        
+        self.assertIs(repository.get_object(Label, id="label_1"), first, "Still referenced object is reused after eviction")
+        self.assertEqual(repository.get_stats()["revived"], 1)
+        
+        # evicts first label
+        repository.get_object(Label, id="label_2")
+        del first
+        gc.collect()
+        
+        self.assertEqual(len(repository.get_cached_objects(Label)), 1, "Unreferenced objects are dropped")
+    
+    def test_max_bytes(self):
+        repository = Repository(MagicMock(), CachePolicy(max_bytes=2000))
+        
+        for i in range(20):
+            repository.get_object(Label, data=label_data(i))
+        
+        stats = repository.get_stats()
+        self.assertLessEqual(stats["bytes"], 2000)
+        self.assertGreater(stats["evictions"], 0)
+        self.assertEqual(stats["entries"] + stats["evictions"], 20)
+
+def member_data():
+    return {"id": "member_id", "username": "user", "fullName": "User", "email": None, "url": "url"}
+
+class TestAliases(unittest.TestCase):
+    
+    def setUp(self):
+        self.api = Api(None, None)
+        self.api.connection.do_request = MagicMock(return_value=member_data())
+    
+    def tearDown(self):
+        self.api.disconnect()
+    
+    def test_alias_fields(self):
+        repository = self.api.context.repository
+        card = repository.get_object(Card, data={"id": "card_id", "name": "card", "shortLink": "abcd1234"})
+        member = repository.get_object(Member, data=member_data())
+        
+        self.assertIs(self.api.get_any(Card, id="abcd1234"), card)
+        self.assertIs(self.api.get_any(Member, id="user"), member)
+        self.assertIs(repository.find_object(Card, id="abcd1234"), card)
+        self.assertFalse(self.api.connection.do_request.called)
+    
+    def test_alias_loaded_first(self):
+        me = self.api.get_me()
+        self.assertEqual(me.full_name, "User")
+        
+        self.assertIs(self.api.get_any(Member, id="member_id"), me, "Cache entry is moved to real id")
+        self.assertIs(self.api.get_me(), me)
+        self.assertEqual(self.api.connection.do_request.call_count, 1)
+    
+    def test_merging(self):
+        member = self.api.context.repository.get_object(Member, data=dict(member_data(), fullName="Old"))
+        
+        me = self.api.get_me()
+        self.assertEqual(me.full_name, "User")
+        
+        self.assertIs(self.api.get_me(), member, "Alias resolves to already known object")
+        self.assertEqual(member.full_name, "User", "Loaded data is shared")
+        self.assertIs(self.api.context.repository.get_object_api_data(me), self.api.context.repository.get_object_api_data(member))
+        self.assertEqual(len(self.api.context.repository.get_cached_objects(Member)), 1)
+        self.assertEqual(self.api.connection.do_request.call_count, 1)
+
+    def test_connected_member(self):
+        member = self.api.context.repository.get_object(Member, data=member_data())
+        
+        self.api.connection.connect = MagicMock()
+        self.api.connection.member_id = "member_id"
+        self.api.connect("app_secret")
+        
+        self.assertIs(self.api.get_me(), member, "Member of token is known as me")
+        self.assertIs(self.api.context.repository.get_object(Member, id="me"), member)
+        self.assertEqual(len(self.api.context.repository.get_cached_objects(Member)), 1)
+        self.assertFalse(self.api.connection.do_request.called)
+    
+    def test_evicted_aliases(self):
+        api = Api(None, None, cache_policy=CachePolicy(max_entries={"Card": 1}))
+        try:
+            repository = api.context.repository
+            repository.get_object(Card, data={"id": "card_1", "name": "card", "shortLink": "link_1"})
+            repository.get_object(Card, data={"id": "card_2", "name": "card", "shortLink": "link_2"})
+            
+            self.assertEqual(repository._get_aliases(Card), {("link_2",): ("card_2",)}, "Aliases of evicted objects are removed")
+        finally:
+            api.disconnect()
+    
+    def test_merging_loaded_object(self):
+        api = Api(None, None, thread_safe=True)
+        def do_request(url, *args, **kwargs):
+            if url == "members/member_id":
+                time.sleep(0.1)
+                return dict(member_data(), fullName="Old")
+            return member_data()
+        api.connection.do_request = MagicMock(side_effect=do_request)
+        
+        try:
+            member = api.get_any(Member, id="member_id")
+            loading = threading.Thread(target=lambda: member.full_name)
+            loading.start()
+            time.sleep(0.02)
+            
+            me = api.get_me()
+            self.assertEqual(me.full_name, "User")
+            loading.join()
+            
+            self.assertEqual(member.full_name, "User", "Alias data is merged after running load of known object")
+        finally:
+            api.disconnect()
+
+class TestSize(unittest.TestCase):
+    
+    def create_repository(self, cache_policy):
+        context = MagicMock()
+        context.repository = Repository(context, cache_policy)
+        context.connection.do_request.side_effect = lambda url, *args, **kwargs: label_data(int(url.rsplit("_", 1)[1]))
+        return context.repository
+    
+    def test_lazy_loading(self):
+        repository = self.create_repository(CachePolicy(max_bytes=2000))
+        labels = [repository.get_object(Label, id="label_%d" % i) for i in range(20)]
+        self.assertEqual(repository.get_stats()["bytes"], 0)
+        
+        for l in labels:
+            l.name
+        
+        stats = repository.get_stats()
+        self.assertGreater(stats["bytes"], 0)
+        self.assertLessEqual(stats["bytes"], 2000, "Budget applies to lazily loaded objects")
+        self.assertGreater(stats["evictions"], 0)
+    
+    def test_without_budget(self):
+        repository = self.create_repository(CachePolicy())
+        repository.get_object(Label, id="label_1").name
+        self.assertEqual(repository.get_stats()["bytes"], 0, "Size is not estimated without budget")
+    
+    def test_nested_objects(self):
+        card = {"id": "card_id", "name": "card"}
+        nested = get_size({"id": "list_id", "cards": [card]}) - get_size({"id": "list_id", "cards": []})
+        self.assertLess(nested, get_size(card), "Nested objects are counted by its own objects")
+
+class TestStorage(unittest.TestCase):
+    
+    def create_context(self, storage):
+        context = MagicMock()
+        context.projection = FieldsProjection()
+        context.repository = Repository(context, storage=storage)
+        return context
+    
+    def test_warm_start(self):
+        storage = SqliteStorage(":memory:", max_age=60)
+        
+        context = self.create_context(storage)
+        context.connection.do_request.return_value = {"id": "card_id", "name": "card", "dateLastActivity": "2017-01-01"}
+        card = context.repository.get_object(Card, id="card_id")
+        self.assertEqual(card.name, "card")
+        self.assertIn("dateLastActivity", context.connection.do_request.call_args[0][1]["fields"])
+        
+        context = self.create_context(storage)
+        card = context.repository.get_object(Card, id="card_id")
+        self.assertEqual(card.name, "card")
+        self.assertFalse(context.connection.do_request.called, "Fresh data is loaded from storage")
+    
+    def test_revalidation(self):
+        storage = SqliteStorage(":memory:", max_age=0)
+        storage.save("Card['card_id']", {"id": "card_id", "name": "card"}, "2017-01-01")
+        
+        context = self.create_context(storage)
+        context.connection.do_request.return_value = {"id": "card_id", "dateLastActivity": "2017-01-01"}
+        card = context.repository.get_object(Card, id="card_id")
+        self.assertEqual(card.name, "card")
+        context.connection.do_request.assert_called_once_with("cards/card_id", {"fields": "dateLastActivity"}, method="get")
+        
+        context = self.create_context(storage)
+        context.connection.do_request.side_effect = [
+            {"id": "card_id", "dateLastActivity": "2017-02-01"},
+            {"id": "card_id", "name": "changed", "dateLastActivity": "2017-02-01"},
+        ]
+        card = context.repository.get_object(Card, id="card_id")
+        self.assertEqual(card.name, "changed", "Outdated data is fetched again")
+    
+    def test_buffered_writes(self):
+        storage = SqliteStorage(":memory:")
+        storage.save("Card['card_id']", {"id": "card_id"})
+        
+        self.assertEqual(storage.load("Card['card_id']").data, {"id": "card_id"}, "Buffered data is loaded")
+        self.assertEqual(storage.db.execute("SELECT COUNT(*) FROM objects").fetchone()[0], 0)
+        
+        storage.flush()
+        self.assertEqual(storage.db.execute("SELECT COUNT(*) FROM objects").fetchone()[0], 1)
+        
+        storage.remove("Card['card_id']")
+        self.assertIsNone(storage.load("Card['card_id']"))
+        storage.flush()
+        self.assertEqual(storage.db.execute("SELECT COUNT(*) FROM objects").fetchone()[0], 0)
+    
+    def test_persisted_objects(self):
+        storage = MagicMock()
+        repository = self.create_context(storage).repository
+        
+        repository.get_object(Label, data=label_data(1))
+        repository.get_object(Label, data=label_data(1))
+        repository.get_objects(Label, [label_data(2)], persist=False)
+        
+        self.assertEqual([c[0][0] for c in storage.save.call_args_list], ["Label['label_1']"], "Only changed, not embedded objects are persisted")
+    
+    def test_abstract_storage(self):
+        with self.assertRaises(TypeError):
+            Storage()
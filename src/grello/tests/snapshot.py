@@ -0,0 +1,101 @@
+'''
+Created on 18.10.2026
+
+@author: glorpen
+'''
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+from grello.connection import Api
+from grello.tests.fake import FakeTrello
+from grello.storage import SqliteStorage
+
+def read_board(board):
+    return {
+        "name": board.name,
+        "labels": sorted(l.name for l in board.labels),
+        "members": sorted(m.username for m in board.members),
+        "lists": [(l.name, [(c.name, c.description, [i.name for i in c.labels], [(ch.name, [i.name for i in ch.items]) for ch in c.checklists]) for c in l.cards]) for l in board.lists],
+    }
+
+class TestSnapshot(unittest.TestCase):
+    
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".snapshot")
+        os.close(fd)
+        
+        fake = FakeTrello()
+        board_id = fake.generate_board(lists=2, cards=6, checklists=1, checkitems=2)
+        fake.serve()
+        
+        api = fake.create_api()
+        try:
+            board = api.get_board(board_id, expand=True)
+            self.expected = read_board(board)
+            
+            fake.reset_requests()
+            self.count = board.export(self.path)
+            self.assertEqual(fake.request_count, 0, "Loaded objects are exported without requests")
+        finally:
+            api.disconnect()
+            fake.shutdown()
+    
+    def tearDown(self):
+        os.unlink(self.path)
+    
+    def test_loading(self):
+        api = Api(None, None)
+        api.connection.do_request = MagicMock(side_effect=AssertionError("Snapshot objects are not fetched"))
+        try:
+            board = api.load_snapshot(self.path)
+            
+            self.assertEqual(len(api.context.repository.storage), self.count)
+            self.assertEqual(api.context.repository.get_stats()["entries"], 1, "Objects are created on access")
+            
+            self.assertEqual(read_board(board), self.expected)
+        finally:
+            api.disconnect()
+    
+    def test_changed_objects(self):
+        api = Api(None, None)
+        api.connection.do_request = MagicMock(side_effect=AssertionError("Snapshot objects are not fetched"))
+        try:
+            board = api.load_snapshot(self.path)
+            card = board.cards.items[0]
+            storage = api.context.repository.storage
+            uid = api.context.repository.get_storage_key(card)
+            
+            self.assertIsNotNone(storage.load(uid))
+            
+            api.context.repository.get_object_api_data(card).patch({"name": "changed"})
+            self.assertIsNone(storage.load(uid), "Changed objects are not loaded from snapshot")
+        finally:
+            api.disconnect()
+    
+    def test_changed_objects_storage(self):
+        fd, db_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        
+        api = Api(None, None, storage=SqliteStorage(db_path))
+        api.connection.do_request = MagicMock(side_effect=AssertionError("Snapshot objects are not fetched"))
+        try:
+            board = api.load_snapshot(self.path)
+            card = board.cards.items[0]
+            uid = api.context.repository.get_storage_key(card)
+            expected = read_board(board)
+            
+            api.context.repository.get_object_api_data(card).patch({"name": "changed"})
+            api.context.repository.get_object_api_data(board).patch({"name": "changed"})
+            api.context.repository.storage.flush()
+            
+            storage = SqliteStorage(db_path)
+            try:
+                self.assertEqual(storage.load(uid).data["name"], "changed", "Changed object is saved to wrapped storage")
+                labels = storage.load(api.context.repository.get_storage_key(board)).data["labels"]
+                self.assertEqual(sorted(l["name"] for l in labels), expected["labels"], "Snapshot collections are saved as plain lists")
+            finally:
+                storage.close()
+        finally:
+            api.disconnect()
+            os.unlink(db_path)
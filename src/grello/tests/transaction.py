@@ -0,0 +1,134 @@
+'''
+Created on 18.10.2026
+
+@author: glorpen
+'''
+import unittest
+import datetime
+from unittest.mock import MagicMock
+from grello.context import Context
+from grello.objects import Card
+from grello.transaction import TransactionException
+
+class TestTransaction(unittest.TestCase):
+    
+    def setUp(self):
+        self.connection = MagicMock()
+        self.context = Context(self.connection)
+    
+    def tearDown(self):
+        self.context.quit()
+    
+    def get_card(self, card_id):
+        return self.context.repository.get_object(Card, data={"id": card_id, "name": "name", "desc": "", "closed": False})
+    
+    def test_coalescing(self):
+        cards = [self.get_card("card_%d" % i) for i in range(3)]
+        
+        with self.context.transaction():
+            for c in cards:
+                c.name = "new name"
+                c.description = "new desc"
+            self.assertFalse(self.connection.do_request.called, "Changes are sent on exit")
+            self.assertEqual(cards[0].name, "new name", "Changed value is visible")
+        
+        self.assertEqual(self.connection.do_request.call_count, 3, "Single request is sent per object")
+        self.connection.do_request.assert_any_call("cards/card_0", parameters={"name": "new name", "desc": "new desc"}, method="put")
+    
+    def test_failures(self):
+        cards = [self.get_card("card_%d" % i) for i in range(3)]
+        
+        def do_request(url, parameters=None, method="get"):
+            if url == "cards/card_1":
+                raise Exception("some error")
+        self.connection.do_request.side_effect = do_request
+        
+        self.context.thread_safe = True
+        with self.assertRaises(TransactionException) as cm:
+            with self.context.transaction(concurrency=2):
+                for c in cards:
+                    c.closed = True
+        
+        self.assertEqual(self.connection.do_request.call_count, 3, "Other objects are updated")
+        self.assertEqual([obj for obj, _e in cm.exception.errors], [cards[1]])
+    
+    def test_failed_changes_reverted(self):
+        cards = [self.get_card("card_%d" % i) for i in range(2)]
+        blind = self.context.repository.get_object(Card, id="card_blind")
+        
+        def do_request(url, parameters=None, method="get"):
+            if url != "cards/card_0":
+                raise Exception("some error")
+        self.connection.do_request.side_effect = do_request
+        
+        with self.assertRaises(TransactionException):
+            with self.context.transaction():
+                for c in cards + [blind]:
+                    c.closed = True
+        
+        self.assertTrue(cards[0].closed)
+        self.assertFalse(cards[1].closed, "Failed change is reverted")
+        self.assertFalse(self.context.repository.get_object_api_data(cards[1]).dirty)
+        self.assertFalse(self.context.repository.get_object_api_data(blind).values)
+        self.assertEqual(list(self.context.repository.query(Card).where(closed=True)), [cards[0]], "Failed change is not indexed")
+    
+    def test_rollback(self):
+        card = self.get_card("card_id")
+        
+        with self.assertRaises(RuntimeError):
+            with self.context.transaction():
+                card.name = "changed"
+                card.closed = True
+                raise RuntimeError()
+        
+        self.assertFalse(self.connection.do_request.called)
+        self.assertEqual(card.name, "name", "Changes are reverted when block fails")
+        self.assertEqual(list(self.context.repository.query(Card).where(closed=True)), [], "Reverted change is not indexed")
+    
+    def test_concurrency_thread_safety(self):
+        with self.assertRaises(ValueError):
+            with self.context.transaction(concurrency=2):
+                pass
+    
+    def test_no_transaction(self):
+        card = self.get_card("card_id")
+        card.name = "new name"
+        
+        self.connection.do_request.assert_called_once_with("cards/card_id/name", parameters={"value": "new name"}, method="put")
+    
+    def test_blind_write(self):
+        card = self.context.repository.get_object(Card, id="card_id")
+        card.name = "new name"
+        
+        self.connection.do_request.assert_called_once_with("cards/card_id/name", parameters={"value": "new name"}, method="put")
+        self.assertEqual(card.name, "new name")
+    
+    def test_unchanged_value(self):
+        card = self.get_card("card_id")
+        card.name = "name"
+        
+        self.assertFalse(self.connection.do_request.called, "Known and unchanged value is not sent")
+    
+    def test_dirty_fields(self):
+        card = self.get_card("card_id")
+        
+        with self.context.transaction():
+            card.name = "new name"
+            self.get_card("card_id")
+            self.assertEqual(card.name, "new name", "Pending change is not overwritten by fetched data")
+        
+        self.get_card("card_id")
+        self.assertEqual(card.name, "name", "Sent changes are not kept")
+    
+    def test_dirty_values_types(self):
+        card = self.get_card("card_id")
+        due = datetime.datetime(2026, 10, 18, 12, 0)
+        
+        with self.context.transaction():
+            card.closed = True
+            card.due = due
+            self.context.repository.get_object(Card, data={"id": "card_id", "name": "name", "closed": False, "due": None})
+            self.assertIs(card.closed, True, "Assigned value is kept after fetch")
+            self.assertEqual(card.due, due)
+        
+        self.connection.do_request.assert_called_once_with("cards/card_id", parameters={"closed": "true", "due": "2026-10-18T12:00:00.000Z"}, method="put")
@@ -0,0 +1,106 @@
+'''
+Created on 18.10.2026
+
+@author: glorpen
+'''
+import json
+import unittest
+import urllib.request
+import urllib.error
+from unittest import mock
+from grello.connection import Api
+from grello.objects import List, Label
+from grello.webhooks import get_signature, WebhookException
+from grello.tests.objects import expanded_board_data
+
+def action(type, **data):
+    return {"action": {"id": "action_id", "type": type, "data": data}}
+
+class TestWebhooks(unittest.TestCase):
+    
+    callback_url = "http://localhost/webhook"
+    
+    def setUp(self):
+        self.api = Api(None, None, thread_safe=True)
+        self.api.connection.do_request = mock.MagicMock(return_value=expanded_board_data())
+        
+        self.board = self.api.get_board("board_id", expand=True)
+        self.lst = self.board.lists.items[0]
+        self.card = self.lst.cards.items[0]
+        
+        self.receiver = self.api.create_webhook_receiver("app_secret", self.callback_url)
+    
+    def tearDown(self):
+        self.receiver.shutdown()
+        self.api.disconnect()
+    
+    def sign(self, payload):
+        body = json.dumps(payload).encode("utf-8")
+        return body, get_signature("app_secret", body, self.callback_url)
+    
+    def test_thread_safety(self):
+        api = Api(None, None)
+        try:
+            with self.assertRaises(ValueError):
+                api.create_webhook_receiver("app_secret", self.callback_url)
+        finally:
+            api.disconnect()
+    
+    def test_signature(self):
+        body, signature = self.sign(action("updateCard", card={"id": "card_id", "name": "new name"}))
+        
+        with self.assertRaises(WebhookException):
+            self.receiver.handle(body, "invalid")
+        self.assertEqual(self.card.name, "card", "Invalid requests are not applied")
+        
+        self.receiver.handle(body, signature)
+        self.assertEqual(self.card.name, "new name")
+    
+    def test_card_moving(self):
+        other_list = self.api.context.repository.get_object(List, data={"id": "other_list_id", "name": "other list", "cards": []})
+        self.assertEqual(other_list.cards.items, [])
+        
+        self.receiver.handle(*self.sign(action("updateCard",
+            card={"id": "card_id", "idList": "other_list_id"},
+            listBefore={"id": "list_id"},
+            listAfter={"id": "other_list_id"},
+        )))
+        
+        self.assertEqual(self.lst.cards.items, [])
+        self.assertIn(self.card, other_list.cards.items)
+        self.assertIs(self.card.list, other_list)
+    
+    def test_label_actions(self):
+        label = self.card.labels.items[0]
+        self.assertEqual(self.board.labels.items, [label])
+        
+        self.receiver.handle(*self.sign(action("deleteLabel", board={"id": "board_id"}, label={"id": "label_id"})))
+        
+        self.assertEqual(self.board.labels.items, [])
+        self.assertEqual(self.card.labels.items, [], "Label removing event is fired")
+        self.assertIsNone(self.api.context.repository.find_object(Label, id="label_id"))
+    
+    def test_server(self):
+        server = self.receiver.serve("127.0.0.1", 0)
+        url = "http://127.0.0.1:%d/" % server.server_address[1]
+        
+        body, signature = self.sign(action("updateBoard", board={"id": "board_id", "name": "new name"}))
+        
+        with urllib.request.urlopen(urllib.request.Request(url, body, {"X-Trello-Webhook": signature})) as r:
+            self.assertEqual(r.status, 200)
+        self.assertEqual(self.board.name, "new name")
+        
+        with self.assertRaises(urllib.error.HTTPError) as cm:
+            urllib.request.urlopen(urllib.request.Request(url, body, {"X-Trello-Webhook": "invalid"}))
+        self.assertEqual(cm.exception.code, 401)
+    
+    def test_registration(self):
+        self.api.connection.token = "some_token"
+        
+        self.api.webhooks.register(self.board, self.callback_url)
+        
+        self.api.connection.do_request.assert_called_with(
+            "tokens/some_token/webhooks",
+            parameters={"idModel": "board_id", "callbackURL": self.callback_url},
+            method="post"
+        )
@@ -0,0 +1,73 @@
+'''
+Created on 18.10.2026
+
+@author: glorpen
+'''
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from grello.utils import Logger, python_to_trello
+
+class TransactionException(Exception):
+    def __init__(self, errors):
+        super(TransactionException, self).__init__("Failed to update %d objects: %s" % (
+            len(errors), ", ".join("%r: %s" % (obj, e) for obj, e in errors)
+        ))
+        # list of (object, exception) pairs
+        self.errors = errors
+
+# Collects changed fields and sends single update request for each changed object.
+class Transaction(Logger):
+    
+    def __init__(self, connection, concurrency=None):
+        super(Transaction, self).__init__()
+        self.connection = connection
+        self.concurrency = concurrency
+        
+        self._changes = OrderedDict()
+    
+    def add(self, api_data, name, value):
+        try:
+            params = self._changes[id(api_data)][1]
+        except KeyError:
+            params = OrderedDict()
+            self._changes[id(api_data)] = (api_data, params)
+        
+        params[name] = value
+    
+    def __len__(self):
+        return len(self._changes)
+    
+    # pending changes are dropped, fields and indexes are read again from last fetched data
+    def rollback(self):
+        for api_data, params in self._changes.values():
+            api_data.revert(params)
+        self._changes.clear()
+    
+    def _update(self, change):
+        api_data, params = change
+        try:
+            self.connection.do_request(api_data.get_object_url(), parameters=dict((k, python_to_trello(v)) for k, v in params.items()), method="put")
+        except Exception as e:
+            # assigned values are not kept, as they are not in api
+            api_data.revert(params)
+            return (api_data.obj, e)
+        api_data.clean(params)
+    
+    def flush(self):
+        changes = list(self._changes.values())
+        self._changes.clear()
+        
+        if not changes:
+            return
+        
+        self.logger.info("Updating %d objects", len(changes))
+        
+        if self.concurrency and len(changes) > 1:
+            with ThreadPoolExecutor(self.concurrency) as executor:
+                results = list(executor.map(self._update, changes))
+        else:
+            results = [self._update(c) for c in changes]
+        
+        errors = [r for r in results if r is not None]
+        if errors:
+            raise TransactionException(errors)
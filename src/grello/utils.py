@@ -8,6 +8,7 @@ import datetime
 import logging
 from collections import OrderedDict
 import inspect
+import sys
 
 # todo: cache + filling cached objects with new data if already fetched 
 
@@ -15,16 +16,54 @@ def python_to_trello(value):
     if isinstance(value, bool):
         return "true" if value else "false"
     
-    if isinstance(value, datetime.datetime):
-        return value.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    if isinstance(value, datetime.date):
+        return date_to_trello(value)
     
     return value
 
+# Trello dates are in UTC with milliseconds, naive datetimes are taken as UTC ones and dates as its midnight
+def date_to_trello(value):
+    if not isinstance(value, datetime.datetime):
+        value = datetime.datetime(value.year, value.month, value.day)
+    elif value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc)
+    
+    return "%s.%03dZ" % (value.strftime('%Y-%m-%dT%H:%M:%S'), value.microsecond // 1000)
+
+class NullLock(object):
+    def acquire(self, *args, **kwargs):
+        return True
+    def release(self):
+        pass
+    def __enter__(self):
+        return self
+    def __exit__(self, *args):
+        pass
+
+null_lock = NullLock()
+
 class Logger(object):
+    __slots__ = ()
+    
     def __init__(self):
         super(Logger, self).__init__()
         self.logger = logging.getLogger(self.__class__.__name__)
 
+# rough estimate of memory used by decoded api response,
+# nested objects (eg. cards of expanded board) are counted by its own objects
+def get_size(data):
+    size = sys.getsizeof(data)
+    
+    if isinstance(data, dict):
+        for k, v in data.items():
+            size += sys.getsizeof(k) + get_size(v)
+    elif isinstance(data, (list, tuple)):
+        for v in data:
+            if not isinstance(v, dict):
+                size += get_size(v)
+    
+    return size
+
 def get_uid(cls, data=None, kwargs={}):
     from grello import registry
     
@@ -37,80 +76,91 @@ def get_uid(cls, data=None, kwargs={}):
             raise Exception("Not all ids found")
     return ret
 
-class ArgFiller(object):
+class BoundCall(object):
     
-    def __init__(self, f):
-        super(ArgFiller, self).__init__()
-        self.callable = f
+    __slots__ = ("_f", "_kwargs", "_positional")
     
-    @property
-    def callable(self):
-        return self._f
-    
-    @callable.setter
-    def callable(self, v):
-        self._f = v
-        self._sig = inspect.signature(v)
-        self._args = {}
-    
-    def _get_other_params(self, names):
-        other = OrderedDict()
-        for n,p in self._sig.parameters.items():
-            if n not in names:
-                other[n] = p
-        
-        return other
+    def __init__(self, f, kwargs, positional):
+        super(BoundCall, self).__init__()
+        self._f = f
+        self._kwargs = kwargs
+        self._positional = positional
+    
+    def __call__(self, *args, **kwargs):
+        if args:
+            if len(args) > len(self._positional):
+                raise Exception("Positional arg not matched")
+            kwargs.update(zip(self._positional, args))
+        # call arguments are already a new dict, so bound ones are added to it
+        kwargs.update(self._kwargs)
+        return self._f(**kwargs)
+
+# arguments injected into given callable, inspected once per function
+class InjectionPlan(object):
     
-    def _get_next_positional_param(self, bound_args):
-        for p in self._get_other_params(bound_args.keys()).values():
-            if p.kind in (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD):
-                return p
+    services = ("connection", "repository", "event_dispatcher")
     
-    def _bind_inline(self, args, kwargs, base_args={}):
-        bound_args = base_args.copy()
+    _plans = {}
+    
+    def __init__(self, f):
+        super(InjectionPlan, self).__init__()
         
-        for a in args:
-            p = self._get_next_positional_param(bound_args)
-            if p is None:
-                raise Exception("Positional arg not matched")
-            bound_args[p.name] = a
+        self.callable = f
         
-        for kn, kv in kwargs.items():
-            other_params = self._get_other_params(bound_args.keys())
-            if kn not in other_params:
-                raise Exception("Keyword arg not found")
-            bound_args[kn] = kv
+        params = inspect.signature(f).parameters
+        self.injected = tuple(n for n in self.services if n in params)
+        self.with_api_data = "api_data" in params
         
-        return bound_args
-    
-    def bind(self, *args, **kwargs):
-        self._args = self._bind_inline(args, kwargs, self._args)
-    
-    def inject(self, context, obj=None):
-        p = self._sig.parameters
+        positional = tuple(n for n,p in params.items()
+            if p.kind in (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD)
+            and n not in self.injected and n != "api_data"
+        )
         
+        # first free positional argument receives object or service
+        self.owner = positional[0] if positional else None
+        self.positional = positional[1:]
+    
+    @classmethod
+    def get(cls, f):
+        try:
+            return cls._plans[f]
+        except KeyError:
+            plan = cls._plans[f] = cls(f)
+            return plan
+    
+    def bind(self, context, owner=None, api_data=None):
         kwargs = {}
         
-        if "connection" in p:
-            kwargs["connection"] = context.connection
-        if "repository" in p:
-            kwargs["repository"] = context.repository
-        if "event_dispatcher" in p:
-            kwargs["event_dispatcher"] = context.event_dispatcher
+        for n in self.injected:
+            kwargs[n] = getattr(context, n)
         
-        if obj:
-            if "api_data" in p:
-                api_data = context.repository.get_object_api_data(obj)
-                kwargs["api_data"] = api_data
+        if owner is None:
+            positional = (self.owner,) + self.positional
+        else:
+            kwargs[self.owner] = owner
+            positional = self.positional
         
-        self.bind(**kwargs)
+        if self.with_api_data and api_data is not None:
+            kwargs["api_data"] = api_data
         
-        return self
+        return BoundCall(self.callable, kwargs, positional)
     
-    def __call__(self, *args, **kwargs):
-        inline_args = self._bind_inline(args, kwargs, self._args)
-        bp = self._sig.bind(**inline_args)
-        return self.callable(*bp.args, **bp.kwargs)
+    # calls plan for object of given api data, nothing is bound so objects do not keep calls
+    def call(self, api_data, *args, **kwargs):
+        if args:
+            if len(args) > len(self.positional):
+                raise Exception("Positional arg not matched")
+            kwargs.update(zip(self.positional, args))
+        
+        context = api_data._context
+        for n in self.injected:
+            kwargs[n] = getattr(context, n)
+        
+        kwargs[self.owner] = api_data.obj
+        if self.with_api_data:
+            kwargs["api_data"] = api_data
+        
+        return self.callable(**kwargs)
 
 
 def fill_args(f, obj=None, service=None, context=None):
@@ -119,9 +169,10 @@ def fill_args(f, obj=None, service=None, context=None):
         from grello.context import manager
         context = manager.find_context(obj)
     
-    af = ArgFiller(f).inject(context, obj)
+    plan = InjectionPlan.get(f)
     
-    if obj or service:
-        af.bind(obj or service)
+    if obj is not None:
+        api_data = context.repository.get_object_api_data(obj) if plan.with_api_data else None
+        return plan.bind(context, obj, api_data)
     
-    return af
+    return plan.bind(context, service)
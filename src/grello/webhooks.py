@@ -0,0 +1,120 @@
+'''
+Created on 18.10.2026
+
+@author: glorpen
+'''
+import base64
+import hashlib
+import hmac
+import json
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from grello.utils import Logger
+
+class WebhookException(Exception):
+    pass
+
+def get_signature(app_secret, body, callback_url):
+    digest = hmac.new(app_secret.encode("utf-8"), body + callback_url.encode("utf-8"), hashlib.sha1).digest()
+    return base64.b64encode(digest).decode("ascii")
+
+# Registers webhooks for models, using token of connection.
+class Webhooks(Logger):
+    
+    def __init__(self, connection):
+        super(Webhooks, self).__init__()
+        self.connection = connection
+    
+    def _get_url(self, webhook_id=None):
+        if self.connection.token is None:
+            raise WebhookException("Connection is not authorized")
+        
+        url = "tokens/%s/webhooks" % self.connection.token
+        if webhook_id is not None:
+            url = "%s/%s" % (url, webhook_id)
+        return url
+    
+    def register(self, obj, callback_url, description=None):
+        parameters = {"idModel": obj.id, "callbackURL": callback_url}
+        if description is not None:
+            parameters["description"] = description
+        
+        return self.connection.do_request(self._get_url(), parameters=parameters, method="post")
+    
+    def get_registered(self):
+        return self.connection.do_request(self._get_url(), method="get")
+    
+    def remove(self, webhook_id):
+        self.connection.do_request(self._get_url(webhook_id), method="delete")
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    
+    receiver = None
+    
+    def do_HEAD(self):
+        # Trello checks callback url with HEAD request when creating webhook
+        self.send_response(200)
+        self.end_headers()
+    
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        
+        try:
+            self.receiver.handle(body, self.headers.get("X-Trello-Webhook"))
+        except WebhookException as e:
+            self.receiver.logger.warning("Rejected webhook request: %s", e)
+            self.send_response(401)
+        except Exception:
+            self.receiver.logger.exception("Failed to apply webhook request")
+            self.send_response(500)
+        else:
+            self.send_response(200)
+        
+        self.end_headers()
+    
+    def log_message(self, format, *args):
+        self.receiver.logger.debug(format, *args)
+
+# Receives actions sent by Trello and applies them to cached objects.
+class WebhookReceiver(Logger):
+    
+    def __init__(self, applier, app_secret, callback_url):
+        super(WebhookReceiver, self).__init__()
+        self.applier = applier
+        self.app_secret = app_secret
+        self.callback_url = callback_url
+        
+        self.server = None
+    
+    def is_valid(self, body, signature):
+        if not signature:
+            return False
+        return hmac.compare_digest(get_signature(self.app_secret, body, self.callback_url), signature)
+    
+    def handle(self, body, signature):
+        if not self.is_valid(body, signature):
+            raise WebhookException("Invalid signature")
+        
+        try:
+            payload = json.loads(body.decode("utf-8"))
+        except ValueError:
+            raise WebhookException("Invalid payload") from None
+        
+        return self.applier.apply(payload["action"])
+    
+    def serve(self, host="", port=8080):
+        handler = type("RequestHandler", (_RequestHandler,), {"receiver": self})
+        
+        self.server = HTTPServer((host, port), handler)
+        
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        
+        self.logger.info("Listening for webhooks on %s:%d", *self.server.server_address[:2])
+        return self.server
+    
+    def shutdown(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None